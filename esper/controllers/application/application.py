@@ -1,19 +1,29 @@
 import os
-import random
-import time
+from http import HTTPStatus
 from pathlib import Path
 
-import requests
 from cement import Controller, ex
 from esperclient.rest import ApiException
 from tqdm import tqdm
 
 from esper.controllers.enums import OutputFormat
+from esper.core.output_handler import STREAMING_ARGUMENTS, render_list_error
 from esper.ext.api_client import APIClient
+from esper.ext.apk import ApkError, read_apk_info
+from esper.ext.artifact_cache import clone_file
 from esper.ext.db_wrapper import DBWrapper
+from esper.ext.download import DownloadError, download_file, hash_algorithm, hash_file
+from esper.ext.pagination import ALL_PAGE_SIZE, PAGINATION_ARGUMENTS, page_size, paginate
+from esper.ext.resolver import NameResolver
+from esper.ext.upload import UPLOAD_BATCH_ARGUMENTS, UploadJournal, expand_upload_paths, upload_batch, upload_file
 from esper.ext.utils import validate_creds_exists, parse_error_message
 
 
+class VersionConflictError(Exception):
+    '''An APK version code already uploaded with a different file'''
+    pass
+
+
 class Application(Controller):
     class Meta:
         label = 'app'
@@ -39,9 +49,9 @@ class Application(Controller):
               'action': 'store',
               'dest': 'package'}),
             (['-l', '--limit'],
-             {'help': 'Number of results to return per page',
+             {'help': f'Number of results to return per page (default: 20, {ALL_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 20,
+              'default': None,
               'dest': 'limit'}),
             (['-i', '--offset'],
              {'help': 'The initial index from which to return the results',
@@ -52,7 +62,7 @@ class Application(Controller):
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'}),
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def list(self):
         """Command to list applications"""
@@ -63,7 +73,7 @@ class Application(Controller):
 
         name = self.app.pargs.name
         package = self.app.pargs.package
-        limit = self.app.pargs.limit
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 20)
         offset = self.app.pargs.offset
 
         kwargs = {}
@@ -77,10 +87,29 @@ class Application(Controller):
 
         try:
             # Find applications in an enterprise
-            response = application_client.get_all_applications(enterprise_id, limit=limit, offset=offset, **kwargs)
+            response = paginate(
+                lambda page_limit, page_offset: application_client.get_all_applications(
+                    enterprise_id, limit=page_limit, offset=page_offset, **kwargs),
+                limit, offset, self.app.pargs.all, self.app.pargs.max_concurrency)
+            # with --all, the remaining pages are fetched while rendering
+            self._render_applications(response)
         except ApiException as e:
             self.app.log.error(f"[application-list] Failed to list applications: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}")
+            render_list_error(self.app, parse_error_message(self.app, e))
+
+    @staticmethod
+    def _application_list_row(application):
+        return {
+            'id': application.id,
+            'name': application.application_name,
+            'package': application.package_name
+        }
+
+    def _render_applications(self, response):
+        if self.app.pargs.format:
+            self.app.log.debug(f"[application-list] Total Number of Applications: {response.count}")
+            self.app.render((self._application_list_row(application) for application in response.results),
+                            format=self.app.pargs.format, output=self.app.pargs.output)
             return
 
         self.app.render(f"Total Number of Applications: {response.count}")
@@ -103,15 +132,7 @@ class Application(Controller):
                 )
             self.app.render(applications, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            applications = []
-            for application in response.results:
-                applications.append(
-                    {
-                        'id': application.id,
-                        'name': application.application_name,
-                        'package': application.package_name
-                    }
-                )
+            applications = [self._application_list_row(application) for application in response.results]
             self.app.render(applications, format=OutputFormat.JSON.value)
 
     def _application_basic_response(self, application, format=OutputFormat.TABULATED):
@@ -168,12 +189,101 @@ class Application(Controller):
             renderable = self._application_basic_response(response, OutputFormat.JSON)
             self.app.render(renderable, format=OutputFormat.JSON.value)
 
+    def _find_uploaded_version(self, resolver, apk_info):
+        """
+        Look up the package and version code of an APK among the uploaded versions, the package through the
+        name cache
+        :return: (application id, AppVersion), either None when not uploaded yet
+        """
+        application_id = resolver.application_id(apk_info.package_name)
+        if not application_id or not apk_info.version_code:
+            return application_id, None
+
+        application_client = resolver.api_client.get_application_api_client()
+        try:
+            response = application_client.get_app_versions(application_id, resolver.enterprise_id,
+                                                           version_code=apk_info.version_code, limit=10)
+        except ApiException as e:
+            if e.status != HTTPStatus.NOT_FOUND:
+                raise
+
+            # the cached application was deleted since
+            resolver.invalidate_application(apk_info.package_name)
+            return None, None
+
+        for version in response.results or []:
+            if version.version_code == apk_info.version_code:
+                return application_id, version
+
+        return application_id, None
+
+    def _check_uploaded_version(self, resolver, application_file):
+        """
+        Look up an APK among the uploaded versions, before sending it
+        :return: (ApkInfo, application id, AppVersion) - the version is None when not uploaded yet, everything is
+                 None when the file could not be read as an APK
+        :raise VersionConflictError: If its version code is already uploaded with a different file. A version
+                                     whose hash cannot be compared is taken as the same file
+        """
+        try:
+            apk_info = read_apk_info(application_file)
+        except ApkError as e:
+            self.app.log.warning(f"[application-upload] Uploading without the duplicate check: {e}")
+            return None, None, None
+
+        application_id, version = self._find_uploaded_version(resolver, apk_info)
+        if not version:
+            return apk_info, application_id, None
+
+        algorithm = hash_algorithm(version.hash_string)
+        if not algorithm:
+            # the server would reject the version code anyway, so the uploaded one is kept
+            self.app.log.warning(f"[application-upload] Version {version.id} has no comparable hash, assuming "
+                                 f"{application_file} is the same file")
+            return apk_info, application_id, version
+
+        digest = apk_info.sha256 if algorithm == 'sha256' else hash_file(application_file, algorithm).hexdigest()
+        if digest != version.hash_string.lower():
+            self.app.log.debug(f"[application-upload] {application_file} conflicts with version {version.id}")
+            raise VersionConflictError(f"Version code {apk_info.version_code} of {apk_info.package_name} is already "
+                                       f"uploaded with a different file")
+
+        return apk_info, application_id, version
+
+    def _render_application_version(self, application, version):
+        valid_keys = ['id', 'application_name', 'package_name', 'developer', 'category', 'content_rating',
+                      'compatibility']
+
+        if not self.app.pargs.json:
+            title = "TITLE"
+            details = "DETAILS"
+            renderable = [{title: k, details: v} for k, v in application.to_dict().items() if k in valid_keys]
+
+            if version:
+                renderable.append({title: 'version_id', details: version.id})
+                renderable.append({title: 'version_code', details: version.version_code})
+                renderable.append({title: 'build_number', details: version.build_number})
+
+            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
+        else:
+            renderable = {k: v for k, v in application.to_dict().items() if k in valid_keys}
+            if version:
+                renderable['version_id'] = version.id
+                renderable['version_code'] = version.version_code
+                renderable['build_number'] = version.build_number
+
+            self.app.render(renderable, format=OutputFormat.JSON.value)
+
     @ex(
         help='Upload application',
         arguments=[
             (['application_file'],
              {'help': 'Application file',
               'action': 'store'}),
+            (['--no-dedup'],
+             {'help': 'Upload without first checking whether this version is already uploaded',
+              'action': 'store_true',
+              'dest': 'no_dedup'}),
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
@@ -185,21 +295,53 @@ class Application(Controller):
 
         validate_creds_exists(self.app)
         db = DBWrapper(self.app.creds)
-        application_client = APIClient(db.get_configure()).get_application_api_client()
+        client = APIClient(db.get_configure())
         enterprise_id = db.get_enterprise_id()
 
         try:
             filesize = os.path.getsize(application_file)
-            random_no = random.randint(1, 50)
+        except OSError as e:
+            self.app.log.error(f"[application-upload] Failed to read the application file: {e}")
+            self.app.render(f"ERROR: {e.strerror}: {application_file}\n")
+            return
+
+        resolver = NameResolver(self.app, db)
+        apk_info = None
+        if not self.app.pargs.no_dedup:
+            # the server only rejects an existing version code once the whole file is sent
+            try:
+                apk_info, application_id, version = self._check_uploaded_version(resolver, application_file)
+            except VersionConflictError as e:
+                self.app.log.error(f"[application-upload] {e}")
+                self.app.render(f"ERROR: {e}\n")
+                self.app.exit_code = 1
+                return
+            except ApiException as e:
+                self.app.log.error(f"[application-upload] Failed to look up the uploaded versions: {e}")
+                self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
+                return
+
+            if version:
+                self.app.log.debug(f"[application-upload] {application_file} is already uploaded as version "
+                                   f"{version.id}, skipping")
+                try:
+                    application = client.get_application_api_client().get_application(application_id, enterprise_id)
+                except ApiException as e:
+                    self.app.log.error(f"[application-upload] Failed to show details of an application: {e}")
+                    self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
+                    return
+
+                self._render_application_version(application, version)
+                return
+
+        try:
+            # the bar follows the bytes as they are sent
             with tqdm(total=int(filesize), unit='B', unit_scale=True, miniters=1, desc='Uploading......',
                       unit_divisor=1024) as pbar:
-                for i in range(100):
-                    if i == random_no:
-                        response = application_client.upload(enterprise_id, application_file)
-
-                    time.sleep(0.07)
-                    pbar.set_postfix(file=Path(application_file).name, refresh=False)
-                    pbar.update(int(filesize / 100))
+                pbar.set_postfix(file=Path(application_file).name, refresh=False)
+                response = upload_file(client.api_client, '/enterprise/{enterprise_id}/application/upload/',
+                                       {'enterprise_id': enterprise_id}, 'app_file', application_file,
+                                       'InlineResponse201', progress=pbar.update)
 
             application = response.application
         except ApiException as e:
@@ -207,30 +349,73 @@ class Application(Controller):
             self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
             return
 
-        valid_keys = ['id', 'application_name', 'package_name', 'developer', 'category', 'content_rating',
-                      'compatibility']
+        if apk_info:
+            # the package may be cached as unknown
+            resolver.invalidate_application(apk_info.package_name)
 
-        if not self.app.pargs.json:
-            title = "TITLE"
-            details = "DETAILS"
-            renderable = [{title: k, details: v} for k, v in application.to_dict().items() if k in valid_keys]
+        version = application.versions[0] if application and application.versions else None
+        self._render_application_version(application, version)
 
-            if application and application.versions and len(application.versions) > 0:
-                version = application.versions[0]
-                renderable.append({title: 'version_id', details: version.id})
-                renderable.append({title: 'version_code', details: version.version_code})
-                renderable.append({title: 'build_number', details: version.build_number})
+    @ex(
+        help='Upload every APK of a directory, or the files matching a glob pattern, concurrently',
+        label='upload-batch',
+        arguments=[
+            (['path'],
+             {'help': 'Directory of APKs, or glob pattern like "build/**/*.apk"',
+              'action': 'store'}),
+            (['--no-dedup'],
+             {'help': 'Upload without first checking whether each version is already uploaded',
+              'action': 'store_true',
+              'dest': 'no_dedup'}),
+        ] + UPLOAD_BATCH_ARGUMENTS
+    )
+    def upload_batch(self):
+        paths = expand_upload_paths(self.app.pargs.path, extensions=['.apk'])
+        if not paths:
+            self.app.log.debug(f"[application-upload-batch] No files match {self.app.pargs.path}")
+            self.app.render(f"No files match {self.app.pargs.path}\n")
+            return
 
-            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
-        else:
-            renderable = {k: v for k, v in application.to_dict().items() if k in valid_keys}
-            if application and application.versions and len(application.versions) > 0:
-                version = application.versions[0]
-                renderable['version_id'] = version.id
-                renderable['version_code'] = version.version_code
-                renderable['build_number'] = version.build_number
+        validate_creds_exists(self.app)
+        db = DBWrapper(self.app.creds)
+        client = APIClient(db.get_configure())
+        enterprise_id = db.get_enterprise_id()
+        resolver = NameResolver(self.app, db)
+        no_dedup = self.app.pargs.no_dedup
 
-            self.app.render(renderable, format=OutputFormat.JSON.value)
+        def upload(path, progress):
+            apk_info, application_id, version = (None, None, None) if no_dedup else \
+                self._check_uploaded_version(resolver, path)
+            if version:
+                return 'skipped', {'application_id': application_id, 'version_id': version.id}
+
+            response = upload_file(client.api_client, '/enterprise/{enterprise_id}/application/upload/',
+                                   {'enterprise_id': enterprise_id}, 'app_file', path, 'InlineResponse201',
+                                   progress=progress)
+            if apk_info:
+                resolver.invalidate_application(apk_info.package_name)
+
+            application = response.application
+            version = application.versions[0] if application.versions else None
+            return 'uploaded', {'application_id': application.id, 'version_id': version.id if version else None}
+
+        def format_error(e):
+            self.app.log.error(f"[application-upload-batch] Failed to upload a file: {e}")
+            return parse_error_message(self.app, e) if isinstance(e, ApiException) else str(e)
+
+        journal = UploadJournal(self.app.pargs.journal, 'application')
+        failed = []
+
+        def manifest():
+            for row in upload_batch(paths, upload, journal, self.app.pargs.max_concurrency, format_error):
+                if row['status'] == 'failed':
+                    failed.append(row['file'])
+                yield row
+
+        self.app.render(manifest(), format=OutputFormat.NDJSON.value, output=self.app.pargs.output)
+        if failed:
+            self.app.log.debug(f"[application-upload-batch] {len(failed)} of {len(paths)} files failed")
+            self.app.exit_code = 1
 
     @ex(
         help='Download application version',
@@ -246,6 +431,16 @@ class Application(Controller):
              {'help': 'Destination file path',
               'action': 'store',
               'dest': 'dest'}),
+            (['--connections'],
+             {'help': 'Number of byte ranges downloaded in parallel, when the server supports ranges',
+              'action': 'store',
+              'type': int,
+              'default': 1,
+              'dest': 'connections'}),
+            (['--no-cache'],
+             {'help': 'Always download, without using or filling the local artifact cache',
+              'action': 'store_true',
+              'dest': 'no_cache'}),
         ]
     )
     def download(self):
@@ -281,20 +476,41 @@ class Application(Controller):
             self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
             return
 
-        url = response.app_file
+        cache = None if self.app.pargs.no_cache else self.app.artifact_cache
+        if cache:
+            cached_file, cached_name = cache.get(version_id, response.hash_string)
+            if cached_file:
+                try:
+                    method = clone_file(cached_file, destination)
+                except OSError as e:
+                    self.app.log.warning(f"[app-download] Failed to copy the cached version, downloading it: {e}")
+                else:
+                    algorithm, hexdigest = cached_name.split('-', 1)
+                    self.app.log.debug(f"[app-download] Copied {cached_file} to {destination} with a {method}")
+                    self.app.render(f"Downloaded {destination} from the cache\n{algorithm}: {hexdigest}\n")
+                    return
+
+        # an interrupted download is resumed from `<destination>.part`
         file_size = int(response.size_in_mb * 1024 * 1024)
-        first_byte = 0
-
-        pbar = tqdm(total=file_size, initial=first_byte, unit='B', unit_scale=True, desc='Downloading......')
-        req = requests.get(url, stream=True)
-
-        with(open(destination, 'ab')) as f:
-            for chunk in req.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
-                    pbar.update(1024)
-                    time.sleep(0.001)
-        pbar.close()
+        try:
+            with tqdm(total=file_size, unit='B', unit_scale=True, desc='Downloading......',
+                      unit_divisor=1024) as pbar:
+                digest = download_file(response.app_file, destination, checksum=response.hash_string,
+                                       progress=pbar.update, connections=max(1, self.app.pargs.connections))
+        except (DownloadError, OSError) as e:
+            # OSError covers both the local file and the `requests` errors
+            self.app.log.error(f"[app-download] Failed to download the version: {e}")
+            self.app.render(f"ERROR: {e}\n")
+            return
+
+        if cache:
+            try:
+                cache.put(version_id, response.hash_string, destination, digest.name, digest.hexdigest())
+            except OSError as e:
+                self.app.log.warning(f"[app-download] Failed to add the version to the artifact cache: {e}")
+
+        self.app.log.debug(f"[app-download] Downloaded {destination}, {digest.name} {digest.hexdigest()}")
+        self.app.render(f"Downloaded {destination}\n{digest.name}: {digest.hexdigest()}\n")
 
     @ex(
         help='Delete application',
@@ -4,8 +4,10 @@ from cement import Controller, ex
 from esperclient.rest import ApiException
 
 from esper.controllers.enums import OutputFormat
+from esper.core.output_handler import STREAMING_ARGUMENTS, render_list_error
 from esper.ext.api_client import APIClient
 from esper.ext.db_wrapper import DBWrapper
+from esper.ext.pagination import ALL_PAGE_SIZE, PAGINATION_ARGUMENTS, page_size, paginate
 from esper.ext.utils import validate_creds_exists, parse_error_message
 
 
@@ -38,9 +40,9 @@ class ApplicationVersion(Controller):
               'action': 'store',
               'dest': 'build_number'}),
             (['-l', '--limit'],
-             {'help': 'Number of results to return per page',
+             {'help': f'Number of results to return per page (default: 20, {ALL_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 20,
+              'default': None,
               'dest': 'limit'}),
             (['-i', '--offset'],
              {'help': 'The initial index from which to return the results',
@@ -51,7 +53,7 @@ class ApplicationVersion(Controller):
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'}),
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def list(self):
         """Command to list application versions"""
@@ -73,7 +75,7 @@ class ApplicationVersion(Controller):
 
         version_code = self.app.pargs.version_code
         build_number = self.app.pargs.build_number
-        limit = self.app.pargs.limit
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 20)
         offset = self.app.pargs.offset
 
         kwargs = {}
@@ -85,11 +87,32 @@ class ApplicationVersion(Controller):
 
         try:
             # Find application versions in an enterprise
-            response = application_client.get_app_versions(application_id, enterprise_id, limit=limit, offset=offset,
-                                                           **kwargs)
+            response = paginate(
+                lambda page_limit, page_offset: application_client.get_app_versions(
+                    application_id, enterprise_id, limit=page_limit, offset=page_offset, **kwargs),
+                limit, offset, self.app.pargs.all, self.app.pargs.max_concurrency)
+            # with --all, the remaining pages are fetched while rendering
+            self._render_versions(response)
         except ApiException as e:
             self.app.log.error(f"[version-list] Failed to list applications: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
+            render_list_error(self.app, parse_error_message(self.app, e))
+
+    @staticmethod
+    def _version_list_row(version):
+        return {
+            'id': version.id,
+            'version_code': version.version_code,
+            'build_number': version.build_number,
+            'size_in_mb': version.size_in_mb,
+            'release_track': version.release_track,
+            'installed_count': version.installed_count if version.installed_count else 0
+        }
+
+    def _render_versions(self, response):
+        if self.app.pargs.format:
+            self.app.log.debug(f"[version-list] Total Number of Versions: {response.count}")
+            self.app.render((self._version_list_row(version) for version in response.results),
+                            format=self.app.pargs.format, output=self.app.pargs.output)
             return
 
         self.app.render(f"Total Number of Versions: {response.count}")
@@ -118,18 +141,7 @@ class ApplicationVersion(Controller):
                 )
             self.app.render(versions, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            versions = []
-            for version in response.results:
-                versions.append(
-                    {
-                        'id': version.id,
-                        'version_code': version.version_code,
-                        'build_number': version.build_number,
-                        'size_in_mb': version.size_in_mb,
-                        'release_track': version.release_track,
-                        'installed_count': version.installed_count if version.installed_count else 0
-                    }
-                )
+            versions = [self._version_list_row(version) for version in response.results]
             self.app.render(versions, format=OutputFormat.JSON.value)
 
     def _version_basic_response(self, version, format=OutputFormat.TABULATED):
@@ -25,6 +25,14 @@ class Base(Controller):
             (['-v', '--version'],
              {'action': 'version',
               'version': VERSION_BANNER}),
+            (['--timings'],
+             {'help': 'Print request and phase timings to stderr on exit',
+              'action': 'store_true',
+              'dest': 'timings'}),
+            (['--timings-json'],
+             {'help': 'Print timings to stderr on exit, in Json format',
+              'action': 'store_true',
+              'dest': 'timings_json'}),
         ]
 
     def _default(self):
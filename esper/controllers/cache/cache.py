@@ -0,0 +1,107 @@
+from cement import Controller, ex
+
+from esper.controllers.enums import OutputFormat
+from esper.ext.name_cache import KINDS
+
+
+class Cache(Controller):
+    class Meta:
+        label = 'cache'
+
+        # text displayed at the top of --help output
+        description = 'Local name resolution and artifact cache commands'
+
+        # text displayed at the bottom of --help output
+        epilog = 'Usage: espercli cache'
+
+        stacked_type = 'nested'
+        stacked_on = 'base'
+
+    @ex(
+        help='Clear the local name resolution cache',
+        arguments=[
+            (['-k', '--kind'],
+             {'help': 'Only clear names of this kind',
+              'action': 'store',
+              'choices': KINDS,
+              'dest': 'kind'}),
+        ]
+    )
+    def clear(self):
+        kind = self.app.pargs.kind
+        self.app.name_cache.clear(kind)
+
+        if kind:
+            self.app.log.debug(f"[cache-clear] Cleared cached {kind} names")
+            self.app.render(f"Cleared cached {kind} names\n")
+        else:
+            self.app.log.debug("[cache-clear] Cleared the name cache")
+            self.app.render("Cleared the name cache\n")
+
+    @ex(
+        help='Show name resolution cache statistics',
+        arguments=[
+            (['-j', '--json'],
+             {'help': 'Render result in Json format',
+              'action': 'store_true',
+              'dest': 'json'}),
+        ]
+    )
+    def stats(self):
+        cache = self.app.name_cache
+        stats = cache.stats()
+
+        if not self.app.pargs.json:
+            title = "TITLE"
+            details = "DETAILS"
+            renderable = [
+                {title: 'file', details: cache.file},
+                {title: 'ttl', details: cache.ttl},
+                {title: 'negative_ttl', details: cache.negative_ttl},
+                {title: 'scopes', details: stats['scopes']},
+            ]
+            for kind, counts in stats['entries'].items():
+                renderable.append({
+                    title: f'{kind}_entries',
+                    details: f"{counts['fresh']} fresh, {counts['expired']} expired, {counts['negative']} negative"
+                })
+            for counter, value in stats['counters'].items():
+                renderable.append({title: counter, details: value})
+
+            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
+        else:
+            renderable = {
+                'file': cache.file,
+                'ttl': cache.ttl,
+                'negative_ttl': cache.negative_ttl
+            }
+            renderable.update(stats)
+            self.app.render(renderable, format=OutputFormat.JSON.value)
+
+    @ex(
+        help='Evict least recently used artifacts from the local download cache',
+        arguments=[
+            (['--max-size'],
+             {'help': 'Evict down to this many bytes, artifact_cache_max_size from the config by default',
+              'action': 'store',
+              'type': int,
+              'dest': 'max_size'}),
+            (['--all'],
+             {'help': 'Remove every cached artifact',
+              'action': 'store_true',
+              'dest': 'all'}),
+        ]
+    )
+    def prune(self):
+        cache = self.app.artifact_cache
+        max_size = 0 if self.app.pargs.all else self.app.pargs.max_size
+
+        try:
+            removed, freed = cache.prune(max_size)
+        except OSError as e:
+            self.app.log.error(f"[cache-prune] Failed to prune the artifact cache: {e}")
+            self.app.render(f"ERROR: {e}\n")
+            return
+
+        self.app.log.debug(f"[cache-prune] Removed {removed} artifacts, {freed} bytes, from {cache.directory}")
+        self.app.render(f"Removed {removed} artifacts, freed {freed} bytes, {cache.size()} bytes left\n")
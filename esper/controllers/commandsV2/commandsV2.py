@@ -1,8 +1,11 @@
+import itertools
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from cement import ex, Controller
 from esperclient import V0CommandRequest
 from esperclient.rest import ApiException
+from tqdm import tqdm
 
 from esper.controllers.enums import (
     OutputFormat, 
@@ -13,9 +16,17 @@ from esper.controllers.enums import (
     CommandDeviceTypeEnum,
     WeekDays
 )
+from esper.core.output_handler import STREAMING_ARGUMENTS, render_list_error
 from esper.ext.api_client import APIClient
+from esper.ext.command_watch import DEFAULT_WATCH_TIMEOUT, WATCH_NO_STATUSES, CommandStatusWatcher, status_device_id
+from esper.ext.commands_api import list_command_requests, list_command_request_statuses, list_device_command_history
 from esper.ext.db_wrapper import DBWrapper
-from esper.ext.utils import validate_creds_exists, parse_error_message
+from esper.ext.pagination import ALL_PAGE_SIZE, MAX_CONCURRENCY_ARGUMENT, PAGINATION_ARGUMENTS, page_size, paginate
+from esper.ext.resolver import NameResolver, is_uuid
+from esper.ext.utils import DEVICES_FILE_ARGUMENT, read_devices_file, validate_creds_exists, parse_error_message
+
+# Page size used to fetch every status of a command request with --watch
+STATUS_PAGE_SIZE = 500
 
 
 class CommandsV2(Controller):
@@ -96,10 +107,30 @@ class CommandsV2(Controller):
         
 
     
-    def _status_basic_response(self, status, limit, format=OutputFormat.TABULATED):
-        self.app.render(f"Total Number of Statuses: {status.count}\n")
+    @staticmethod
+    def _status_row(status):
+        return {
+            'id': status.id,
+            'request_id': status.request,
+            'device_id': status_device_id(status),
+            'state': status.state,
+            'reason': status.reason,
+            'created_on': str(status.created_on),
+            'updated_on': str(status.updated_on)
+        }
+
+    def _render_statuses(self, response, limit, log_prefix):
+        # the page already holds at most `limit` statuses, the slice only guards against a server ignoring it
+        results = response.results if limit is None else itertools.islice(response.results, limit)
+
+        if self.app.pargs.format:
+            self.app.log.debug(f"{log_prefix} Total Number of Statuses: {response.count}")
+            self.app.render((self._status_row(status) for status in results),
+                            format=self.app.pargs.format, output=self.app.pargs.output)
+            return
+
+        self.app.render(f"Total Number of Statuses: {response.count}\n")
         if not self.app.pargs.json:
-            count_stat = 0
             statuses = []
 
             label = {
@@ -109,40 +140,20 @@ class CommandsV2(Controller):
                 'reason': "REASON"
             }
 
-            for status in status.results:
-                if(count_stat < limit):
-                    device_id =  status.device.split('/')[-2]
-                    statuses.append(
-                        {
-                            label['id']: status.id,
-                            label['device']: device_id,
-                            label['state']: status.state,
-                            label['reason']: status.reason,
-                        }
-                    )
-                    count_stat+=1
+            for status in results:
+                statuses.append(
+                    {
+                        label['id']: status.id,
+                        label['device']: status_device_id(status),
+                        label['state']: status.state,
+                        label['reason']: status.reason,
+                    }
+                )
             self.app.render(statuses, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            count_stat = 0
-            statuses = []
-            for status in status.results:
-                if(count_stat < limit):
-                    device_id =  status.device.split('/')[-2]
-                    statuses.append(
-                        {
-                            'id': status.id,
-                            'request_id': status.request,
-                            'device_id': device_id,
-                            'state': status.state,
-                            'reason': status.reason,
-                            'created_on': str(status.created_on),
-                            'updated_on': str(status.updated_on)
-                        }
-                    )
-                    count_stat+=1
+            statuses = [self._status_row(status) for status in results]
             self.app.render(statuses, format=OutputFormat.JSON.value)
 
-
     @ex(
         help='List command requests',
         arguments=[
@@ -166,22 +177,22 @@ class CommandsV2(Controller):
               'choices': CommandEnum.choice_list_lower(),
               'dest': 'command'}),
             (['-l', '--limit'],
-             {'help': 'No. of results',
+             {'help': f'No. of results (default: 10, {ALL_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 10,
+              'default': None,
               'type': int,
               'dest': 'limit'}),
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'}),
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def list(self):
         validate_creds_exists(self.app)
         db = DBWrapper(self.app.creds)
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-        commandsV2_client = APIClient(db.get_configure()).get_commandsV2_api_client()
+        api_client = APIClient(db.get_configure())
+        commandsV2_client = api_client.get_commandsV2_api_client()
         enterprise_id = db.get_enterprise_id()
 
         kwargs = {}
@@ -190,15 +201,13 @@ class CommandsV2(Controller):
 
         if self.app.pargs.device:
             device_name = self.app.pargs.device
-            kw = {'name': device_name}
             try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kw)
-                if not search_response.results or len(search_response.results) == 0:
+                device_id = NameResolver(self.app, db).device_id(device_name)
+                if not device_id:
                     self.app.log.debug(f"[commandsV2-list] Device does not exist with name {device_name}")
                     self.app.render(f'Device does not exist with name {device_name}\n')
                     return
-                response = search_response.results[0]
-                kwargs['devices'] = response.id
+                kwargs['devices'] = device_id
             except ApiException as e:
                 self.app.log.error(f"[commandsV2-list] Failed to list devices: {e}")
                 self.app.render(f"ERROR: {parse_error_message(self.app, e)}")
@@ -210,19 +219,78 @@ class CommandsV2(Controller):
         if self.app.pargs.command:
             kwargs['command'] = self.app.pargs.command.upper()
             
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 10)
+
         try:
-            response = commandsV2_client.list_command_request(enterprise_id, **kwargs)
+            if self.app.pargs.all:
+                # `--limit` is the page size, every command request is rendered
+                response = paginate(
+                    lambda page_limit, page_offset: list_command_requests(
+                        api_client.api_client, enterprise_id, page_limit, page_offset, **kwargs),
+                    limit, 0, True, self.app.pargs.max_concurrency)
+                limit = None
+            else:
+                response = commandsV2_client.list_command_request(enterprise_id, **kwargs)
+
+            self._render_command_requests(response, limit)
         except ApiException as e:
             self.app.log.error(f"[commandsV2-list] Failed to list command requests: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
+            render_list_error(self.app, parse_error_message(self.app, e))
+
+    @staticmethod
+    def _command_request_row(commandreq):
+        if commandreq.schedule_args is None:
+            schedule_args = None
+        else:
+            schedule_args = {
+                "name": commandreq.schedule_args.name,
+                "start_datetime": str(commandreq.schedule_args.start_datetime),
+                "end_datetime": str(commandreq.schedule_args.end_datetime),
+                "time_type": commandreq.schedule_args.time_type,
+                "window_start_time": str(commandreq.schedule_args.window_start_time),
+                "window_end_time": str(commandreq.schedule_args.window_end_time),
+                "days": commandreq.schedule_args.days
+            }
+        command_args = {
+            "app_state": commandreq.command_args.app_state,
+            "app_version": commandreq.command_args.app_version,
+            "custom_settings_config": commandreq.command_args.custom_settings_config,
+            "device_alias_name": commandreq.command_args.device_alias_name,
+            "message": commandreq.command_args.message,
+            "package_name": commandreq.command_args.package_name,
+            "policy_url": commandreq.command_args.policy_url,
+            "state": commandreq.command_args.state,
+            "wifi_access_points": commandreq.command_args.wifi_access_points
+        }
+
+        return {
+            'id': commandreq.id,
+            'command': commandreq.command,
+            'command_type': commandreq.command_type,
+            'issued_by': commandreq.issued_by,
+            "devices": commandreq.devices,
+            "device_type": commandreq.device_type,
+            "groups": commandreq.groups,
+            "command_args": command_args,
+            "schedule": commandreq.schedule,
+            "schedule_args": schedule_args,
+            "created_on": str(commandreq.created_on),
+            "status": str(commandreq.status)
+        }
+
+    def _render_command_requests(self, response, limit):
+        # without --all, only the first `limit` command requests are rendered
+        results = response.results if limit is None else itertools.islice(response.results, limit)
+
+        if self.app.pargs.format:
+            self.app.log.debug(f"[commandsV2-list] Total Number of Command Requests: {response.count}")
+            self.app.render((self._command_request_row(commandreq) for commandreq in results),
+                            format=self.app.pargs.format, output=self.app.pargs.output)
             return
-        
-        limit = self.app.pargs.limit
 
         self.app.render(f"Total Number of Command Requests: {response.count}\n")
         if not self.app.pargs.json:
             commandreqs = []
-            count_req = 0
             label = {
                 'id': "RQUEST ID",
                 'command': "COMMAND",
@@ -231,72 +299,59 @@ class CommandsV2(Controller):
                 'created_on': "CREATED ON"
             }
 
-            for commandreq in response.results:
-                if(count_req < limit):
-                    issued_by = commandreq.issued_by.replace("'",'"')
-                    issued_by_json = json.loads(issued_by)
-                    commandreqs.append(
-                        {
-                            label['id']: commandreq.id,
-                            label['command']: commandreq.command,
-                            label['issued_by']: issued_by_json["username"],
-                            label['command_type']: commandreq.command_type,
-                            label['created_on']: commandreq.created_on
-                        }
-                    )
-                    count_req+=1
+            for commandreq in results:
+                issued_by = commandreq.issued_by.replace("'",'"')
+                issued_by_json = json.loads(issued_by)
+                commandreqs.append(
+                    {
+                        label['id']: commandreq.id,
+                        label['command']: commandreq.command,
+                        label['issued_by']: issued_by_json["username"],
+                        label['command_type']: commandreq.command_type,
+                        label['created_on']: commandreq.created_on
+                    }
+                )
             self.app.render(commandreqs, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            commandreqs = []
-            count_req = 0
-            for commandreq in response.results:
-                if(count_req < limit):
-                    if commandreq.schedule_args is None:
-                        schedule_args = None
-                    else:
-                        schedule_args = {
-                            "name": commandreq.schedule_args.name,
-                            "start_datetime": str(commandreq.schedule_args.start_datetime),
-                            "end_datetime": str(commandreq.schedule_args.end_datetime),
-                            "time_type": commandreq.schedule_args.time_type,
-                            "window_start_time": str(commandreq.schedule_args.window_start_time),
-                            "window_end_time": str(commandreq.schedule_args.window_end_time),
-                            "days": commandreq.schedule_args.days
-                        }
-                    command_args = {
-                        "app_state": commandreq.command_args.app_state,
-                        "app_version": commandreq.command_args.app_version,
-                        "custom_settings_config": commandreq.command_args.custom_settings_config,
-                        "device_alias_name": commandreq.command_args.device_alias_name,
-                        "message": commandreq.command_args.message,
-                        "package_name": commandreq.command_args.package_name,
-                        "policy_url": commandreq.command_args.policy_url,
-                        "state": commandreq.command_args.state,
-                        "wifi_access_points": commandreq.command_args.wifi_access_points
-                    }
-
-                    commandreqs.append(
-                        {   
-                            'id': commandreq.id,
-                            'command': commandreq.command,
-                            'command_type': commandreq.command_type,
-                            'issued_by': commandreq.issued_by,
-                            "devices": commandreq.devices,
-                            "device_type": commandreq.device_type,
-                            "groups": commandreq.groups,
-                            "command_args": command_args,
-                            "schedule": commandreq.schedule,
-                            "schedule_args": schedule_args,
-                            "created_on": str(commandreq.created_on),
-                            "status": str(commandreq.status)
-                        }
-                    )
-                    count_req+=1
+            commandreqs = [self._command_request_row(commandreq) for commandreq in results]
             self.app.render(commandreqs, format=OutputFormat.JSON.value)
         
         
 
 
+    def _watch_status(self, fetch, request_id):
+        """
+        Render the statuses which changed on each poll, followed by the count of devices per state
+        """
+        watcher = CommandStatusWatcher(fetch, self.app.pargs.interval, self.app.pargs.max_interval,
+                                       self.app.pargs.timeout)
+        histogram = None
+        try:
+            for changed in watcher.watch():
+                if self.app.pargs.json:
+                    self.app.render(({'device_id': status_device_id(status), 'state': status.state,
+                                      'reason': status.reason} for status in changed),
+                                    format=OutputFormat.NDJSON.value)
+                    continue
+
+                for status in changed:
+                    self.app.render(f"{status_device_id(status)}  {status.state}  {status.reason or ''}\n")
+
+                if watcher.histogram() != histogram:
+                    histogram = watcher.histogram()
+                    states = ', '.join(f'{state}: {count}' for state, count in sorted(histogram.items()))
+                    self.app.render(f"[{sum(histogram.values())} devices] {states}\n")
+        except ApiException as e:
+            self.app.log.error(f"[commandsV2-status] Failed to show status for id {request_id}: {e}")
+            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
+            self.app.exit_code = 1
+            return
+
+        self.app.exit_code = watcher.exit_code()
+        if self.app.exit_code == WATCH_NO_STATUSES:
+            self.app.render(f"No statuses for command request {request_id}\n")
+        self.app.log.debug(f"[commandsV2-status] Watch of {request_id} done, exit code {self.app.exit_code}")
+
     @ex(
         help='Show command request status',
         arguments=[
@@ -314,22 +369,50 @@ class CommandsV2(Controller):
               'action': 'store',
               'dest': 'state'}),
             (['-l', '--limit'],
-             {'help': 'No. of results',
+             {'help': f'No. of results (default: 10, {STATUS_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 10,
+              'default': None,
               'type': int,
               'dest': 'limit'}),
+            (['-i', '--offset'],
+             {'help': 'The initial index from which to return the results',
+              'action': 'store',
+              'default': 0,
+              'dest': 'offset'}),
+            (['-w', '--watch'],
+             {'help': 'Poll until every device reaches a final state, printing the devices whose state changed. '
+                      'Exits with 0 if all succeeded, 2 if some did not, 3 on timeout, 4 if the request has no '
+                      'statuses',
+              'action': 'store_true',
+              'dest': 'watch'}),
+            (['--interval'],
+             {'help': 'Seconds between polls while states change, with --watch',
+              'action': 'store',
+              'default': 2.0,
+              'type': float,
+              'dest': 'interval'}),
+            (['--max-interval'],
+             {'help': 'Longest wait between polls once states stop changing, with --watch',
+              'action': 'store',
+              'default': 30.0,
+              'type': float,
+              'dest': 'max_interval'}),
+            (['--timeout'],
+             {'help': f'Stop watching after this many seconds (default: {DEFAULT_WATCH_TIMEOUT})',
+              'action': 'store',
+              'default': DEFAULT_WATCH_TIMEOUT,
+              'type': float,
+              'dest': 'timeout'}),
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'}),
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def status(self):
         validate_creds_exists(self.app)
         db = DBWrapper(self.app.creds)
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-        commandsV2_client = APIClient(db.get_configure()).get_commandsV2_api_client()
+        api_client = APIClient(db.get_configure()).api_client
         enterprise_id = db.get_enterprise_id()
 
         if self.app.pargs.request:
@@ -342,42 +425,49 @@ class CommandsV2(Controller):
         kwargs = {}
         if self.app.pargs.device:
             device_name = self.app.pargs.device
-            kw = {'name': device_name}
             try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kw)
-                if not search_response.results or len(search_response.results) == 0:
+                device_id = device_name if is_uuid(device_name) else NameResolver(self.app, db).device_id(device_name)
+                if not device_id:
                     self.app.log.debug(f'[commandsV2-status] Device does not exist with name {device_name}')
                     self.app.render(f'Device does not exist with name {device_name}\n')
                     return
-                response = search_response.results[0]
-                kwargs['device'] = response.id
+                kwargs['device'] = device_id
             except ApiException as e:
                 self.app.log.error(f"[commandsV2-status] Failed to list devices: {e}")
                 self.app.render(f"ERROR: {parse_error_message(self.app, e)}")
                 return
 
+        if self.app.pargs.state and self.app.pargs.watch:
+            # devices leaving the filtered state would drop out of the polls and never look finished
+            self.app.log.debug('[commandsV2-status] --state cannot be combined with --watch')
+            self.app.render('--state cannot be combined with --watch\n')
+            self.app.exit_code = 1
+            return
+
         if self.app.pargs.state:
             kwargs['state'] = CommandState[self.app.pargs.state.upper()].value
 
+        if self.app.pargs.watch:
+            self._watch_status(
+                lambda: paginate(
+                    lambda page_limit, page_offset: list_command_request_statuses(
+                        api_client, enterprise_id, request_id, page_limit, page_offset, **kwargs),
+                    STATUS_PAGE_SIZE, 0, True, self.app.pargs.max_concurrency).results,
+                request_id)
+            return
+
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 10, STATUS_PAGE_SIZE)
         try:
-            response = commandsV2_client.get_command_request_status(enterprise_id, request_id, **kwargs)     
+            response = paginate(
+                lambda page_limit, page_offset: list_command_request_statuses(
+                    api_client, enterprise_id, request_id, page_limit, page_offset, **kwargs),
+                limit, self.app.pargs.offset, self.app.pargs.all, self.app.pargs.max_concurrency)
+            # with --all, `--limit` is the page size and every status is rendered
+            self._render_statuses(response, None if self.app.pargs.all else limit, '[commandsV2-status]')
         except ApiException as e:
             self.app.log.error(f"[commandsV2-status] Failed to show status for id {request_id}: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-            return
-
-        limit = self.app.pargs.limit
-        
-        if not self.app.pargs.json:
-            renderable = self._status_basic_response(response, limit)
-            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
-        else:
-            renderable = self._status_basic_response(response, limit, OutputFormat.JSON)
-            self.app.render(renderable, format=OutputFormat.JSON.value)
-        
+            render_list_error(self.app, parse_error_message(self.app, e))
 
-
-        
     @ex(
         help='Show device command history',
         arguments=[
@@ -391,35 +481,36 @@ class CommandsV2(Controller):
               'action': 'store',
               'dest': 'state'}),
             (['-l', '--limit'],
-             {'help': 'No. of results',
+             {'help': f'No. of results (default: 10, {STATUS_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 10,
+              'default': None,
               'type': int,
               'dest': 'limit'}),
+            (['-i', '--offset'],
+             {'help': 'The initial index from which to return the results',
+              'action': 'store',
+              'default': 0,
+              'dest': 'offset'}),
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'}),
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def history(self):
         validate_creds_exists(self.app)
         db = DBWrapper(self.app.creds)
-        commandsV2_client = APIClient(db.get_configure()).get_commandsV2_api_client()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
+        api_client = APIClient(db.get_configure()).api_client
         enterprise_id = db.get_enterprise_id()
 
         if self.app.pargs.device:
             device_name = self.app.pargs.device
-            kw = {'name': device_name}
             try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kw)
-                if not search_response.results or len(search_response.results) == 0:
+                device_id = device_name if is_uuid(device_name) else NameResolver(self.app, db).device_id(device_name)
+                if not device_id:
                     self.app.log.debug(f'[commandsV2-history] Device does not exist with name {device_name}')
                     self.app.render(f'Device does not exist with name {device_name}\n')
                     return
-                response = search_response.results[0]
-                device_id = response.id
             except ApiException as e:
                 self.app.log.error(f"[commandsV2-history] Failed to list devices: {e}")
                 self.app.render(f"ERROR: {parse_error_message(self.app, e)}")
@@ -433,24 +524,73 @@ class CommandsV2(Controller):
         if self.app.pargs.state:
             kwargs['state'] = CommandState[self.app.pargs.state.upper()].value
 
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 10, STATUS_PAGE_SIZE)
         try:
-            response = commandsV2_client.get_device_command_history(enterprise_id, device_id, **kwargs)
+            response = paginate(
+                lambda page_limit, page_offset: list_device_command_history(
+                    api_client, enterprise_id, device_id, page_limit, page_offset, **kwargs),
+                limit, self.app.pargs.offset, self.app.pargs.all, self.app.pargs.max_concurrency)
+            self._render_statuses(response, None if self.app.pargs.all else limit, '[commandsV2-history]')
         except ApiException as e:
             self.app.log.error(f"[commandsV2-history] Failed to show history for id {device_id}: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-            return
-        
-        limit = self.app.pargs.limit
+            render_list_error(self.app, parse_error_message(self.app, e))
+
+    def _resolve_targets(self, db, enterprise_id, devices, groups):
+        """
+        Resolve device names to ids and check that the group ids exist, all concurrently on one pool
+        bounded by `--max-concurrency`. Every unknown device or group is reported, not only the first one.
+        :return: (device_ids, group_ids), None on error
+        """
+        resolver = NameResolver(self.app, db)
+        group_client = APIClient(db.get_configure()).get_group_api_client()
+        devices = list(dict.fromkeys(devices or []))
+        groups = list(dict.fromkeys(groups or []))
+
+        def resolve_device(name):
+            return name if is_uuid(name) else resolver.device_id(name)
+
+        def validate_group(group_id):
+            group_client.get_group_by_id(group_id, enterprise_id)
+            return group_id
+
+        resolved_devices = {}
+        group_errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.app.pargs.max_concurrency)) as executor, \
+                tqdm(total=len(devices) + len(groups), unit='target', desc='Resolving targets', leave=False) as pbar:
+            futures = {executor.submit(resolve_device, name): ('device', name) for name in devices}
+            futures.update({executor.submit(validate_group, group_id): ('group', group_id) for group_id in groups})
+            try:
+                for future in as_completed(futures):
+                    kind, target = futures[future]
+                    if kind == 'device':
+                        resolved_devices[target] = future.result()
+                    else:
+                        try:
+                            future.result()
+                        except ApiException as e:
+                            self.app.log.error(f"[commandsV2-command] Group does not exist with id {target}: {e}")
+                            group_errors[target] = e
+                    pbar.update(1)
+            except ApiException as e:
+                for future in futures:
+                    future.cancel()
+                self.app.log.error(f"[commandsV2-command] Failed to list devices: {e}")
+                self.app.render(f"ERROR: {parse_error_message(self.app, e)}")
+                return None
 
-        if not self.app.pargs.json:
-            renderable = self._status_basic_response(response, limit)
-            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
-        else:
-            renderable = self._status_basic_response(response, limit, OutputFormat.JSON)
-            self.app.render(renderable, format=OutputFormat.JSON.value)
+        not_found = [name for name in devices if not resolved_devices[name]]
+        if not_found:
+            self.app.log.debug(f"[commandsV2-command] Devices do not exist with names {', '.join(not_found)}")
+            self.app.render(f"Devices do not exist with names {', '.join(not_found)}")
+            return None
 
+        if group_errors:
+            for group_id, e in group_errors.items():
+                self.app.render(f"ERROR: {group_id}: {parse_error_message(self.app, e)}")
+            return None
+
+        return [resolved_devices[name] for name in devices], groups
 
-        
     @ex(
         help='Fire commands to devices and groups',
         arguments=[
@@ -464,11 +604,13 @@ class CommandsV2(Controller):
               'nargs': "*",
               'type': str,
               'dest': 'devices'}),
+            DEVICES_FILE_ARGUMENT,
             (['-g', '--groups'],
              {'help': 'List of group ids, space separated.',
               'nargs': "*",
               'type': str,
               'dest': 'groups'}),
+            MAX_CONCURRENCY_ARGUMENT,
             (['-dt', '--device_type'],
              {'help': 'Device type.',
               'action': 'store',
@@ -567,11 +709,19 @@ class CommandsV2(Controller):
         commandsV2_client = APIClient(db.get_configure()).get_commandsV2_api_client()
         enterprise_id = db.get_enterprise_id()
 
-        devices = self.app.pargs.devices
+        devices = list(self.app.pargs.devices or [])
         device_type = self.app.pargs.device_type
         groups = self.app.pargs.groups
         schedule = self.app.pargs.schedule.upper()
 
+        if self.app.pargs.devices_file:
+            try:
+                devices.extend(read_devices_file(self.app.pargs.devices_file))
+            except OSError as e:
+                self.app.log.error(f"[commandsV2-command] Failed to read devices file: {e}")
+                self.app.render(f"ERROR: {e.strerror}: {self.app.pargs.devices_file}")
+                return
+
         if self.app.pargs.command:
             command = self.app.pargs.command.upper()
         else:
@@ -628,35 +778,12 @@ class CommandsV2(Controller):
                 'days': days
             }  
     
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-        device_ids = []
-        for device_name in devices:
-            kwargs = {'name': device_name}
-            try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.log.debug(f'[commandsV2-command] Device does not exist with name {device_name}')
-                    self.app.render(f'Device does not exist with name {device_name}')
-                    return
-                response = search_response.results[0]
-                device_ids.append(response.id)
-            except ApiException as e:
-                self.app.log.error(f"Failed to list devices: {e}")
-                self.app.render(f"ERROR: {parse_error_message(self.app, e)}")
-                return
-
-        if groups:
-            group_client = APIClient(db.get_configure()).get_group_api_client()
-            group_ids = []
-            for group_id in groups:
-                try:
-                    response = group_client.get_group_by_id(group_id, enterprise_id)
-                    group_ids.append(group_id)
-                except ApiException as e:
-                    self.app.log.error(f"[] Group does not exist with id {group_id}: {e}")
-                    self.app.render(f"ERROR: {parse_error_message(self.app, e)}")
-                    return
+        targets = self._resolve_targets(db, enterprise_id, devices, groups)
+        if targets is None:
+            return
 
+        device_ids, group_ids = targets
+        parsed_custom_config = None
         if self.app.pargs.custom_settings_config:
             try:
                 parsed_custom_config = json.loads(self.app.pargs.custom_settings_config)
@@ -684,6 +811,7 @@ class CommandsV2(Controller):
 
         command_request = V0CommandRequest( command_type=command_type,
                                             devices=device_ids,
+                                            groups=group_ids,
                                             device_type=device_type,
                                             command=command,
                                             command_args=command_args, 
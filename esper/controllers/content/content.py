@@ -1,18 +1,27 @@
 import os
-import random
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from pathlib import Path
 
 from cement import ex, Controller
+from cement.utils import fs
 from esperclient.rest import ApiException
 from esperclient import Content
 
 from esper.controllers.enums import OutputFormat
+from esper.core.output_handler import STREAMING_ARGUMENTS, render_list_error
 from esper.ext.api_client import APIClient
+from esper.ext.artifact_cache import clone_file
 from esper.ext.db_wrapper import DBWrapper
+from esper.ext.download import download_batch
+from esper.ext.content_sync import LocalHashCache, content_size, plan_sync
+from esper.ext.pagination import ALL_PAGE_SIZE, MAX_CONCURRENCY_ARGUMENT, PAGINATION_ARGUMENTS, page_size, paginate
+from esper.ext.upload import UPLOAD_BATCH_ARGUMENTS, UploadJournal, expand_upload_paths, upload_batch, upload_file
 from esper.ext.utils import validate_creds_exists, parse_error_message
 
+# Page size used to list the whole content library
+CONTENT_PAGE_SIZE = 500
+
 
 class Content(Controller):
     class Meta:
@@ -36,9 +45,9 @@ class Content(Controller):
               'action': 'store',
               'dest': 'search'}),
             (['-l', '--limit'],
-             {'help': 'Number of results to return per page',
+             {'help': f'Number of results to return per page (default: 20, {ALL_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 20,
+              'default': None,
               'dest': 'limit'}),
             (['-i', '--offset'],
              {'help': 'The initial index from which to return the results',
@@ -49,7 +58,7 @@ class Content(Controller):
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'})
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def list(self):
         validate_creds_exists(self.app)
@@ -58,7 +67,7 @@ class Content(Controller):
         enterprise_id = db.get_enterprise_id()
 
         search = self.app.pargs.search
-        limit = self.app.pargs.limit
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 20)
         offset = self.app.pargs.offset
 
         kwargs = {}
@@ -66,10 +75,42 @@ class Content(Controller):
             kwargs['search'] = search
 
         try:
-            response = content_client.get_all_content(enterprise_id, limit=limit, offset=offset, **kwargs)
+            response = paginate(
+                lambda page_limit, page_offset: content_client.get_all_content(
+                    enterprise_id, limit=page_limit, offset=page_offset, **kwargs),
+                limit, offset, self.app.pargs.all, self.app.pargs.max_concurrency)
+            # with --all, the remaining pages are fetched while rendering
+            self._render_contents(response)
         except ApiException as e:
             self.app.log.error(f"[content-list] Failed to list contents: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
+            render_list_error(self.app, parse_error_message(self.app, e))
+
+    @staticmethod
+    def _content_list_row(content):
+        return {
+            'id': content.id,
+            'download_url': content.download_url,
+            'name': content.name,
+            'key': content.key,
+            'is_dir': content.is_dir,
+            'kind': content.kind,
+            'hash': content.hash,
+            'size': content.size,
+            'path': content.path,
+            'permissions': content.permissions,
+            'tags': content.tags,
+            'description': content.description,
+            'created': str(content.created),
+            'modified': str(content.modified),
+            'enterprise': content.enterprise,
+            'owner': str(content.owner)
+        }
+
+    def _render_contents(self, response):
+        if self.app.pargs.format:
+            self.app.log.debug(f"[content-list] Total Number of Contents: {response.count}")
+            self.app.render((self._content_list_row(content) for content in response.results),
+                            format=self.app.pargs.format, output=self.app.pargs.output)
             return
 
         self.app.render(f"Total Number of Contents: {response.count}")
@@ -98,28 +139,7 @@ class Content(Controller):
                 )
             self.app.render(contents, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            contents = []
-            for content in response.results:
-                contents.append(
-                    {
-                        'id': content.id,
-                        'download_url': content.download_url,
-                        'name': content.name,
-                        'key': content.key,
-                        'is_dir': content.is_dir,
-                        'kind': content.kind,
-                        'hash': content.hash,
-                        'size': content.size,
-                        'path': content.path,
-                        'permissions': content.permissions,
-                        'tags': content.tags,
-                        'description': content.description,
-                        'created': str(content.created),
-                        'modified': str(content.modified),
-                        'enterprise': content.enterprise,
-                        'owner': str(content.owner)
-                    }
-                )
+            contents = [self._content_list_row(content) for content in response.results]
             self.app.render(contents, format=OutputFormat.JSON.value)
 
 
@@ -209,6 +229,10 @@ class Content(Controller):
             (['content_file'],
              {'help': 'File to upload',
               'action': 'store'}),
+            (['--chunked'],
+             {'help': 'Send the file with chunked transfer encoding, without a Content-Length',
+              'action': 'store_true',
+              'dest': 'chunked'}),
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
@@ -218,23 +242,26 @@ class Content(Controller):
     def upload(self):
         validate_creds_exists(self.app)
         db = DBWrapper(self.app.creds)
-        content_client = APIClient(db.get_configure()).get_content_api_client()
+        api_client = APIClient(db.get_configure()).api_client
         enterprise_id = db.get_enterprise_id()
 
         content_file = self.app.pargs.content_file
 
         try:
             filesize = os.path.getsize(content_file)
-            random_no = random.randint(1, 50)
+        except OSError as e:
+            self.app.log.error(f"[content-upload] Failed to read the content file: {e}")
+            self.app.render(f"ERROR: {e.strerror}: {content_file} \n")
+            return
+
+        try:
+            # the file is streamed from disk, the bar follows the bytes as they are sent
             with tqdm(total=int(filesize), unit='B', unit_scale=True, miniters=1, desc='Uploading......',
                       unit_divisor=1024) as pbar:
-                for i in range(100):
-                    if i == random_no:
-                        response = content_client.post_content(enterprise_id, content_file)
-
-                    time.sleep(0.07)
-                    pbar.set_postfix(file=Path(content_file).name, refresh=False)
-                    pbar.update(int(filesize / 100))
+                pbar.set_postfix(file=Path(content_file).name, refresh=False)
+                response = upload_file(api_client, '/v0/enterprise/{enterprise_id}/content/upload/',
+                                       {'enterprise_id': enterprise_id}, 'key', content_file, 'Content',
+                                       progress=pbar.update, chunked=self.app.pargs.chunked)
         except ApiException as e:
             self.app.log.error(f"[content-upload] Failed to upload content: {e}")
             self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
@@ -247,6 +274,375 @@ class Content(Controller):
             renderable = self._content_basic_response(response, OutputFormat.JSON)
             self.app.render(renderable, format=OutputFormat.JSON.value)
 
+    @ex(
+        help='Upload every file of a directory, or the files matching a glob pattern, concurrently',
+        label='upload-batch',
+        arguments=[
+            (['path'],
+             {'help': 'Directory of files, or glob pattern like "media/**/*.mp4"',
+              'action': 'store'}),
+            (['--chunked'],
+             {'help': 'Send the files with chunked transfer encoding, without a Content-Length',
+              'action': 'store_true',
+              'dest': 'chunked'}),
+        ] + UPLOAD_BATCH_ARGUMENTS
+    )
+    def upload_batch(self):
+        paths = expand_upload_paths(self.app.pargs.path)
+        if not paths:
+            self.app.log.debug(f"[content-upload-batch] No files match {self.app.pargs.path}")
+            self.app.render(f"No files match {self.app.pargs.path}\n")
+            return
+
+        validate_creds_exists(self.app)
+        db = DBWrapper(self.app.creds)
+        api_client = APIClient(db.get_configure()).api_client
+        enterprise_id = db.get_enterprise_id()
+        chunked = self.app.pargs.chunked
+
+        def upload(path, progress):
+            response = upload_file(api_client, '/v0/enterprise/{enterprise_id}/content/upload/',
+                                   {'enterprise_id': enterprise_id}, 'key', path, 'Content', progress=progress,
+                                   chunked=chunked)
+            return 'uploaded', {'content_id': response.id}
+
+        def format_error(e):
+            self.app.log.error(f"[content-upload-batch] Failed to upload a file: {e}")
+            return parse_error_message(self.app, e) if isinstance(e, ApiException) else str(e)
+
+        journal = UploadJournal(self.app.pargs.journal, 'content')
+        failed = []
+
+        def manifest():
+            for row in upload_batch(paths, upload, journal, self.app.pargs.max_concurrency, format_error):
+                if row['status'] == 'failed':
+                    failed.append(row['file'])
+                yield row
+
+        self.app.render(manifest(), format=OutputFormat.NDJSON.value, output=self.app.pargs.output)
+        if failed:
+            self.app.log.debug(f"[content-upload-batch] {len(failed)} of {len(paths)} files failed")
+            self.app.exit_code = 1
+
+    @ex(
+        help='Sync the files of a local directory to the content library, uploading only new and changed files',
+        arguments=[
+            (['directory'],
+             {'help': 'Local directory, its sub-directories are not synced',
+              'action': 'store'}),
+            (['--delete'],
+             {'help': 'Also delete contents at the root of the library with no local file, and the previous '
+                      'versions of changed files once they are uploaded',
+              'action': 'store_true',
+              'dest': 'delete'}),
+            (['--delete-duplicates'],
+             {'help': 'Also delete the extra contents with the name of an unchanged file, keeping the one matching it',
+              'action': 'store_true',
+              'dest': 'delete_duplicates'}),
+            (['--dry-run'],
+             {'help': 'Print the planned uploads and deletes without running them',
+              'action': 'store_true',
+              'dest': 'dry_run'}),
+            (['--chunked'],
+             {'help': 'Send the files with chunked transfer encoding, without a Content-Length',
+              'action': 'store_true',
+              'dest': 'chunked'}),
+            MAX_CONCURRENCY_ARGUMENT,
+            (['-j', '--json'],
+             {'help': 'Render result in Json format',
+              'action': 'store_true',
+              'dest': 'json'})
+        ]
+    )
+    def sync(self):
+        directory = self.app.pargs.directory
+        if not os.path.isdir(directory):
+            self.app.log.debug(f"[content-sync] {directory} is not a directory")
+            self.app.render(f"ERROR: {directory} is not a directory \n")
+            self.app.exit_code = 1
+            return
+
+        validate_creds_exists(self.app)
+        db = DBWrapper(self.app.creds)
+        client = APIClient(db.get_configure())
+        content_client = client.get_content_api_client()
+        enterprise_id = db.get_enterprise_id()
+        max_concurrency = max(1, self.app.pargs.max_concurrency)
+
+        local_files = {os.path.basename(path): path for path in expand_upload_paths(directory)}
+        hash_cache = LocalHashCache(fs.abspath(self.app.config.get('esper', 'content_sync_cache_file')))
+
+        try:
+            contents = paginate(
+                lambda limit, offset: content_client.get_all_content(enterprise_id, limit=limit, offset=offset),
+                CONTENT_PAGE_SIZE, 0, fetch_all=True, max_concurrency=max_concurrency)
+            actions, unchanged = plan_sync(local_files, contents.results, hash_cache)
+        except ApiException as e:
+            self.app.log.error(f"[content-sync] Failed to list contents: {e}")
+            self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
+            self.app.exit_code = 1
+            return
+        finally:
+            self._save_hash_cache(hash_cache)
+
+        def wanted(action):
+            if action.action == 'upload':
+                return True
+            if action.reason == 'duplicate':
+                return self.app.pargs.delete_duplicates
+            return self.app.pargs.delete
+
+        actions = [action for action in actions if wanted(action)]
+
+        if self.app.pargs.dry_run:
+            rows = [self._sync_row(action, 'planned') for action in actions]
+        else:
+            rows = self._run_sync(client, enterprise_id, actions, max_concurrency)
+
+        self._render_sync(rows, unchanged)
+        if any(row['status'] == 'failed' for row in rows):
+            self.app.exit_code = 1
+
+    def _save_hash_cache(self, hash_cache):
+        try:
+            hash_cache.save()
+        except OSError as e:
+            self.app.log.warning(f"[content-sync] Failed to save the hash cache: {e}")
+
+    @staticmethod
+    def _sync_row(action, status, content_id=None, error=None):
+        return {
+            'action': action.action,
+            'name': action.name,
+            'reason': action.reason,
+            'content_id': content_id or action.content_id,
+            'status': status,
+            'error': error
+        }
+
+    def _run_sync(self, client, enterprise_id, actions, max_concurrency):
+        """
+        Run the deletes and uploads of a sync concurrently. The previous versions of a changed file are
+        deleted only once the new one is uploaded.
+        """
+        content_client = client.get_content_api_client()
+        chunked = self.app.pargs.chunked
+        uploads = {action.path: action for action in actions if action.action == 'upload'}
+        replaced = {}
+        for action in actions:
+            if action.reason == 'replaced':
+                replaced.setdefault(action.name, []).append(action)
+
+        def upload(path, progress):
+            response = upload_file(client.api_client, '/v0/enterprise/{enterprise_id}/content/upload/',
+                                   {'enterprise_id': enterprise_id}, 'key', path, 'Content', progress=progress,
+                                   chunked=chunked)
+            return 'uploaded', {'content_id': response.id}
+
+        def format_error(e, failure='upload a file'):
+            self.app.log.error(f"[content-sync] Failed to {failure}: {e}")
+            return parse_error_message(self.app, e) if isinstance(e, ApiException) else str(e)
+
+        rows = []
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            deletes = {executor.submit(content_client.delete_content, action.content_id, enterprise_id): action
+                       for action in actions if action.action == 'delete' and action.reason != 'replaced'}
+
+            for row in upload_batch(list(uploads), upload, None, max_concurrency, format_error):
+                action = uploads[row['file']]
+                rows.append(self._sync_row(action, row['status'], row.get('content_id'), row['error']))
+                if row['status'] == 'uploaded':
+                    deletes.update({executor.submit(content_client.delete_content, replaced_action.content_id,
+                                                    enterprise_id): replaced_action
+                                    for replaced_action in replaced.get(action.name, [])})
+
+            for future in as_completed(deletes):
+                action = deletes[future]
+                try:
+                    future.result()
+                    rows.append(self._sync_row(action, 'deleted'))
+                except Exception as e:
+                    error = format_error(e, f'delete content {action.content_id}')
+                    rows.append(self._sync_row(action, 'failed', error=error))
+
+        return rows
+
+    def _render_sync(self, rows, unchanged):
+        if self.app.pargs.json:
+            self.app.render({'unchanged': unchanged, 'actions': rows}, format=OutputFormat.JSON.value)
+            return
+
+        if rows:
+            renderable = [{key.upper(): value for key, value in row.items()} for row in rows]
+            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
+
+        def count(action, status):
+            return sum(1 for row in rows if row['action'] == action and row['status'] == status)
+
+        if self.app.pargs.dry_run:
+            self.app.render(f"Would upload {count('upload', 'planned')}, delete {count('delete', 'planned')}, "
+                            f"{unchanged} unchanged\n")
+        else:
+            failed = sum(1 for row in rows if row['status'] == 'failed')
+            self.app.render(f"Uploaded {count('upload', 'uploaded')}, deleted {count('delete', 'deleted')}, "
+                            f"{unchanged} unchanged, {failed} failed\n")
+
+    @ex(
+        help='Download contents, resuming interrupted downloads and verifying their hash',
+        arguments=[
+            (['content_ids'],
+             {'help': 'Content ids, space separated',
+              'nargs': '*',
+              'default': []}),
+            (['--all'],
+             {'help': 'Download every content of the library',
+              'action': 'store_true',
+              'dest': 'all'}),
+            (['-d', '--dest'],
+             {'help': 'Destination directory (default: current directory)',
+              'action': 'store',
+              'default': '.',
+              'dest': 'dest'}),
+            (['--connections'],
+             {'help': 'Number of byte ranges of each file downloaded in parallel, when the server supports ranges',
+              'action': 'store',
+              'type': int,
+              'default': 1,
+              'dest': 'connections'}),
+            (['--no-cache'],
+             {'help': 'Always download, without using or filling the local artifact cache',
+              'action': 'store_true',
+              'dest': 'no_cache'}),
+            MAX_CONCURRENCY_ARGUMENT,
+            (['-j', '--json'],
+             {'help': 'Render result in Json format',
+              'action': 'store_true',
+              'dest': 'json'})
+        ]
+    )
+    def download(self):
+        content_ids = self.app.pargs.content_ids
+        if bool(content_ids) == self.app.pargs.all:
+            self.app.log.debug('[content-download] Either content ids or --all must be given')
+            self.app.render('Either content ids or --all must be given\n')
+            return
+
+        validate_creds_exists(self.app)
+        db = DBWrapper(self.app.creds)
+        content_client = APIClient(db.get_configure()).get_content_api_client()
+        enterprise_id = db.get_enterprise_id()
+        max_concurrency = max(1, self.app.pargs.max_concurrency)
+
+        try:
+            if self.app.pargs.all:
+                contents = paginate(
+                    lambda limit, offset: content_client.get_all_content(enterprise_id, limit=limit, offset=offset),
+                    CONTENT_PAGE_SIZE, 0, fetch_all=True, max_concurrency=max_concurrency).results
+            else:
+                with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                    contents = executor.map(lambda content_id: content_client.get_content(content_id, enterprise_id),
+                                            content_ids)
+            contents = [content for content in contents if not content.is_dir]
+        except ApiException as e:
+            self.app.log.error(f"[content-download] Failed to show details of a content: {e}")
+            self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
+            self.app.exit_code = 1
+            return
+
+        destination_dir = self.app.pargs.dest
+        fs.ensure_dir_exists(destination_dir)
+        contents_by_file = self._download_destinations(contents, destination_dir)
+        cache = None if self.app.pargs.no_cache else self.app.artifact_cache
+
+        rows = []
+        downloads = []
+        for file, content in contents_by_file.items():
+            row = self._copy_cached_content(cache, content, file) if cache else None
+            if row:
+                rows.append(row)
+            else:
+                downloads.append((content.download_url, file, content.hash, content_size(content)))
+
+        def format_error(e):
+            self.app.log.error(f"[content-download] Failed to download a file: {e}")
+            return parse_error_message(self.app, e) if isinstance(e, ApiException) else str(e)
+
+        for row in download_batch(downloads, max_concurrency, format_error, max(1, self.app.pargs.connections)):
+            content = contents_by_file[row['file']]
+            if cache and row['status'] == 'downloaded':
+                try:
+                    cache.put(self._cache_key(content), content.hash, row['file'], row['algorithm'], row['digest'])
+                except OSError as e:
+                    self.app.log.warning(f"[content-download] Failed to add {row['file']} to the artifact cache: {e}")
+
+            checksum = f"{row['algorithm']}:{row['digest']}" if row['digest'] else None
+            rows.append(self._download_row(content, row['file'], row['status'], checksum, row['error']))
+
+        failed = sum(1 for row in rows if row['status'] == 'failed')
+        cached = sum(1 for row in rows if row['status'] == 'cached')
+        if self.app.pargs.json:
+            self.app.render(rows, format=OutputFormat.JSON.value)
+        else:
+            if rows:
+                renderable = [{key.upper(): value for key, value in row.items()} for row in rows]
+                self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
+            self.app.render(f"Downloaded {len(rows) - failed} of {len(rows)} files, {cached} from the cache, "
+                            f"{failed} failed\n")
+
+        if failed:
+            self.app.exit_code = 1
+
+    @staticmethod
+    def _cache_key(content):
+        # contents share the artifact cache with the application versions, keyed by version id
+        return f'content/{content.id}'
+
+    @staticmethod
+    def _download_row(content, file, status, checksum=None, error=None):
+        return {
+            'id': content.id,
+            'name': content.name,
+            'file': file,
+            'status': status,
+            'checksum': checksum,
+            'error': error
+        }
+
+    def _copy_cached_content(self, cache, content, file):
+        """
+        Copy a content from the artifact cache, keyed by its id and published hash
+        :return: Row of the copied file, None if the content is not cached or could not be copied
+        """
+        cached_file, cached_name = cache.get(self._cache_key(content), content.hash)
+        if not cached_file:
+            return None
+
+        try:
+            method = clone_file(cached_file, file)
+        except OSError as e:
+            self.app.log.warning(f"[content-download] Failed to copy the cached {file}, downloading it: {e}")
+            return None
+
+        self.app.log.debug(f"[content-download] Copied {cached_file} to {file} with a {method}")
+        return self._download_row(content, file, 'cached', cached_name.replace('-', ':', 1))
+
+    @staticmethod
+    def _download_destinations(contents, destination_dir):
+        """
+        :return: dict of destination file to content. Contents sharing a name are prefixed with their id
+        """
+        names = {}
+        for content in contents:
+            names.setdefault(os.path.basename(content.name or '') or str(content.id), []).append(content)
+
+        destinations = {}
+        for name, same_name in names.items():
+            for content in same_name:
+                file_name = name if len(same_name) == 1 else f'{content.id}-{name}'
+                destinations[os.path.join(destination_dir, file_name)] = content
+
+        return destinations
+
 
     @ex(
         help='Modify content details',
@@ -1,11 +1,49 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from cement import ex, Controller
 from esperclient import CommandRequest
 from esperclient.rest import ApiException
+from tqdm import tqdm
 
 from esper.controllers.enums import OutputFormat, DeviceCommandEnum
+from esper.core.output_handler import STREAMING_ARGUMENTS
 from esper.ext.api_client import APIClient
 from esper.ext.db_wrapper import DBWrapper
-from esper.ext.utils import validate_creds_exists, parse_error_message
+from esper.ext.pagination import MAX_CONCURRENCY_ARGUMENT, paginate
+from esper.ext.resolver import NameResolver
+from esper.ext.utils import DEVICES_FILE_ARGUMENT, read_devices_file, validate_creds_exists, parse_error_message
+
+# Page size used to list the devices of a tag or group
+FLEET_DEVICES_PAGE_SIZE = 500
+
+# Targets for firing a command on many devices at once, instead of `--device`
+FLEET_ARGUMENTS = [
+    (['--devices'],
+     {'help': 'List of device names or ids, space separated',
+      'nargs': "*",
+      'type': str,
+      'dest': 'devices'}),
+    DEVICES_FILE_ARGUMENT,
+    (['--tag'],
+     {'help': 'Fire the command on every device with this tag',
+      'action': 'store',
+      'dest': 'tag'}),
+    (['--group-name'],
+     {'help': 'Fire the command on every device of this group',
+      'action': 'store',
+      'dest': 'group_name'}),
+    MAX_CONCURRENCY_ARGUMENT,
+    *STREAMING_ARGUMENTS,
+]
+
+# Skips the confirmation of a destructive command fired on several devices
+CONFIRM_ARGUMENT = (
+    ['-y', '--yes'],
+    {'help': 'Fire on several devices without asking for confirmation',
+     'action': 'store_true',
+     'dest': 'yes'}
+)
 
 
 class DeviceCommand(Controller):
@@ -55,19 +93,15 @@ class DeviceCommand(Controller):
         db = DBWrapper(self.app.creds)
         command_client = APIClient(db.get_configure()).get_command_api_client()
         enterprise_id = db.get_enterprise_id()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
 
         if self.app.pargs.device:
             device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
             try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
+                device_id = NameResolver(self.app, db).device_id(device_name)
+                if not device_id:
                     self.app.log.debug(f'[device-command-show] Device does not exist with name {device_name}')
                     self.app.render(f'Device does not exist with name {device_name}\n')
                     return
-                response = search_response.results[0]
-                device_id = response.id
             except ApiException as e:
                 self.app.log.error(f"[device-command-show] Failed to list devices: {e}")
                 self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
@@ -95,61 +129,206 @@ class DeviceCommand(Controller):
             renderable = self._command_basic_response(response, OutputFormat.JSON)
             self.app.render(renderable, format=OutputFormat.JSON.value)
 
-    @ex(
-        help='Install application version',
-        arguments=[
-            (['-d', '--device'],
-             {'help': 'Device name',
-              'action': 'store',
-              'dest': 'device'}),
-            (['-V', '--version'],
-             {'help': 'Application version id',
-              'action': 'store',
-              'dest': 'version'}),
-            (['-j', '--json'],
-             {'help': 'Render result in Json format',
-              'action': 'store_true',
-              'dest': 'json'}),
-        ]
-    )
-    def install(self):
-        validate_creds_exists(self.app)
-        db = DBWrapper(self.app.creds)
-        command_client = APIClient(db.get_configure()).get_command_api_client()
-        enterprise_id = db.get_enterprise_id()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-
+    def _get_device_id(self, db, action):
+        """
+        Device id from `--device`, or the active device
+        :return: device id, None on error
+        """
         if self.app.pargs.device:
             device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
             try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.log.debug(f'[device-command-install] Device does not exist with name {device_name}')
+                device_id = NameResolver(self.app, db).device_id(device_name)
+                if not device_id:
+                    self.app.log.debug(f'[device-command-{action}] Device does not exist with name {device_name}')
                     self.app.render(f'Device does not exist with name {device_name}\n')
-                    return
-                response = search_response.results[0]
-                device_id = response.id
+                    return None
             except ApiException as e:
-                self.app.log.error(f"[device-command-install] Failed to list devices: {e}")
+                self.app.log.error(f"[device-command-{action}] Failed to list devices: {e}")
                 self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-                return
+                return None
+
+            return device_id
+
+        device = db.get_device()
+        if not device or not device.get('id'):
+            self.app.log.debug(f'[device-command-{action}] There is no active device.')
+            self.app.render('There is no active device.\n')
+            return None
+
+        return device.get('id')
+
+    def _is_fleet_command(self):
+        pargs = self.app.pargs
+        return bool(pargs.devices or pargs.devices_file or pargs.tag or pargs.group_name)
+
+    def _get_fleet_devices(self, db, action):
+        """
+        Collect the target devices from `--devices`, `--devices-file`, `--tag` and `--group-name`
+        :return: (devices, not_found) - dict of device id to name, in order, and the unknown names;
+                 None on error
+        """
+        pargs = self.app.pargs
+        enterprise_id = db.get_enterprise_id()
+        device_client = APIClient(db.get_configure()).get_device_api_client()
+        resolver = NameResolver(self.app, db)
+        devices = {}
+
+        names = list(pargs.devices or [])
+        if pargs.devices_file:
+            try:
+                names.extend(read_devices_file(pargs.devices_file))
+            except OSError as e:
+                self.app.log.error(f"[device-command-{action}] Failed to read devices file: {e}")
+                self.app.render(f"ERROR: {e.strerror}: {pargs.devices_file}\n")
+                return None
+
+        try:
+            device_ids, not_found = resolver.device_ids(names, pargs.max_concurrency)
+            names = [name for name in dict.fromkeys(names) if name not in not_found]
+            devices.update(zip(device_ids, names))
+
+            filters = {}
+            if pargs.tag:
+                filters['tags'] = pargs.tag
+
+            if pargs.group_name:
+                group_id = resolver.group_id(pargs.group_name)
+                if not group_id:
+                    self.app.log.debug(f'[device-command-{action}] Group does not exist with name {pargs.group_name}')
+                    self.app.render(f'Group does not exist with name {pargs.group_name}\n')
+                    return None
+                filters['group'] = group_id
+
+            if filters:
+                response = paginate(
+                    lambda page_limit, page_offset: device_client.get_all_devices(
+                        enterprise_id, limit=page_limit, offset=page_offset, **filters),
+                    FLEET_DEVICES_PAGE_SIZE, 0, True, pargs.max_concurrency)
+                for device in response.results:
+                    devices.setdefault(device.id, device.device_name)
+        except ApiException as e:
+            self.app.log.error(f"[device-command-{action}] Failed to list devices: {e}")
+            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
+            return None
+
+        return devices, not_found
+
+    def _confirm_fleet_command(self, action, count):
+        """
+        Ask before firing a destructive command on `count` devices, unless `--yes` is given
+        :return: True to go on
+        """
+        if self.app.pargs.yes:
+            return True
+
+        if not sys.stdin.isatty():
+            self.app.log.debug(f'[device-command-{action}] Not confirmed for {count} devices, --yes is not given.')
+            self.app.render(f'{action} would be fired on {count} devices, use --yes to confirm\n')
+            self.app.exit_code = 1
+            return False
+
+        try:
+            answer = input(f'Fire {action} on {count} devices? [y/N]: ')
+        except EOFError:
+            answer = ''
+
+        if answer.strip().lower() not in ('y', 'yes'):
+            self.app.log.debug(f'[device-command-{action}] Not confirmed for {count} devices.')
+            self.app.render('Aborted\n')
+            return False
+
+        return True
+
+    def _run_fleet_command(self, db, action, command_name, command_request, confirm=False):
+        """
+        Fire a command on every target device through a bounded pool of workers, and render one
+        result row per device. Streamed rows are written as the commands complete.
+        :param confirm: Ask before firing on more than one device, for destructive commands
+        """
+        fleet = self._get_fleet_devices(db, action)
+        if fleet is None:
+            return
+
+        devices, not_found = fleet
+        if not devices and not not_found:
+            self.app.log.debug(f'[device-command-{action}] No devices match the given targets.')
+            self.app.render('No devices match the given targets.\n')
+            return
+
+        if confirm and len(devices) > 1 and not self._confirm_fleet_command(action, len(devices)):
+            return
+
+        command_client = APIClient(db.get_configure()).get_command_api_client()
+        enterprise_id = db.get_enterprise_id()
+
+        def fire(device_id):
+            return command_client.run_command(enterprise_id, device_id, command_request)
+
+        def results():
+            for name in not_found:
+                yield {'device': name, 'id': None, 'command_id': None, 'state': None,
+                       'error': 'Device does not exist'}
+
+            with ThreadPoolExecutor(max_workers=max(1, self.app.pargs.max_concurrency)) as executor, \
+                    tqdm(total=len(devices), unit='device', desc=f'Firing {command_name}', leave=False) as pbar:
+                futures = {executor.submit(fire, device_id): device_id for device_id in devices}
+                for future in as_completed(futures):
+                    device_id = futures[future]
+                    row = {'device': devices[device_id], 'id': device_id, 'command_id': None, 'state': None,
+                           'error': None}
+                    try:
+                        response = future.result()
+                        row['command_id'] = response.id
+                        row['state'] = response.state
+                    except ApiException as e:
+                        self.app.log.error(f"[device-command-{action}] Failed to fire the {command_name} command "
+                                           f"on {device_id}: {e}")
+                        row['error'] = parse_error_message(self.app, e)
+
+                    pbar.update(1)
+                    yield row
+
+        if self.app.pargs.format:
+            self.app.render(results(), format=self.app.pargs.format, output=self.app.pargs.output)
+            return
+
+        # Rows in the order the devices were given, unknown names first
+        order = {device_id: index for index, device_id in enumerate(devices)}
+        rows = sorted(results(), key=lambda row: order.get(row['id'], -1))
+        failed = len([row for row in rows if row['error']])
+
+        if not self.app.pargs.json:
+            self.app.render(f"Fired {command_name} on {len(rows) - failed} of {len(rows)} devices\n")
+            renderable = [{key.upper(): value for key, value in row.items()} for row in rows]
+            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            device = db.get_device()
-            if not device or not device.get('id'):
-                self.app.log.debug('[device-command-install] There is no active device.')
-                self.app.render('There is no active device.\n')
+            self.app.render(rows, format=OutputFormat.JSON.value)
+
+    def _run_command(self, action, command_name, command_request, confirm=False):
+        """
+        Fire a command on the `--device` or active device, or on every target device with the fleet arguments
+        :param confirm: Ask before firing on more than one device, for destructive commands
+        """
+        db = DBWrapper(self.app.creds)
+        if self._is_fleet_command():
+            if self.app.pargs.device:
+                self.app.log.debug(f'[device-command-{action}] --device cannot be combined with fleet targets.')
+                self.app.render('Use either --device, or --devices, --devices-file, --tag and --group-name\n')
                 return
 
-            device_id = device.get('id')
+            self._run_fleet_command(db, action, command_name, command_request, confirm)
+            return
 
-        version_id = self.app.pargs.version
-        command_request = CommandRequest(command_args={"app_version": version_id},
-                                         command=DeviceCommandEnum.INSTALL.name)
+        device_id = self._get_device_id(db, action)
+        if device_id is None:
+            return
+
+        command_client = APIClient(db.get_configure()).get_command_api_client()
+        enterprise_id = db.get_enterprise_id()
         try:
             response = command_client.run_command(enterprise_id, device_id, command_request)
         except ApiException as e:
-            self.app.log.error(f"[device-command-install] Failed to fire the install command: {e}")
+            self.app.log.error(f"[device-command-{action}] Failed to fire the {command_name} command: {e}")
             self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
             return
 
@@ -160,6 +339,31 @@ class DeviceCommand(Controller):
             renderable = self._command_basic_response(response, OutputFormat.JSON)
             self.app.render(renderable, format=OutputFormat.JSON.value)
 
+    @ex(
+        help='Install application version',
+        arguments=[
+            (['-d', '--device'],
+             {'help': 'Device name',
+              'action': 'store',
+              'dest': 'device'}),
+            *FLEET_ARGUMENTS,
+            (['-V', '--version'],
+             {'help': 'Application version id',
+              'action': 'store',
+              'dest': 'version'}),
+            (['-j', '--json'],
+             {'help': 'Render result in Json format',
+              'action': 'store_true',
+              'dest': 'json'}),
+        ]
+    )
+    def install(self):
+        validate_creds_exists(self.app)
+        version_id = self.app.pargs.version
+        command_request = CommandRequest(command_args={"app_version": version_id},
+                                         command=DeviceCommandEnum.INSTALL.name)
+        self._run_command('install', 'install', command_request)
+
     @ex(
         help='Uninstall application version',
         arguments=[
@@ -167,6 +371,7 @@ class DeviceCommand(Controller):
              {'help': 'Device name',
               'action': 'store',
               'dest': 'device'}),
+            *FLEET_ARGUMENTS,
             (['-V', '--version'],
              {'help': 'Application version id',
               'action': 'store',
@@ -179,51 +384,10 @@ class DeviceCommand(Controller):
     )
     def uninstall(self):
         validate_creds_exists(self.app)
-        db = DBWrapper(self.app.creds)
-        command_client = APIClient(db.get_configure()).get_command_api_client()
-        enterprise_id = db.get_enterprise_id()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-
-        if self.app.pargs.device:
-            device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
-            try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.log.debug(f'[device-command-uninstall] Device does not exist with name {device_name}')
-                    self.app.render(f'Device does not exist with name {device_name}\n')
-                    return
-                response = search_response.results[0]
-                device_id = response.id
-            except ApiException as e:
-                self.app.log.error(f"[device-command-uninstall] Failed to list devices: {e}")
-                self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-                return
-        else:
-            device = db.get_device()
-            if not device or not device.get('id'):
-                self.app.log.debug('[device-command-uninstall] There is no active device.')
-                self.app.render('There is no active device.\n')
-                return
-
-            device_id = device.get('id')
-
         version_id = self.app.pargs.version
         command_request = CommandRequest(command_args={"app_version": version_id},
                                          command=DeviceCommandEnum.UNINSTALL.name)
-        try:
-            response = command_client.run_command(enterprise_id, device_id, command_request)
-        except ApiException as e:
-            self.app.log.error(f"[device-command-uninstall] Failed to fire the uninstall command: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-            return
-
-        if not self.app.pargs.json:
-            renderable = self._command_basic_response(response)
-            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
-        else:
-            renderable = self._command_basic_response(response, OutputFormat.JSON)
-            self.app.render(renderable, format=OutputFormat.JSON.value)
+        self._run_command('uninstall', 'uninstall', command_request)
 
     @ex(
         help='Ping a device',
@@ -232,6 +396,7 @@ class DeviceCommand(Controller):
              {'help': 'Device name',
               'action': 'store',
               'dest': 'device'}),
+            *FLEET_ARGUMENTS,
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
@@ -240,49 +405,8 @@ class DeviceCommand(Controller):
     )
     def ping(self):
         validate_creds_exists(self.app)
-        db = DBWrapper(self.app.creds)
-        command_client = APIClient(db.get_configure()).get_command_api_client()
-        enterprise_id = db.get_enterprise_id()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-
-        if self.app.pargs.device:
-            device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
-            try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.log.debug(f'[device-command-ping] Device does not exist with name {device_name}')
-                    self.app.render(f'Device does not exist with name {device_name}\n')
-                    return
-                response = search_response.results[0]
-                device_id = response.id
-            except ApiException as e:
-                self.app.log.error(f"[device-command-ping] Failed to list devices: {e}")
-                self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-                return
-        else:
-            device = db.get_device()
-            if not device or not device.get('id'):
-                self.app.log.debug('[device-command-ping] There is no active device.')
-                self.app.render('There is no active device.\n')
-                return
-
-            device_id = device.get('id')
-
         command_request = CommandRequest(command=DeviceCommandEnum.UPDATE_HEARTBEAT.name)
-        try:
-            response = command_client.run_command(enterprise_id, device_id, command_request)
-        except ApiException as e:
-            self.app.log.error(f"[device-command-ping] Failed to fire the ping command: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-            return
-
-        if not self.app.pargs.json:
-            renderable = self._command_basic_response(response)
-            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
-        else:
-            renderable = self._command_basic_response(response, OutputFormat.JSON)
-            self.app.render(renderable, format=OutputFormat.JSON.value)
+        self._run_command('ping', 'ping', command_request)
 
     @ex(
         help='Lock a device',
@@ -291,6 +415,7 @@ class DeviceCommand(Controller):
              {'help': 'Device name',
               'action': 'store',
               'dest': 'device'}),
+            *FLEET_ARGUMENTS,
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
@@ -299,49 +424,8 @@ class DeviceCommand(Controller):
     )
     def lock(self):
         validate_creds_exists(self.app)
-        db = DBWrapper(self.app.creds)
-        command_client = APIClient(db.get_configure()).get_command_api_client()
-        enterprise_id = db.get_enterprise_id()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-
-        if self.app.pargs.device:
-            device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
-            try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.log.debug(f'[device-command-lock] Device does not exist with name {device_name}')
-                    self.app.render(f'Device does not exist with name {device_name}\n')
-                    return
-                response = search_response.results[0]
-                device_id = response.id
-            except ApiException as e:
-                self.app.log.error(f"[device-command-lock] Failed to list devices: {e}")
-                self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-                return
-        else:
-            device = db.get_device()
-            if not device or not device.get('id'):
-                self.app.log.debug('[device-command-lock] There is no active device.')
-                self.app.render('There is no active device.\n')
-                return
-
-            device_id = device.get('id')
-
         command_request = CommandRequest(command=DeviceCommandEnum.LOCK.name)
-        try:
-            response = command_client.run_command(enterprise_id, device_id, command_request)
-        except ApiException as e:
-            self.app.log.error(f"[device-command-lock] Failed to fire the lock command: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-            return
-
-        if not self.app.pargs.json:
-            renderable = self._command_basic_response(response)
-            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
-        else:
-            renderable = self._command_basic_response(response, OutputFormat.JSON)
-            self.app.render(renderable, format=OutputFormat.JSON.value)
+        self._run_command('lock', 'lock', command_request)
 
     @ex(
         help='Reboot a device',
@@ -350,6 +434,7 @@ class DeviceCommand(Controller):
              {'help': 'Device name',
               'action': 'store',
               'dest': 'device'}),
+            *FLEET_ARGUMENTS,
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
@@ -358,49 +443,8 @@ class DeviceCommand(Controller):
     )
     def reboot(self):
         validate_creds_exists(self.app)
-        db = DBWrapper(self.app.creds)
-        command_client = APIClient(db.get_configure()).get_command_api_client()
-        enterprise_id = db.get_enterprise_id()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-
-        if self.app.pargs.device:
-            device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
-            try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.log.debug(f'[device-command-reboot] Device does not exist with name {device_name}')
-                    self.app.render(f'Device does not exist with name {device_name}\n')
-                    return
-                response = search_response.results[0]
-                device_id = response.id
-            except ApiException as e:
-                self.app.log.error(f"[device-command-reboot] Failed to list devices: {e}")
-                self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-                return
-        else:
-            device = db.get_device()
-            if not device or not device.get('id'):
-                self.app.log.debug('[device-command-reboot] There is no active device.')
-                self.app.render('There is no active device.\n')
-                return
-
-            device_id = device.get('id')
-
         command_request = CommandRequest(command=DeviceCommandEnum.REBOOT.name)
-        try:
-            response = command_client.run_command(enterprise_id, device_id, command_request)
-        except ApiException as e:
-            self.app.log.error(f"[device-command-reboot] Failed to fire the reboot command: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-            return
-
-        if not self.app.pargs.json:
-            renderable = self._command_basic_response(response)
-            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
-        else:
-            renderable = self._command_basic_response(response, OutputFormat.JSON)
-            self.app.render(renderable, format=OutputFormat.JSON.value)
+        self._run_command('reboot', 'reboot', command_request)
 
     @ex(
         help='Wipe a device',
@@ -409,6 +453,7 @@ class DeviceCommand(Controller):
              {'help': 'Device name',
               'action': 'store',
               'dest': 'device'}),
+            *FLEET_ARGUMENTS,
             (['-e', '--exstorage'],
              {'help': 'External storage',
               'action': 'store_true',
@@ -417,6 +462,7 @@ class DeviceCommand(Controller):
              {'help': 'Factory reset production',
               'action': 'store_true',
               'dest': 'frp'}),
+            CONFIRM_ARGUMENT,
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
@@ -425,35 +471,6 @@ class DeviceCommand(Controller):
     )
     def wipe(self):
         validate_creds_exists(self.app)
-        db = DBWrapper(self.app.creds)
-        command_client = APIClient(db.get_configure()).get_command_api_client()
-        enterprise_id = db.get_enterprise_id()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-
-        if self.app.pargs.device:
-            device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
-            try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.log.debug(f'[device-command-wipe] Device does not exist with name {device_name}')
-                    self.app.render(f'Device does not exist with name {device_name}\n')
-                    return
-                response = search_response.results[0]
-                device_id = response.id
-            except ApiException as e:
-                self.app.log.error(f"[device-command-wipe] Failed to list devices: {e}")
-                self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-                return
-        else:
-            device = db.get_device()
-            if not device or not device.get('id'):
-                self.app.log.debug('[device-command-wipe] There is no active device.')
-                self.app.render('There is no active device.\n')
-                return
-
-            device_id = device.get('id')
-
         external_storage = self.app.pargs.external_storage
         frp = self.app.pargs.frp
 
@@ -467,19 +484,7 @@ class DeviceCommand(Controller):
 
         command_request = CommandRequest(command_args={"wipe_external_storage": external_storage, 'wipe_FRP': frp},
                                          command=DeviceCommandEnum.WIPE.name)
-        try:
-            response = command_client.run_command(enterprise_id, device_id, command_request)
-        except ApiException as e:
-            self.app.log.error(f"[device-command-wipe] Failed to fire the wipe command: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-            return
-
-        if not self.app.pargs.json:
-            renderable = self._command_basic_response(response)
-            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
-        else:
-            renderable = self._command_basic_response(response, OutputFormat.JSON)
-            self.app.render(renderable, format=OutputFormat.JSON.value)
+        self._run_command('wipe', 'wipe', command_request, confirm=True)
 
     @ex(
         help='Clear app data',
@@ -488,10 +493,12 @@ class DeviceCommand(Controller):
              {'help': 'Device name',
               'action': 'store',
               'dest': 'device'}),
+            *FLEET_ARGUMENTS,
             (['-P', '--package-name'],
              {'help': 'Application package name',
               'action': 'store',
               'dest': 'package_name'}),
+            CONFIRM_ARGUMENT,
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
@@ -500,35 +507,6 @@ class DeviceCommand(Controller):
     )
     def clear_app_data(self):
         validate_creds_exists(self.app)
-        db = DBWrapper(self.app.creds)
-        command_client = APIClient(db.get_configure()).get_command_api_client()
-        enterprise_id = db.get_enterprise_id()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-
-        if self.app.pargs.device:
-            device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
-            try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.log.debug(f'[device-command-clear-app-data] Device does not exist with name {device_name}')
-                    self.app.render(f'Device does not exist with name {device_name}\n')
-                    return
-                response = search_response.results[0]
-                device_id = response.id
-            except ApiException as e:
-                self.app.log.error(f"[device-command-clear-app-data] Failed to list devices: {e}")
-                self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-                return
-        else:
-            device = db.get_device()
-            if not device or not device.get('id'):
-                self.app.log.debug('[device-command-clear-app-data] There is no active device.')
-                self.app.render('There is no active device.\n')
-                return
-
-            device_id = device.get('id')
-
         package_name = self.app.pargs.package_name
         if package_name is None:
             self.app.log.info('[device-command-clear-app-data] Package name is empty')
@@ -537,17 +515,4 @@ class DeviceCommand(Controller):
 
         command_request = CommandRequest(command_args={"package_name": package_name},
                                          command=DeviceCommandEnum.CLEAR_APP_DATA.name)
-       
-        try:
-            response = command_client.run_command(enterprise_id, device_id, command_request)
-        except ApiException as e:
-            self.app.log.error(f"[device-command-clear-app-data] Failed to fire the CLEAR_APP_DATA command: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
-            return
-
-        if not self.app.pargs.json:
-            renderable = self._command_basic_response(response)
-            self.app.render(renderable, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
-        else:
-            renderable = self._command_basic_response(response, OutputFormat.JSON)
-            self.app.render(renderable, format=OutputFormat.JSON.value)
+        self._run_command('clear-app-data', 'CLEAR_APP_DATA', command_request, confirm=True)
@@ -4,8 +4,11 @@ from cement import Controller, ex
 from esperclient.rest import ApiException
 
 from esper.controllers.enums import DeviceState, OutputFormat
+from esper.core.output_handler import STREAMING_ARGUMENTS, render_list_error
 from esper.ext.api_client import APIClient
 from esper.ext.db_wrapper import DBWrapper
+from esper.ext.pagination import ALL_PAGE_SIZE, PAGINATION_ARGUMENTS, page_size, paginate
+from esper.ext.resolver import NameResolver
 from esper.ext.utils import validate_creds_exists, parse_error_message
 
 
@@ -74,9 +77,9 @@ class Device(Controller):
               'choices': ['true', 'false'],
               'dest': 'gms'}),
             (['-l', '--limit'],
-             {'help': 'Number of results to return per page',
+             {'help': f'Number of results to return per page (default: 20, {ALL_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 20,
+              'default': None,
               'dest': 'limit'}),
             (['-i', '--offset'],
              {'help': 'The initial index from which to return the results',
@@ -87,7 +90,7 @@ class Device(Controller):
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'}),
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def list(self):
         """Command to list devices"""
@@ -105,7 +108,7 @@ class Device(Controller):
         search = self.app.pargs.search
         brand = self.app.pargs.brand
         gms = self.app.pargs.gms
-        limit = self.app.pargs.limit
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 20)
         offset = self.app.pargs.offset
 
         kwargs = {}
@@ -155,10 +158,31 @@ class Device(Controller):
 
         try:
             # Find devices in an enterprise
-            response = device_client.get_all_devices(enterprise_id, limit=limit, offset=offset, **kwargs)
+            response = paginate(
+                lambda page_limit, page_offset: device_client.get_all_devices(
+                    enterprise_id, limit=page_limit, offset=page_offset, **kwargs),
+                limit, offset, self.app.pargs.all, self.app.pargs.max_concurrency)
+            # with --all, the remaining pages are fetched while rendering
+            self._render_devices(response)
         except ApiException as e:
             self.app.log.error(f"[device-list] Failed to list devices: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
+            render_list_error(self.app, parse_error_message(self.app, e))
+
+    def _device_list_row(self, device):
+        name, _ = self.get_name_and_tags_from_device(device)
+        return {
+            'id': device.id,
+            'device': name,
+            'model': device.hardware_info.get("manufacturer"),
+            'state': DeviceState(device.status).name,
+            'tags': device.tags
+        }
+
+    def _render_devices(self, response):
+        if self.app.pargs.format:
+            self.app.log.debug(f"[device-list] Number of Devices: {response.count}")
+            self.app.render((self._device_list_row(device) for device in response.results),
+                            format=self.app.pargs.format, output=self.app.pargs.output)
             return
 
         self.app.render(f"Number of Devices: {response.count}")
@@ -188,19 +212,7 @@ class Device(Controller):
                 )
             self.app.render(devices, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            devices = []
-            for device in response.results:
-                current_state = DeviceState(device.status).name
-                name, _ = self.get_name_and_tags_from_device(device)
-                devices.append(
-                    {
-                        'id': device.id,
-                        'device': name,
-                        'model': device.hardware_info.get("manufacturer"),
-                        'state': current_state,
-                        'tags': device.tags
-                    }
-                )
+            devices = [self._device_list_row(device) for device in response.results]
             self.app.render(devices, format=OutputFormat.JSON.value)
 
     def _device_basic_response(self, device, format=OutputFormat.TABULATED):
@@ -241,17 +253,12 @@ class Device(Controller):
         db = DBWrapper(self.app.creds)
         device_name = self.app.pargs.device_name
 
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-        enterprise_id = db.get_enterprise_id()
-
-        kwargs = {'name': device_name}
         try:
-            search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-            if not search_response.results or len(search_response.results) == 0:
+            response = NameResolver(self.app, db).device(device_name)
+            if not response:
                 self.app.log.debug(f'[device-show] Device does not exist with name {device_name}')
                 self.app.render(f'Device does not exist with name {device_name}\n')
                 return
-            response = search_response.results[0]
         except ApiException as e:
             self.app.log.error(f"[device-show] Failed to list devices: {e}")
             self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
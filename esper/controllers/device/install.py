@@ -2,8 +2,11 @@ from cement import Controller, ex
 from esperclient.rest import ApiException
 
 from esper.controllers.enums import OutputFormat
+from esper.core.output_handler import STREAMING_ARGUMENTS, render_list_error
 from esper.ext.api_client import APIClient
 from esper.ext.db_wrapper import DBWrapper
+from esper.ext.pagination import ALL_PAGE_SIZE, PAGINATION_ARGUMENTS, page_size, paginate
+from esper.ext.resolver import NameResolver
 from esper.ext.utils import validate_creds_exists, parse_error_message
 
 
@@ -40,9 +43,9 @@ class AppInstall(Controller):
               'action': 'store',
               'dest': 'state'}),
             (['-l', '--limit'],
-             {'help': 'Number of results to return per page',
+             {'help': f'Number of results to return per page (default: 20, {ALL_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 20,
+              'default': None,
               'dest': 'limit'}),
             (['-i', '--offset'],
              {'help': 'The initial index from which to return the results',
@@ -53,7 +56,7 @@ class AppInstall(Controller):
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'}),
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def list(self):
         """Command to list installs"""
@@ -64,15 +67,12 @@ class AppInstall(Controller):
 
         if self.app.pargs.device:
             device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
             try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
+                device_id = NameResolver(self.app, db).device_id(device_name)
+                if not device_id:
                     self.app.log.debug(f'[installs-list] Device does not exist with name {device_name}')
                     self.app.render(f'Device does not exist with name {device_name}\n')
                     return
-                response = search_response.results[0]
-                device_id = response.id
             except ApiException as e:
                 self.app.log.error(f"[installs-list] Failed to list devices: {e}")
                 self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
@@ -89,7 +89,7 @@ class AppInstall(Controller):
         app_name = self.app.pargs.appname
         package_name = self.app.pargs.package
         install_state = self.app.pargs.state
-        limit = self.app.pargs.limit
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 20)
         offset = self.app.pargs.offset
 
         kwargs = {}
@@ -103,10 +103,31 @@ class AppInstall(Controller):
             kwargs['install_state'] = install_state
 
         try:
-            response = device_client.get_app_installs(enterprise_id, device_id, limit=limit, offset=offset, **kwargs)
+            response = paginate(
+                lambda page_limit, page_offset: device_client.get_app_installs(
+                    enterprise_id, device_id, limit=page_limit, offset=page_offset, **kwargs),
+                limit, offset, self.app.pargs.all, self.app.pargs.max_concurrency)
+            # with --all, the remaining pages are fetched while rendering
+            self._render_installs(response)
         except ApiException as e:
             self.app.log.error(f"[installs-list] Failed to list installs: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
+            render_list_error(self.app, parse_error_message(self.app, e))
+
+    @staticmethod
+    def _install_list_row(install):
+        return {
+            'id': install.id,
+            'application_name': install.application.application_name,
+            'package_name': install.application.package_name,
+            'version_code': install.application.version.version_code,
+            'install_state': install.install_state
+        }
+
+    def _render_installs(self, response):
+        if self.app.pargs.format:
+            self.app.log.debug(f"[installs-list] Total Number of Installs: {response.count}")
+            self.app.render((self._install_list_row(install) for install in response.results),
+                            format=self.app.pargs.format, output=self.app.pargs.output)
             return
 
         self.app.render(f"Total Number of Installs: {response.count}")
@@ -133,15 +154,5 @@ class AppInstall(Controller):
                 )
             self.app.render(installs, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            installs = []
-            for install in response.results:
-                installs.append(
-                    {
-                        'id': install.id,
-                        'application_name': install.application.application_name,
-                        'package_name': install.application.package_name,
-                        'version_code': install.application.version.version_code,
-                        'install_state': install.install_state
-                    }
-                )
+            installs = [self._install_list_row(install) for install in response.results]
             self.app.render(installs, format=OutputFormat.JSON.value)
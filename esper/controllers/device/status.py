@@ -6,6 +6,7 @@ from esperclient.rest import ApiException
 from esper.controllers.enums import OutputFormat
 from esper.ext.api_client import APIClient
 from esper.ext.db_wrapper import DBWrapper
+from esper.ext.resolver import NameResolver
 from esper.ext.utils import validate_creds_exists, parse_error_message
 
 
@@ -44,15 +45,12 @@ class DeviceStatus(Controller):
 
         if self.app.pargs.device:
             device_name = self.app.pargs.device
-            kwargs = {'name': device_name}
             try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
+                device_id = NameResolver(self.app, db).device_id(device_name)
+                if not device_id:
                     self.app.log.debug(f'[status-latest] Device does not exist with name {device_name}')
                     self.app.render(f'Device does not exist with name {device_name}\n')
                     return
-                response = search_response.results[0]
-                device_id = response.id
             except ApiException as e:
                 self.app.log.error(f"[status-latest] Failed to list devices: {e}")
                 self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
@@ -1,11 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from cement import Controller, ex
 from esperclient import DeviceGroup, DeviceGroupUpdate, DeviceGroupPartialUpdate
 from esperclient.rest import ApiException
+from tqdm import tqdm
 
 from esper.controllers.enums import OutputFormat, DeviceState
+from esper.core.output_handler import STREAMING_ARGUMENTS, render_list_error
 from esper.ext.api_client import APIClient
 from esper.ext.db_wrapper import DBWrapper
-from esper.ext.utils import validate_creds_exists, parse_error_message
+from esper.ext.pagination import ALL_PAGE_SIZE, MAX_CONCURRENCY_ARGUMENT, PAGINATION_ARGUMENTS, page_size, paginate
+from esper.ext.resolver import NameResolver
+from esper.ext.utils import DEVICES_FILE_ARGUMENT, read_devices_file, validate_creds_exists, parse_error_message
+
+
+# Page size used to list every device of a group
+GROUP_DEVICES_PAGE_SIZE = 500
+
+# Maximum number of devices sent in one group membership update
+GROUP_DEVICES_CHUNK_SIZE = 1000
 
 
 class EnterpriseGroup(Controller):
@@ -29,9 +42,9 @@ class EnterpriseGroup(Controller):
               'action': 'store',
               'dest': 'name'}),
             (['-l', '--limit'],
-             {'help': 'Number of results to return per page',
+             {'help': f'Number of results to return per page (default: 20, {ALL_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 20,
+              'default': None,
               'dest': 'limit'}),
             (['-i', '--offset'],
              {'help': 'The initial index from which to return the results',
@@ -42,7 +55,7 @@ class EnterpriseGroup(Controller):
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'})
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def list(self):
         validate_creds_exists(self.app)
@@ -51,7 +64,7 @@ class EnterpriseGroup(Controller):
         enterprise_id = db.get_enterprise_id()
 
         name = self.app.pargs.name
-        limit = self.app.pargs.limit
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 20)
         offset = self.app.pargs.offset
 
         kwargs = {}
@@ -59,10 +72,34 @@ class EnterpriseGroup(Controller):
             kwargs['name'] = name
 
         try:
-            response = group_client.get_all_groups(enterprise_id, limit=limit, offset=offset, **kwargs)
+            response = paginate(
+                lambda page_limit, page_offset: group_client.get_all_groups(
+                    enterprise_id, limit=page_limit, offset=page_offset, **kwargs),
+                limit, offset, self.app.pargs.all, self.app.pargs.max_concurrency)
+            # with --all, the remaining pages are fetched while rendering
+            self._render_groups(response)
         except ApiException as e:
             self.app.log.error(f"[group-list] Failed to list groups: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)}")
+            render_list_error(self.app, parse_error_message(self.app, e))
+
+    @staticmethod
+    def _group_list_row(group):
+        if group.parent:
+            parent = group.parent.split('/')[-2]
+        else:
+            parent = group.parent
+        return {
+            'id': group.id,
+            'name': group.name,
+            'device_count': group.device_count if group.device_count else 0,
+            'parent_id': parent,
+        }
+
+    def _render_groups(self, response):
+        if self.app.pargs.format:
+            self.app.log.debug(f"[group-list] Number of Groups: {response.count}")
+            self.app.render((self._group_list_row(group) for group in response.results),
+                            format=self.app.pargs.format, output=self.app.pargs.output)
             return
 
         if not self.app.pargs.json:
@@ -91,20 +128,7 @@ class EnterpriseGroup(Controller):
             self.app.render(f"Number of Groups: {response.count}")
             self.app.render(groups, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            groups = []
-            for group in response.results:
-                if group.parent:
-                    parent = group.parent.split('/')[-2]
-                else:
-                    parent = group.parent
-                groups.append(
-                    {
-                        'id': group.id,
-                        'name': group.name,
-                        'device_count': group.device_count if group.device_count else 0,
-                        'parent_id': parent,
-                    }
-                )
+            groups = [self._group_list_row(group) for group in response.results]
             self.app.render(f"Number of Groups: {response.count}")
             self.app.render(groups, format=OutputFormat.JSON.value)
 
@@ -413,6 +437,7 @@ class EnterpriseGroup(Controller):
 
         try:
             response = group_client.partial_update_group(group_id, enterprise_id, data)
+            NameResolver(self.app, db).invalidate_group(group_name)
         except ApiException as e:
             self.app.log.error(f"[group-update] Failed to update details of a group: {e}")
             self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
@@ -475,6 +500,7 @@ class EnterpriseGroup(Controller):
 
         try:
             group_client.delete_group(group_id, enterprise_id)
+            NameResolver(self.app, db).invalidate_group(group_name)
             self.app.log.debug(f"[group-update] Group with name {group_name} deleted successfully")
             self.app.render(f"Group with name {group_name} deleted successfully \n")
 
@@ -488,19 +514,17 @@ class EnterpriseGroup(Controller):
             self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
             return
 
-    def _get_group_device_ids(self, device_client, enterprise_id, group_id):
-        device_ids = []
+    def _get_group_device_ids(self, device_client, enterprise_id, group_id, max_concurrency):
+        """
+        Fetch the ids of every device in a group, the pages after the first one in parallel
+        :return: set of device ids, None on error
+        """
         try:
-            counter = 0
-            limit = 100
-            while True:
-                offset = limit * counter
-                response = device_client.get_all_devices(enterprise_id, group=group_id, limit=limit, offset=offset)
-                if not response.results or len(response.results) == 0:
-                    break
-
-                device_ids.extend([device.id for device in response.results])
-                counter += 1
+            response = paginate(
+                lambda page_limit, page_offset: device_client.get_all_devices(
+                    enterprise_id, group=group_id, limit=page_limit, offset=page_offset),
+                GROUP_DEVICES_PAGE_SIZE, 0, True, max_concurrency)
+            device_ids = {device.id for device in response.results}
         except ApiException as e:
             self.app.log.error(f"[_get_group_device_ids] Failed to list device by group: {e}")
             self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
@@ -508,6 +532,110 @@ class EnterpriseGroup(Controller):
 
         return device_ids
 
+    def _get_devices(self, action):
+        """
+        Collect the devices given with `--devices` and `--devices-file`, without duplicates
+        :return: list of device names or ids, None on error
+        """
+        devices = list(self.app.pargs.devices or [])
+        if self.app.pargs.devices_file:
+            try:
+                devices.extend(read_devices_file(self.app.pargs.devices_file))
+            except OSError as e:
+                self.app.log.error(f"[group-{action}] Failed to read devices file: {e}")
+                self.app.render(f"ERROR: {e.strerror}: {self.app.pargs.devices_file} \n")
+                return None
+
+        if len(devices) == 0:
+            self.app.log.debug(f'[group-{action}] devices cannot be empty.')
+            self.app.render('devices cannot be empty. \n')
+            return None
+
+        return list(dict.fromkeys(devices))
+
+    def _update_group_devices(self, db, group_client, enterprise_id, group_id, devices, action, current_device_ids):
+        """
+        Add or remove devices in chunks of GROUP_DEVICES_CHUNK_SIZE. Every name is resolved first, in parallel,
+        so that unknown devices, or devices not in the group on remove, are all reported together and nothing
+        is changed. The chunk updates are then pipelined: one update is in flight while the next chunk is
+        prepared and the previous result handled, one at a time so that the chunks are applied in order.
+        A chunk failing on the server is reported; the other chunks are still applied.
+        :return: the group after the last successful update, None if nothing was applied
+        """
+        try:
+            device_ids, not_found = NameResolver(self.app, db).device_ids(devices, self.app.pargs.max_concurrency)
+        except ApiException as e:
+            self.app.log.error(f"[group-{action}] Failed to list devices: {e}")
+            self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
+            return None
+
+        if not_found:
+            self.app.log.debug(f"[group-{action}] Devices do not exist with names {', '.join(not_found)}")
+            self.app.render(f"Devices do not exist with names {', '.join(not_found)} \n")
+            return None
+
+        if action == 'remove' and set(device_ids) - current_device_ids:
+            self.app.log.debug(f'[group-{action}] The given devices are not present in the group.')
+            self.app.render('The given devices are not present in the group. \n')
+            return None
+
+        chunks = [device_ids[start:start + GROUP_DEVICES_CHUNK_SIZE]
+                  for start in range(0, len(device_ids), GROUP_DEVICES_CHUNK_SIZE)]
+        state = {'response': None, 'failed': 0}
+
+        def chunk_label(index):
+            if len(chunks) <= 1:
+                return ''
+            start = index * GROUP_DEVICES_CHUNK_SIZE
+            return f"Devices {start + 1}-{start + len(chunks[index])}: "
+
+        def finish(index, future):
+            try:
+                state['response'] = future.result()
+            except ApiException as e:
+                state['failed'] += 1
+                self.app.log.error(f"[group-{action}] {chunk_label(index)}Failed to {action} devices: {e}")
+                self.app.render(f"{chunk_label(index)}ERROR: {parse_error_message(self.app, e)} \n")
+
+        pending = None
+        with ThreadPoolExecutor(max_workers=1) as executor, \
+                tqdm(total=len(device_ids), unit='device', desc='Updating group', leave=False,
+                     disable=len(chunks) <= 1) as pbar:
+            for index, chunk in enumerate(chunks):
+                # prepared while the update of the previous chunk is in flight
+                if action == 'add':
+                    chunk = [device_id for device_id in chunk if device_id not in current_device_ids]
+                data = DeviceGroupPartialUpdate(device_ids=chunk) if chunk else None
+
+                if pending:
+                    finish(*pending)
+                    pbar.update(len(chunks[pending[0]]))
+                    pending = None
+
+                if data:
+                    pending = (index, executor.submit(group_client.partial_update_group, group_id, enterprise_id,
+                                                      data, action=action))
+                else:
+                    pbar.update(len(chunks[index]))
+
+            if pending:
+                finish(*pending)
+                pbar.update(len(chunks[pending[0]]))
+
+        if state['failed'] and len(chunks) > 1:
+            self.app.log.debug(f"[group-{action}] {state['failed']} of {len(chunks)} chunks failed")
+            self.app.render(f"{state['failed']} of {len(chunks)} chunks failed \n")
+
+        if state['response'] is None and not state['failed']:
+            # Nothing to change, e.g. every device is already in the group
+            try:
+                state['response'] = group_client.get_group_by_id(group_id, enterprise_id)
+            except ApiException as e:
+                self.app.log.error(f"[group-{action}] Failed to fetch group {group_id}: {e}")
+                self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
+
+        return state['response']
+
     @ex(
         help='Add devices to group',
         arguments=[
@@ -524,10 +652,12 @@ class EnterpriseGroup(Controller):
               'nargs': "*",
               'type': str,
               'dest': 'devices'}),
+            DEVICES_FILE_ARGUMENT,
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
-              'dest': 'json'})
+              'dest': 'json'}),
+            MAX_CONCURRENCY_ARGUMENT,
         ]
     )
     def add(self):
@@ -535,7 +665,6 @@ class EnterpriseGroup(Controller):
         db = DBWrapper(self.app.creds)
         group_client = APIClient(db.get_configure()).get_group_api_client()
         enterprise_id = db.get_enterprise_id()
-        data = DeviceGroupPartialUpdate()
         action = 'add'
 
         if self.app.pargs.group_id:
@@ -554,15 +683,12 @@ class EnterpriseGroup(Controller):
 
         elif self.app.pargs.group:
             group_name = self.app.pargs.group
-            kwargs = {'name': group_name}
             try:
-                search_response = group_client.get_all_groups(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
+                group_id = NameResolver(self.app, db).group_id(group_name)
+                if not group_id:
                     self.app.log.debug(f'[group-add] Group does not exist with name {group_name}')
                     self.app.render(f'Group does not exist with name {group_name} \n')
                     return
-                response = search_response.results[0]
-                group_id = response.id
             except ApiException as e:
                 self.app.log.error(f"[group-add] Failed to list groups: {e}")
                 self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
@@ -577,45 +703,19 @@ class EnterpriseGroup(Controller):
 
             group_id = group.get('id')
 
-        devices = self.app.pargs.devices
-        if not devices or len(devices) == 0:
-            self.app.log.debug('[group-add] devices cannot be empty.')
-            self.app.render('devices cannot be empty. \n')
-            return
-
-        if len(devices) > 1000:
-            self.app.log.debug('[group-add] Cannot add more than 1000 devices at a time.')
-            self.app.render('Cannot add more than 1000 devices at a time. \n')
+        devices = self._get_devices(action)
+        if devices is None:
             return
 
         device_client = APIClient(db.get_configure()).get_device_api_client()
-        request_device_ids = []
-        for device_name in devices:
-            kwargs = {'name': device_name}
-            try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.debug(f'[group-add] Device does not exist with name {device_name}')
-                    return
-                response = search_response.results[0]
-                request_device_ids.append(response.id)
-            except ApiException as e:
-                self.app.log.error(f"[group-add] Failed to list devices: {e}")
-                self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
-                return
-
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-        device_ids = self._get_group_device_ids(device_client, enterprise_id, group_id)
-        if device_ids is None:
+        current_device_ids = self._get_group_device_ids(device_client, enterprise_id, group_id,
+                                                        self.app.pargs.max_concurrency)
+        if current_device_ids is None:
             return
 
-        device_ids.extend(request_device_ids)
-        data.device_ids = device_ids
-        try:
-            response = group_client.partial_update_group(group_id, enterprise_id, data, action=action)
-        except ApiException as e:
-            self.app.log.error(f"[group-add]  Failed to add device into a group: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
+        response = self._update_group_devices(db, group_client, enterprise_id, group_id, devices, action,
+                                              current_device_ids)
+        if response is None:
             return
 
         if not self.app.pargs.json:
@@ -641,10 +741,12 @@ class EnterpriseGroup(Controller):
               'nargs': "*",
               'type': str,
               'dest': 'devices'}),
+            DEVICES_FILE_ARGUMENT,
             (['-j', '--json'],
              {'help': 'Render result in Json format',
               'action': 'store_true',
-              'dest': 'json'})
+              'dest': 'json'}),
+            MAX_CONCURRENCY_ARGUMENT,
         ]
     )
     def remove(self):
@@ -652,7 +754,6 @@ class EnterpriseGroup(Controller):
         db = DBWrapper(self.app.creds)
         group_client = APIClient(db.get_configure()).get_group_api_client()
         enterprise_id = db.get_enterprise_id()
-        data = DeviceGroupPartialUpdate()
         action = 'remove'
 
         if self.app.pargs.group_id:
@@ -671,15 +772,12 @@ class EnterpriseGroup(Controller):
 
         elif self.app.pargs.group:
             group_name = self.app.pargs.group
-            kwargs = {'name': group_name}
             try:
-                search_response = group_client.get_all_groups(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
+                group_id = NameResolver(self.app, db).group_id(group_name)
+                if not group_id:
                     self.app.log.debug(f'[group-remove] Group does not exist with name {group_name}')
                     self.app.render(f'Group does not exist with name {group_name} \n')
                     return
-                response = search_response.results[0]
-                group_id = response.id
             except ApiException as e:
                 self.app.log.error(f"[group-remove] Failed to list groups: {e}")
                 self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
@@ -694,53 +792,19 @@ class EnterpriseGroup(Controller):
 
             group_id = group.get('id')
 
-        devices = self.app.pargs.devices
-        if not devices or len(devices) == 0:
-            self.app.log.debug('[group-remove] devices cannot be empty.')
-            self.app.render('devices cannot be empty. \n')
+        devices = self._get_devices(action)
+        if devices is None:
             return
-        
-        if len(devices) > 1000:
-            self.app.log.debug('[group-remove] Cannot remove more than 1000 devices at a time.')
-            self.app.render('Cannot remove more than 1000 devices at a time. \n')
-            return
-
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-        request_device_ids = []
-        for device_name in devices:
-            kwargs = {'name': device_name}
-            try:
-                search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-                if not search_response.results or len(search_response.results) == 0:
-                    self.app.log.debug(f'[group-remove] Device does not exist with name {device_name}')
-                    self.app.render(f'Device does not exist with name {device_name} \n')
-                    return
-                response = search_response.results[0]
-                request_device_ids.append(response.id)
-            except ApiException as e:
-                self.app.log.error(f"Failed to list devices: {e}")
-                self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
-                return
 
         device_client = APIClient(db.get_configure()).get_device_api_client()
-        current_device_ids = self._get_group_device_ids(device_client, enterprise_id, group_id)
-
-        extra_devices = list(set(request_device_ids) - set(current_device_ids))
-
-        if extra_devices:
-            self.app.log.debug('[group-remove] The given devices are not present in the group.')
-            self.app.render('The given devices are not present in the group. \n')
-            return
-
+        current_device_ids = self._get_group_device_ids(device_client, enterprise_id, group_id,
+                                                        self.app.pargs.max_concurrency)
         if current_device_ids is None:
             return
 
-        data.device_ids = request_device_ids
-        try:
-            response = group_client.partial_update_group(group_id, enterprise_id, data, action=action)
-        except ApiException as e:
-            self.app.log.error(f"[group-remove] Failed to remove device from group: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
+        response = self._update_group_devices(db, group_client, enterprise_id, group_id, devices, action,
+                                              current_device_ids)
+        if response is None:
             return
 
         if not self.app.pargs.json:
@@ -762,9 +826,9 @@ class EnterpriseGroup(Controller):
               'action': 'store',
               'dest': 'group_id'}),
             (['-l', '--limit'],
-             {'help': 'Number of results to return per page',
+             {'help': f'Number of results to return per page (default: 20, {ALL_PAGE_SIZE} with --all)',
               'action': 'store',
-              'default': 20,
+              'default': None,
               'dest': 'limit'}),
             (['-i', '--offset'],
              {'help': 'The initial index from which to return the results',
@@ -775,7 +839,7 @@ class EnterpriseGroup(Controller):
              {'help': 'Render result in Json format',
               'action': 'store_true',
               'dest': 'json'}),
-        ]
+        ] + PAGINATION_ARGUMENTS + STREAMING_ARGUMENTS
     )
     def devices(self):
         validate_creds_exists(self.app)
@@ -823,14 +887,38 @@ class EnterpriseGroup(Controller):
 
             group_id = group.get('id')
 
-        limit = self.app.pargs.limit
+        limit = page_size(self.app.pargs.limit, self.app.pargs.all, 20)
         offset = self.app.pargs.offset
 
         try:
-            response = device_client.get_all_devices(enterprise_id, group=group_id, limit=limit, offset=offset)
+            response = paginate(
+                lambda page_limit, page_offset: device_client.get_all_devices(
+                    enterprise_id, group=group_id, limit=page_limit, offset=page_offset),
+                limit, offset, self.app.pargs.all, self.app.pargs.max_concurrency)
+            # with --all, the remaining pages are fetched while rendering
+            self._render_group_devices(response)
         except ApiException as e:
             self.app.log.error(f"[group-devices] Failed to list group devices: {e}")
-            self.app.render(f"ERROR: {parse_error_message(self.app, e)} \n")
+            render_list_error(self.app, parse_error_message(self.app, e))
+
+    @staticmethod
+    def _group_device_row(device):
+        name = device.device_name
+        if device.alias_name and device.alias_name != '':
+            name = device.alias_name
+        return {
+            'id': device.id,
+            'device': name,
+            'model': device.hardware_info.get("manufacturer"),
+            'state': DeviceState(device.status).name,
+            'tags': device.tags
+        }
+
+    def _render_group_devices(self, response):
+        if self.app.pargs.format:
+            self.app.log.debug(f"[group-devices] Number of Devices: {response.count}")
+            self.app.render((self._group_device_row(device) for device in response.results),
+                            format=self.app.pargs.format, output=self.app.pargs.output)
             return
 
         self.app.render(f"Number of Devices: {response.count}")
@@ -863,20 +951,7 @@ class EnterpriseGroup(Controller):
                 )
             self.app.render(devices, format=OutputFormat.TABULATED.value, headers="keys", tablefmt="plain")
         else:
-            devices = []
-            for device in response.results:
-                name = device.device_name
-                if device.alias_name and device.alias_name != '':
-                    name = device.alias_name
-                devices.append(
-                    {
-                        'id': device.id,
-                        'device': name,
-                        'model': device.hardware_info.get("manufacturer"),
-                        'state': DeviceState(device.status).name,
-                        'tags': device.tags
-                    }
-                )
+            devices = [self._group_device_row(device) for device in response.results]
             self.app.render(devices, format=OutputFormat.JSON.value)
 
 
@@ -45,6 +45,8 @@ class DeviceState(BaseEnum):
 class OutputFormat(BaseEnum):
     TABULATED = 'tabulated'
     JSON = 'json'
+    NDJSON = 'ndjson'
+    CSV = 'csv'
 
 
 class DeviceCommandEnum(BaseEnum):
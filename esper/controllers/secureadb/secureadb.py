@@ -5,9 +5,9 @@ import ssl
 from cement import Controller, ex, CaughtSignal
 
 from esper.controllers.enums import OutputFormat
-from esper.ext.api_client import APIClient
 from esper.ext.certs import cleanup_certs, create_self_signed_cert, save_device_certificate
 from esper.ext.db_wrapper import DBWrapper
+from esper.ext.resolver import NameResolver
 from esper.ext.relay import Relay
 from esper.ext.remoteadb_api import initiate_remoteadb_connection, fetch_device_certificate, fetch_relay_endpoint, \
     RemoteADBError
@@ -40,19 +40,13 @@ class SecureADB(Controller):
         :param name: Device Name
         :return: uuid str - Device ID as UUID string
         """
-        db = DBWrapper(self.app.creds)
         device_name = name
 
-        device_client = APIClient(db.get_configure()).get_device_api_client()
-        enterprise_id = db.get_enterprise_id()
-
-        kwargs = {'name': device_name}
-
-        search_response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-        if not search_response.results or len(search_response.results) == 0:
+        device_id = NameResolver(self.app).device_id(device_name)
+        if not device_id:
             raise SecureADBWorkflowError(f'Device does not exist with name {device_name}')
 
-        return search_response.results[0].id
+        return device_id
 
     def setup_ssl_connection(self,
                              host: str,
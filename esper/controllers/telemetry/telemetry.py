@@ -2,13 +2,12 @@ from cement import Controller, ex
 from esperclient.rest import ApiException
 
 from esper.controllers.enums import OutputFormat
-from esper.ext.api_client import APIClient
 from esper.ext.db_wrapper import DBWrapper
-from esper.ext.telemetry_api import get_telemetry_url
+from esper.ext.resolver import NameResolver
+from esper.ext.telemetry_api import get_telemetry_url, get_telemetry_data
 from esper.ext.utils import validate_creds_exists, parse_error_message
 
 from datetime import datetime, timedelta
-import requests
 
 
 class Telemetry(Controller):
@@ -68,22 +67,19 @@ class Telemetry(Controller):
         db = DBWrapper(self.app.creds)
         environment = db.get_configure().get("environment")
         enterprise_id = db.get_enterprise_id()
-        device_client = APIClient(db.get_configure()).get_device_api_client()
 
         device_name = self.app.pargs.device_name
         if not device_name:
             self.app.render(f'No device specified. Use the -d, --device option to specify a device\n')
             return
-        kwargs = {'name': device_name}
 
         # Fetch device id from device name supplied as parameter
         try:
-            response = device_client.get_all_devices(enterprise_id, limit=1, offset=0, **kwargs)
-            if not response.results or len(response.results) == 0:
+            device_id = NameResolver(self.app, db).device_id(device_name)
+            if not device_id:
                 self.app.log.debug(f'[device-show] Device does not exist with name {device_name}')
                 self.app.render(f'Device does not exist with name {device_name}\n')
                 return
-            device_id = response.results[0].id
         except ApiException as e:
             self.app.log.error(f"[device-show] Failed to fetch telemetry info for device {device_name}: {e}")
             self.app.render(f"ERROR: {parse_error_message(self.app, e)}\n")
@@ -126,12 +122,7 @@ class Telemetry(Controller):
                                 statistic)
 
         api_key = db.get_configure().get("api_key")
-        response = requests.get(
-            url,
-            headers={
-                'Authorization': f'Bearer {api_key}'
-            }
-        )
+        response = get_telemetry_data(url, api_key)
 
         response_json = response.json()
         if response.status_code != 200:
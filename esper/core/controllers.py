@@ -0,0 +1,116 @@
+from collections import namedtuple
+from importlib import import_module
+
+from cement import Controller, ex
+
+# A top level sub-command of `espercli` and the controllers backing it. `handlers` lists
+# (module, class) pairs; the first is stacked on `base`, the rest are nested beneath it.
+LazyController = namedtuple('LazyController', ['label', 'stacked_type', 'help', 'handlers'])
+
+CONTROLLERS = [
+    LazyController('configure', 'embedded', 'Configure the credentials for `esper.io` API Service', [
+        ('esper.controllers.configure', 'Configure'),
+    ]),
+    LazyController('device', 'nested', None, [
+        ('esper.controllers.device.device', 'Device'),
+    ]),
+    LazyController('app', 'nested', None, [
+        ('esper.controllers.application.application', 'Application'),
+    ]),
+    LazyController('device-command', 'nested', None, [
+        ('esper.controllers.device.command', 'DeviceCommand'),
+    ]),
+    LazyController('version', 'nested', None, [
+        ('esper.controllers.application.version', 'ApplicationVersion'),
+    ]),
+    LazyController('installs', 'nested', None, [
+        ('esper.controllers.device.install', 'AppInstall'),
+    ]),
+    LazyController('status', 'nested', None, [
+        ('esper.controllers.device.status', 'DeviceStatus'),
+    ]),
+    LazyController('enterprise', 'nested', None, [
+        ('esper.controllers.enterprise.enterprise', 'Enterprise'),
+    ]),
+    LazyController('group', 'nested', None, [
+        ('esper.controllers.enterprise.group', 'EnterpriseGroup'),
+    ]),
+    LazyController('group-command', 'nested', None, [
+        ('esper.controllers.device.group_command', 'GroupCommand'),
+    ]),
+    LazyController('secureadb', 'nested', 'Setup Secure ADB connection to Device', [
+        ('esper.controllers.secureadb.secureadb', 'SecureADB'),
+    ]),
+    LazyController('token', 'nested', None, [
+        ('esper.controllers.token.token', 'Token'),
+    ]),
+    LazyController('telemetry', 'nested', None, [
+        ('esper.controllers.telemetry.telemetry', 'Telemetry'),
+    ]),
+    LazyController('pipeline', 'nested', None, [
+        ('esper.controllers.pipeline.pipeline', 'Pipeline'),
+        ('esper.controllers.pipeline.stage', 'Stage'),
+        ('esper.controllers.pipeline.operation', 'Operation'),
+        ('esper.controllers.pipeline.execute', 'Execution'),
+    ]),
+    LazyController('content', 'nested', None, [
+        ('esper.controllers.content.content', 'Content'),
+    ]),
+    LazyController('commandsV2', 'nested', None, [
+        ('esper.controllers.commandsV2.commandsV2', 'CommandsV2'),
+    ]),
+    LazyController('cache', 'nested', None, [
+        ('esper.controllers.cache.cache', 'Cache'),
+    ]),
+]
+
+
+def _load_handlers(controller):
+    return [getattr(import_module(module), name) for module, name in controller.handlers]
+
+
+def _build_placeholder(controller):
+    """
+    Build a lightweight stand-in controller, so that `--help` can list a sub-command
+    without importing its module. It is never dispatched.
+    """
+
+    class Meta:
+        label = controller.label
+        stacked_type = controller.stacked_type
+        stacked_on = 'base'
+        help = controller.help
+
+    attrs = {'Meta': Meta}
+    if controller.stacked_type == 'embedded':
+        # embedded controllers contribute their commands directly to `base`
+        def placeholder(self):
+            pass
+
+        attrs['placeholder'] = ex(help=controller.help, label=controller.label)(placeholder)
+
+    return type(f'Lazy_{controller.label}', (Controller,), attrs)
+
+
+def _get_requested_label(argv):
+    for arg in argv:
+        if not arg.startswith('-'):
+            return arg
+    return None
+
+
+def register_controllers(app):
+    """
+    Register the sub-command controllers. In lazy mode (the default) only the controllers
+    of the dispatched sub-command are imported, every other one is registered by label.
+    """
+    lazy = app.config.get('esper', 'lazy_controllers')
+    requested = _get_requested_label(app.argv)
+    app.log.debug(f"[register_controllers] Lazy: {lazy}, requested sub-command: {requested}")
+
+    for controller in CONTROLLERS:
+        if not lazy or controller.label == requested:
+            for handler in _load_handlers(controller):
+                app.handler.register(handler)
+        else:
+            app.handler.register(_build_placeholder(controller))
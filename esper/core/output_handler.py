@@ -1,14 +1,101 @@
+import csv
+import json
+import os
+import sys
+
 from cement.core.output import OutputHandler
 from cement.ext.ext_json import JsonOutputHandler
 from cement.ext.ext_tabulate import TabulateOutputHandler
 
 from esper.controllers.enums import OutputFormat
 
+# Formats written row by row, as the results are fetched
+STREAMING_FORMATS = [OutputFormat.NDJSON.value, OutputFormat.CSV.value]
+
+# `--format` and `--output`, shared by the list commands
+STREAMING_ARGUMENTS = [
+    (['--format'],
+     {'help': 'Stream results as newline delimited JSON or CSV rows, as they are fetched',
+      'action': 'store',
+      'choices': STREAMING_FORMATS,
+      'dest': 'format'}),
+    (['--output'],
+     {'help': 'Write the streamed rows to this file instead of stdout, as newline delimited JSON without --format',
+      'action': 'store',
+      'dest': 'output'}),
+]
+
+
+def render_list_error(app, message):
+    """
+    Report the failure of a list command, on stderr when its rows are streamed so that they stay parseable,
+    and exit with 1
+    """
+    if getattr(app.pargs, 'format', None) in STREAMING_FORMATS:
+        sys.stderr.write(f'ERROR: {message}\n')
+    else:
+        app.render(f'ERROR: {message}\n')
+    app.exit_code = 1
+
+
+def imply_streaming_format(app):
+    """
+    Stream the rows as newline delimited JSON when a list command is given `--output` without `--format`
+    """
+    pargs = app.pargs
+    if getattr(pargs, 'output', None) and hasattr(pargs, 'format') and not pargs.format:
+        app.log.debug(f'[imply_streaming_format] Writing {pargs.output} as {OutputFormat.NDJSON.value}')
+        pargs.format = OutputFormat.NDJSON.value
+
+
+def _csv_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return value
+
 
 class EsperOutputHandler(OutputHandler):
     class Meta:
         label = 'esper_output_handler'
 
+    def _stream(self, rows, format, output=None):
+        """
+        Write an iterable of dicts one row at a time, flushing stdout after each row so that
+        downstream tools see the first rows immediately. Nothing is returned to render.
+        An error fetching the rows, like a failed page, ends the stream: it is reported on stderr, never in the
+        rows, and the command exits with 1.
+        """
+        out = open(output, 'w', newline='') if output else sys.stdout
+        writer = None
+        try:
+            for row in rows:
+                if format == OutputFormat.NDJSON.value:
+                    out.write(json.dumps(row, default=str) + '\n')
+                else:
+                    if writer is None:
+                        writer = csv.DictWriter(out, fieldnames=list(row.keys()), extrasaction='ignore')
+                        writer.writeheader()
+                    writer.writerow({key: _csv_value(value) for key, value in row.items()})
+
+                if not output:
+                    out.flush()
+        except BrokenPipeError:
+            # The reader went away (e.g. `| head`), silence the rest of the output
+            self.app.log.debug('[render] Output stream closed by the reader')
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        except Exception as e:
+            from esperclient.rest import ApiException
+
+            from esper.ext.utils import parse_error_message
+
+            self.app.log.error(f'[render] Failed to fetch the rows to stream: {e}')
+            message = parse_error_message(self.app, e) if isinstance(e, ApiException) else str(e)
+            sys.stderr.write(f'ERROR: {message}\n')
+            self.app.exit_code = 1
+        finally:
+            if output:
+                out.close()
+
     def render(self, data, **kw):
         format = None
         if kw.get('format'):
@@ -23,6 +110,8 @@ class EsperOutputHandler(OutputHandler):
             json_handler = JsonOutputHandler()
             json_handler._setup(self.app)
             return json_handler.render(data, **kw)
+        elif format in STREAMING_FORMATS:
+            self._stream(data, format, kw.get('output'))
         else:
             self.app.log.error('Invalid output format.')
             self.app.exit_code = 0
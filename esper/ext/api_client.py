@@ -1,41 +1,65 @@
+import threading
+
 import esperclient as client
 from esperclient.configuration import Configuration
-import requests
+
+from esper.ext.timings import instrument_api_client
+from esper.ext.transport import get_pool_manager, get_default_headers
 
 
 class APIClient:
+    # One `esperclient.ApiClient` per credential, shared by every accessor
+    _api_clients = {}
+    _lock = threading.Lock()
+
     def __init__(self, credential):
-        self.config = Configuration()
-        self.config.api_key['Authorization'] = credential["api_key"]
-        self.config.api_key_prefix['Authorization'] = 'Bearer'
-        self.config.host = f"https://{credential['environment']}-api.esper.cloud/api"
+        key = (credential['environment'], credential['api_key'])
+
+        with APIClient._lock:
+            api_client = APIClient._api_clients.get(key)
+            if api_client is None:
+                config = Configuration()
+                config.api_key['Authorization'] = credential["api_key"]
+                config.api_key_prefix['Authorization'] = 'Bearer'
+                config.host = f"https://{credential['environment']}-api.esper.cloud/api"
+
+                api_client = client.ApiClient(config)
+                api_client.rest_client.pool_manager = get_pool_manager()
+                for header, value in get_default_headers().items():
+                    api_client.set_default_header(header, value)
+                instrument_api_client(api_client)
+
+                APIClient._api_clients[key] = api_client
+
+        self.config = api_client.configuration
+        self.api_client = api_client
 
     def get_enterprise_api_client(self):
-        return client.EnterpriseApi(client.ApiClient(self.config))
+        return client.EnterpriseApi(self.api_client)
 
     def get_device_api_client(self):
-        return client.DeviceApi(client.ApiClient(self.config))
+        return client.DeviceApi(self.api_client)
 
     def get_application_api_client(self):
-        return client.ApplicationApi(client.ApiClient(self.config))
+        return client.ApplicationApi(self.api_client)
 
     def get_command_api_client(self):
-        return client.CommandsApi(client.ApiClient(self.config))
+        return client.CommandsApi(self.api_client)
 
     def get_group_api_client(self):
-        return client.DeviceGroupApi(client.ApiClient(self.config))
+        return client.DeviceGroupApi(self.api_client)
 
     def get_group_command_api_client(self):
-        return client.GroupCommandsApi(client.ApiClient(self.config))
+        return client.GroupCommandsApi(self.api_client)
 
     def get_remoteadb_api_client(self):
-        return client.DeviceApi(client.ApiClient(self.config))
+        return client.DeviceApi(self.api_client)
 
     def get_token_api_client(self):
-        return client.TokenApi(client.ApiClient(self.config))
+        return client.TokenApi(self.api_client)
 
     def get_content_api_client(self):
-        return client.ContentApi(client.ApiClient(self.config))
+        return client.ContentApi(self.api_client)
         
     def get_commandsV2_api_client(self):
-        return client.CommandsV2Api(client.ApiClient(self.config))
+        return client.CommandsV2Api(self.api_client)
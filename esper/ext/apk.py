@@ -0,0 +1,144 @@
+import struct
+import zipfile
+from collections import namedtuple
+
+from esper.ext.download import hash_file
+
+ApkInfo = namedtuple('ApkInfo', ['package_name', 'version_code', 'version_name', 'sha256'])
+
+# Chunk types of Android's binary XML, from ResourceTypes.h
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_TYPE = 0x0003
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+
+# String pool flag, strings are UTF-8 rather than UTF-16
+UTF8_FLAG = 1 << 8
+
+# Attribute value types
+NO_ENTRY = 0xffffffff
+TYPE_STRING = 0x03
+TYPE_FIRST_INT = 0x10
+TYPE_LAST_INT = 0x1f
+
+# Attributes found by resource id, for manifests whose attribute names were stripped by an obfuscator
+ATTRIBUTES_BY_RESOURCE_ID = {
+    0x0101021b: 'versionCode',
+    0x0101021c: 'versionName',
+}
+
+
+class ApkError(Exception):
+    '''Exceptions related to reading an APK'''
+    pass
+
+
+def _read_length8(data, position):
+    length = data[position]
+    if length & 0x80:
+        return ((length & 0x7f) << 8) | data[position + 1], position + 2
+    return length, position + 1
+
+
+def _read_length16(data, position):
+    length, = struct.unpack_from('<H', data, position)
+    if length & 0x8000:
+        low, = struct.unpack_from('<H', data, position + 2)
+        return ((length & 0x7fff) << 16) | low, position + 4
+    return length, position + 2
+
+
+def _read_string_pool(data, offset, header_size):
+    string_count, _, flags, strings_start = struct.unpack_from('<4I', data, offset + 8)
+    string_offsets = struct.unpack_from(f'<{string_count}I', data, offset + header_size)
+
+    strings = []
+    for string_offset in string_offsets:
+        position = offset + strings_start + string_offset
+        if flags & UTF8_FLAG:
+            # the length in UTF-16 units comes first, then the length in bytes
+            _, position = _read_length8(data, position)
+            length, position = _read_length8(data, position)
+            strings.append(data[position:position + length].decode('utf-8', 'replace'))
+        else:
+            length, position = _read_length16(data, position)
+            strings.append(data[position:position + length * 2].decode('utf-16-le', 'replace'))
+
+    return strings
+
+
+def _read_attributes(data, offset, header_size, strings, resource_ids):
+    attribute_start, attribute_size, attribute_count = struct.unpack_from('<3H', data, offset + header_size + 8)
+
+    attributes = {}
+    position = offset + header_size + attribute_start
+    for _ in range(attribute_count):
+        _, name, raw_value, _, _, data_type, value = struct.unpack_from('<3IHBBI', data, position)
+        position += attribute_size
+
+        if name < len(resource_ids) and resource_ids[name] in ATTRIBUTES_BY_RESOURCE_ID:
+            key = ATTRIBUTES_BY_RESOURCE_ID[resource_ids[name]]
+        else:
+            key = strings[name]
+
+        if data_type == TYPE_STRING:
+            attributes[key] = strings[value]
+        elif raw_value != NO_ENTRY:
+            attributes[key] = strings[raw_value]
+        elif TYPE_FIRST_INT <= data_type <= TYPE_LAST_INT:
+            attributes[key] = value
+
+    return attributes
+
+
+def parse_manifest(data):
+    """
+    Read the attributes of the root `<manifest>` element of a compiled, binary AndroidManifest.xml
+    :return: dict of attribute name to value, e.g. {'package': 'com.example', 'versionCode': 12, ...}
+    :raise ApkError: If the manifest cannot be parsed
+    """
+    try:
+        file_type, header_size, size = struct.unpack_from('<HHI', data, 0)
+        if file_type != RES_XML_TYPE:
+            raise ApkError('AndroidManifest.xml is not a compiled manifest')
+
+        strings, resource_ids = [], ()
+        offset = header_size
+        while offset < min(size, len(data)):
+            chunk_type, chunk_header_size, chunk_size = struct.unpack_from('<HHI', data, offset)
+            if chunk_type == RES_STRING_POOL_TYPE:
+                strings = _read_string_pool(data, offset, chunk_header_size)
+            elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+                count = (chunk_size - chunk_header_size) // 4
+                resource_ids = struct.unpack_from(f'<{count}I', data, offset + chunk_header_size)
+            elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+                return _read_attributes(data, offset, chunk_header_size, strings, resource_ids)
+
+            if chunk_size == 0:
+                break
+            offset += chunk_size
+    except (struct.error, IndexError) as e:
+        raise ApkError(f'Invalid AndroidManifest.xml: {e}')
+
+    raise ApkError('AndroidManifest.xml has no manifest element')
+
+
+def read_apk_info(path):
+    """
+    Read the package name and version of an APK from its manifest, read from the zip without extracting
+    the archive, and hash the whole file
+    :return: ApkInfo, the version code as a string like the API returns it
+    :raise ApkError: If the file is not an APK
+    """
+    try:
+        with zipfile.ZipFile(path) as apk:
+            manifest = parse_manifest(apk.read('AndroidManifest.xml'))
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ApkError(f'{path} is not an APK: {e}')
+
+    if not manifest.get('package'):
+        raise ApkError(f'{path} has no package name in its manifest')
+
+    version_code = manifest.get('versionCode')
+    return ApkInfo(manifest['package'], str(version_code) if version_code is not None else None,
+                   manifest.get('versionName'), hash_file(path).hexdigest())
@@ -0,0 +1,248 @@
+import errno
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from cement.utils import fs
+
+from esper.ext.download import hash_algorithm
+from esper.ext.timings import TIMINGS
+
+# `ioctl` cloning a file into another on copy-on-write filesystems (btrfs, xfs), from linux/fs.h
+FICLONE = 0x40049409
+
+# Errors meaning a reflink is not possible here, falling back to a copy
+_UNSUPPORTED_ERRNOS = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EPERM, errno.ENOSYS}
+
+
+def _temp_path(destination):
+    directory = os.path.dirname(os.path.abspath(destination))
+    fd, tmp_file = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(destination)}.')
+    os.close(fd)
+    os.remove(tmp_file)
+    return tmp_file
+
+
+def _reflink(source, destination):
+    import fcntl
+
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def clone_file(source, destination):
+    """
+    Make `destination` a copy of `source` in the cheapest way the filesystem allows: a reflink, sharing
+    blocks copy-on-write, else a plain copy. Never a hard link, so that editing one file in place leaves
+    the other intact. `destination` is replaced atomically.
+    :return: 'reflink' or 'copy'
+    """
+    tmp_file = _temp_path(destination)
+    try:
+        try:
+            _reflink(source, tmp_file)
+            method = 'reflink'
+        except (OSError, ImportError) as e:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            if isinstance(e, OSError) and e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+
+            method = 'copy'
+            shutil.copyfile(source, tmp_file)
+
+        os.replace(tmp_file, destination)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    return method
+
+
+class ArtifactCache:
+    """
+    Local content-addressed cache of downloaded artifacts. Files are stored once under `objects/`, named after
+    their digest, and looked up by a key made of the version id and the checksum published by the server.
+    Least recently used artifacts are evicted once the cache grows past `max_size` bytes.
+    The index is loaded on first use and written back once, when the app closes.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = int(max_size)
+        self.index_file = os.path.join(directory, 'index.json')
+        self.objects_dir = os.path.join(directory, 'objects')
+
+        self._lock = threading.RLock()
+        self._data = None
+        self._dirty = False
+
+    def _load(self):
+        if self._data is None:
+            data = {}
+            if os.path.exists(self.index_file):
+                try:
+                    with open(self.index_file, 'r') as f:
+                        data = json.load(f)
+                except ValueError:
+                    # A corrupted index is simply rebuilt, `prune` removes the objects it lost
+                    data = {}
+
+            data.setdefault('entries', {})
+            data.setdefault('objects', {})
+            self._data = data
+
+        return self._data
+
+    @staticmethod
+    def _key(version_id, checksum):
+        return f'{version_id}:{checksum or ""}'
+
+    def _object_path(self, name):
+        return os.path.join(self.objects_dir, name)
+
+    def get(self, version_id, checksum):
+        """
+        Look up a cached artifact, marking it as recently used. A checksum the cache can verify, an md5, sha1 or
+        sha256 hex digest, must be the digest of the cached file.
+        :return: (path, object name), or (None, None) on a miss. The object name is `<algorithm>-<hex digest>`
+        """
+        with self._lock:
+            data = self._load()
+            key = self._key(version_id, checksum)
+            name = data['entries'].get(key)
+            algorithm = hash_algorithm(checksum)
+            if name is not None and algorithm and name != f'{algorithm}-{checksum.lower()}':
+                # the published checksum is not the one of the cached file
+                data['entries'].pop(key)
+                self._dirty = True
+                name = None
+
+            if name is not None:
+                path = self._object_path(name)
+                obj = data['objects'].get(name)
+                if obj and os.path.exists(path) and os.path.getsize(path) == obj['size']:
+                    obj['used'] = time.time()
+                    self._dirty = True
+                    TIMINGS.record_cache(True)
+                    return path, name
+
+                # removed or changed behind our back
+                self._remove_object(name)
+
+        TIMINGS.record_cache(False)
+        return None, None
+
+    def put(self, version_id, checksum, path, algorithm, hexdigest):
+        """
+        Add a downloaded file to the cache, then evict down to `max_size`
+        :param algorithm: Name of the hash algorithm of `hexdigest`, the digest of the file
+        """
+        name = f'{algorithm}-{hexdigest}'
+        with self._lock:
+            data = self._load()
+            if name not in data['objects'] or not os.path.exists(self._object_path(name)):
+                fs.ensure_dir_exists(self.objects_dir)
+                clone_file(path, self._object_path(name))
+                data['objects'][name] = {'size': os.path.getsize(path)}
+
+            data['objects'][name]['used'] = time.time()
+            data['entries'][self._key(version_id, checksum)] = name
+            self._dirty = True
+            self.evict(self.max_size, keep=name)
+
+    def size(self):
+        with self._lock:
+            return sum(obj['size'] for obj in self._load()['objects'].values())
+
+    def _remove_object(self, name):
+        data = self._load()
+        data['objects'].pop(name, None)
+        data['entries'] = {key: value for key, value in data['entries'].items() if value != name}
+        self._dirty = True
+
+        path = self._object_path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def evict(self, max_size, keep=None):
+        """
+        Remove the least recently used artifacts until the cache holds at most `max_size` bytes
+        :param keep: Object name never evicted, the one just added
+        :return: (number of artifacts removed, bytes freed)
+        """
+        removed, freed = 0, 0
+        with self._lock:
+            objects = self._load()['objects']
+            size = self.size()
+            for name in sorted(objects, key=lambda n: objects[n].get('used', 0)):
+                if size <= max_size:
+                    break
+                if name == keep:
+                    continue
+
+                object_size = objects[name]['size']
+                self._remove_object(name)
+                size -= object_size
+                removed += 1
+                freed += object_size
+
+        return removed, freed
+
+    def prune(self, max_size=None):
+        """
+        Evict down to `max_size`, `max_size` of the cache by default, and delete files the index does not know
+        :return: (number of artifacts removed, bytes freed)
+        """
+        with self._lock:
+            removed, freed = self.evict(self.max_size if max_size is None else max_size)
+
+            objects = self._load()['objects']
+            if os.path.isdir(self.objects_dir):
+                for file_name in os.listdir(self.objects_dir):
+                    if file_name not in objects:
+                        path = self._object_path(file_name)
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+                        removed += 1
+
+        return removed, freed
+
+    def save(self):
+        """
+        Write the index back to disk, if it changed, replacing the file atomically
+        """
+        with self._lock:
+            if not self._dirty or self._data is None:
+                return
+
+            fs.ensure_dir_exists(self.directory)
+            fd, tmp_file = tempfile.mkstemp(dir=self.directory, prefix='.index.')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self._data, f)
+                os.replace(tmp_file, self.index_file)
+            except OSError:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+
+            self._dirty = False
+
+
+def init_artifact_cache(app):
+    cache_dir = fs.abspath(app.config.get('esper', 'artifact_cache_dir'))
+
+    app.log.debug(f"[init_artifact_cache] Artifact cache directory: {cache_dir}")
+    app.extend('artifact_cache', ArtifactCache(cache_dir, app.config.get('esper', 'artifact_cache_max_size')))
+
+
+def save_artifact_cache(app):
+    try:
+        app.artifact_cache.save()
+    except OSError as e:
+        app.log.warning(f"[save_artifact_cache] Failed to save the artifact cache: {e}")
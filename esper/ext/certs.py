@@ -1,22 +1,6 @@
 from pathlib import Path
 
 from OpenSSL import crypto
-from cement.utils import fs
-
-
-def init_certs(app):
-    certs_folder = app.config.get('esper', 'certs_folder')
-    path = fs.abspath(certs_folder)
-
-    # Check if path exists
-    if not Path(path).exists():
-        app.log.debug(f"[init_certs] Creating Certs folder!")
-        fs.ensure_dir_exists(path)
-
-    app.extend('certs_path', path)
-    app.extend('local_key', fs.abspath(app.config.get('esper', 'local_key')))
-    app.extend('local_cert', fs.abspath(app.config.get('esper', 'local_cert')))
-    app.extend('device_cert', fs.abspath(app.config.get('esper', 'device_cert')))
 
 
 def cleanup_certs(app):
@@ -0,0 +1,102 @@
+import time
+from collections import Counter
+
+from esper.controllers.enums import CommandState
+
+# States a device command does not leave
+TERMINAL_STATES = frozenset([
+    CommandState.SUCCESS.value,
+    CommandState.FAILURE.value,
+    CommandState.TIMEOUT.value,
+    CommandState.CANCELLED.value,
+])
+
+# Exit codes of `commandsV2 status --watch`
+WATCH_SUCCEEDED = 0
+WATCH_FAILED = 2
+WATCH_TIMED_OUT = 3
+WATCH_NO_STATUSES = 4
+
+# Seconds `commandsV2 status --watch` waits at most by default
+DEFAULT_WATCH_TIMEOUT = 3600
+
+
+def status_device_id(status):
+    # `device` is the device url, ending with `/<device id>/`
+    return status.device.split('/')[-2]
+
+
+class CommandStatusWatcher:
+    """
+    Poll the statuses of a command request until every device reaches a terminal state.
+    Polls come every `min_interval` seconds while states change, backing off up to `max_interval` when idle.
+    Only the statuses that changed since the previous poll are reported. A request without any status
+    on the first poll is not waited for.
+    """
+
+    def __init__(self, fetch, min_interval=2.0, max_interval=30.0, timeout=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        :param fetch: Callable returning the current list of statuses
+        """
+        self.fetch = fetch
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.timeout = timeout
+
+        self._clock = clock
+        self._sleep = sleep
+        self.states = {}
+
+    def histogram(self):
+        return Counter(state for state, _ in self.states.values())
+
+    def done(self):
+        return bool(self.states) and all(state in TERMINAL_STATES for state, _ in self.states.values())
+
+    def exit_code(self):
+        if not self.states:
+            return WATCH_NO_STATUSES
+        if not self.done():
+            return WATCH_TIMED_OUT
+        if any(state != CommandState.SUCCESS.value for state, _ in self.states.values()):
+            return WATCH_FAILED
+        return WATCH_SUCCEEDED
+
+    def poll(self):
+        """
+        Fetch the statuses once
+        :return: list of the statuses which are new or changed state
+        """
+        changed = []
+        for status in self.fetch():
+            device_id = status_device_id(status)
+            current = (status.state, status.reason)
+            if self.states.get(device_id) != current:
+                self.states[device_id] = current
+                changed.append(status)
+
+        return changed
+
+    def watch(self):
+        """
+        Generator polling until done or timed out, yielding the changed statuses of each poll
+        """
+        started = self._clock()
+        interval = self.min_interval
+
+        while True:
+            changed = self.poll()
+            yield changed
+
+            if self.done() or not self.states:
+                return
+
+            interval = self.min_interval if changed else min(self.max_interval, interval * 2)
+            if self.timeout is not None:
+                remaining = self.timeout - (self._clock() - started)
+                if remaining <= 0:
+                    return
+                interval = min(interval, remaining)
+
+            self._sleep(interval)
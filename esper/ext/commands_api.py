@@ -0,0 +1,53 @@
+def _get_page(api_client, path: str, path_params: dict, limit: int, offset: int, filters: dict, response_type: str):
+    query_params = [(key, value) for key, value in filters.items() if value is not None]
+    query_params.extend([('limit', limit), ('offset', offset)])
+
+    return api_client.call_api(
+        path, 'GET',
+        path_params,
+        query_params,
+        {'Accept': api_client.select_header_accept(['application/json'])},
+        response_type=response_type,
+        auth_settings=['apiKey'],
+        _return_http_data_only=True)
+
+
+def list_command_requests(api_client, enterprise_id: str, limit: int, offset: int, **filters):
+    """
+    List command requests one page at a time. `CommandsV2Api.list_command_request` does not
+    expose the endpoint's limit and offset, so the request is issued through the api client.
+    :param api_client: esperclient.ApiClient
+    :param enterprise_id:
+    :param limit:
+    :param offset:
+    :param filters: Same filters as `CommandsV2Api.list_command_request`
+    :return: InlineResponse2009
+    """
+    return _get_page(api_client, '/v0/enterprise/{enterprise_id}/command/', {'enterprise_id': enterprise_id},
+                     limit, offset, filters, 'InlineResponse2009')
+
+
+def list_command_request_statuses(api_client, enterprise_id: str, request_id: str, limit: int, offset: int,
+                                  **filters):
+    """
+    List the device statuses of a command request one page at a time, like
+    `CommandsV2Api.get_command_request_status` with the endpoint's limit and offset.
+    :param filters: Same filters as `CommandsV2Api.get_command_request_status`
+    :return: InlineResponse20010
+    """
+    return _get_page(api_client, '/v0/enterprise/{enterprise_id}/command/{request_id}/status/',
+                     {'enterprise_id': enterprise_id, 'request_id': request_id},
+                     limit, offset, filters, 'InlineResponse20010')
+
+
+def list_device_command_history(api_client, enterprise_id: str, device_id: str, limit: int, offset: int,
+                                **filters):
+    """
+    List the command history of a device one page at a time, like
+    `CommandsV2Api.get_device_command_history` with the endpoint's limit and offset.
+    :param filters: Same filters as `CommandsV2Api.get_device_command_history`
+    :return: InlineResponse20010
+    """
+    return _get_page(api_client, '/v0/enterprise/{enterprise_id}/device/{device_id}/command-history/',
+                     {'enterprise_id': enterprise_id, 'device_id': device_id},
+                     limit, offset, filters, 'InlineResponse20010')
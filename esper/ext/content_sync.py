@@ -0,0 +1,165 @@
+import json
+import os
+import tempfile
+import threading
+from collections import namedtuple
+
+from cement.utils import fs
+
+from esper.ext.download import hash_algorithm, hash_file
+
+# One step of a sync. `action` is `upload` or `delete`; `reason` is `new` or `changed` for an upload, `orphan`,
+# `duplicate` or `replaced` for a delete. `path` is the local file, `content_id` the remote content.
+SyncAction = namedtuple('SyncAction', ['action', 'name', 'reason', 'path', 'content_id', 'size'])
+
+
+class LocalHashCache:
+    """
+    Digests of local files, kept as long as their size and modification time do not change, so that syncing
+    an unchanged directory again does not read the files
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+        self._lock = threading.Lock()
+        self._data = None
+        self._dirty = False
+
+    def _load(self):
+        if self._data is None:
+            self._data = {}
+            if os.path.exists(self.file):
+                try:
+                    with open(self.file, 'r') as f:
+                        self._data = json.load(f)
+                except ValueError:
+                    # A corrupted cache is simply rebuilt
+                    self._data = {}
+
+        return self._data
+
+    def digest(self, path, algorithm):
+        """
+        :return: hex digest of a file
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._load().get(path)
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns \
+                    and algorithm in entry['digests']:
+                return entry['digests'][algorithm]
+
+        digest = hash_file(path, algorithm)
+
+        with self._lock:
+            data = self._load()
+            entry = data.get(path)
+            if not entry or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+                entry = data[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digests': {}}
+            entry['digests'][algorithm] = digest.hexdigest()
+            self._dirty = True
+
+        return digest.hexdigest()
+
+    def save(self):
+        """
+        Write the cache back to disk, if it changed, replacing the file atomically
+        """
+        with self._lock:
+            if not self._dirty or self._data is None:
+                return
+
+            fs.ensure_parent_dir_exists(self.file)
+            fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(self.file) or '.', prefix='.content_sync.')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self._data, f)
+                os.replace(tmp_file, self.file)
+            except OSError:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+
+            self._dirty = False
+
+
+def content_size(content):
+    """
+    :return: Size of a remote content in bytes, None if it is unknown
+    """
+    try:
+        return int(content.size)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_in_root(content):
+    """
+    Whether a content is a file at the root of the library, its path being empty or just its name
+    """
+    if content.is_dir:
+        return False
+
+    parts = [part for part in (content.path or '').split('/') if part]
+    if parts and parts[-1] == content.name:
+        parts.pop()
+    return not parts
+
+
+def is_same_file(path, content, hash_cache):
+    """
+    Compare a local file with a remote content of the same name, by size then by hash. Only what the server
+    reports in a known form is compared; with neither, the same name is the same file.
+    """
+    remote_size = content_size(content)
+    if remote_size is not None and remote_size != os.path.getsize(path):
+        return False
+
+    algorithm = hash_algorithm(content.hash)
+    if algorithm:
+        return hash_cache.digest(path, algorithm) == content.hash.lower()
+
+    return True
+
+
+def plan_sync(local_files, contents, hash_cache):
+    """
+    Compare local files with the remote contents, by name, size and hash. Uploads land at the root of the
+    library, so only its files are compared; folders and the contents inside them are left alone.
+    :param local_files: dict of file name to path
+    :param contents: iterable of remote Content
+    :return: (list of SyncAction, number of unchanged files). Deletes are planned whether or not they are run:
+             remote contents without a local file (`orphan`), extra contents matching an unchanged file
+             (`duplicate`), and the previous contents of a changed file (`replaced`, to delete once it is uploaded)
+    """
+    remote = {}
+    for content in contents:
+        if is_in_root(content):
+            remote.setdefault(content.name, []).append(content)
+
+    actions = []
+    unchanged = 0
+    for name, path in sorted(local_files.items()):
+        size = os.path.getsize(path)
+        matches = remote.pop(name, [])
+        if not matches:
+            actions.append(SyncAction('upload', name, 'new', path, None, size))
+            continue
+
+        same = next((content for content in matches if is_same_file(path, content, hash_cache)), None)
+        if same:
+            unchanged += 1
+            actions.extend(SyncAction('delete', name, 'duplicate', None, content.id, content_size(content))
+                           for content in matches if content is not same)
+        else:
+            actions.append(SyncAction('upload', name, 'changed', path, None, size))
+            actions.extend(SyncAction('delete', name, 'replaced', None, content.id, content_size(content))
+                           for content in matches)
+
+    for name, orphans in sorted(remote.items()):
+        actions.extend(SyncAction('delete', name, 'orphan', None, content.id, content_size(content))
+                       for content in orphans)
+
+    return actions, unchanged
@@ -1,99 +1,148 @@
+import json
+import os
+import tempfile
+import weakref
+
 from tinydb import Query
+from tinydb.middlewares import Middleware
+from tinydb.storages import Storage
 
+# Each key is stored as a single document in the credentials DB
+KEYS = ('config', 'application', 'device', 'group')
 
-class DBWrapper:
+# In-memory view of the stored keys, loaded once per DB
+_views = weakref.WeakKeyDictionary()
 
-    def __init__(self, db):
-        self.db = db
 
-    def set_configure(self, configure_data):
-        Configure = Query()
+class AtomicJSONStorage(Storage):
+    """
+    JSON file storage, writing the whole file at once by replacing it, so that a failed
+    write never leaves a truncated DB behind.
+    """
 
-        if self.db.get(Configure.config.exists()):
-            self.db.remove(Configure.config.exists())
+    def __init__(self, path, **kwargs):
+        super(AtomicJSONStorage, self).__init__()
+        self.path = path
+        self.kwargs = kwargs
 
-        self.db.insert({'config': configure_data})
+    def read(self):
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return None
 
-    def get_configure(self):
-        Configure = Query()
+        with open(self.path, 'r') as f:
+            return json.load(f)
 
-        db_result = self.db.get(Configure.config.exists())
+    def write(self, data):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', prefix='.db.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, **self.kwargs)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
 
-        configure = None
-        if db_result:
-            configure = db_result['config']
+    def close(self):
+        pass
 
-        return configure
 
-    def get_enterprise_id(self):
-        configure = self.get_configure()
-        return configure.get('enterprise_id') if configure else None
+class WriteThroughCachingMiddleware(Middleware):
+    """
+    Read the storage once and serve every later read from memory. Unlike tinydb's
+    `CachingMiddleware`, each write goes to the storage straight away.
+    """
 
-    def set_application(self, application):
-        Application = Query()
+    def __init__(self, storage_cls):
+        super(WriteThroughCachingMiddleware, self).__init__(storage_cls)
+        self.cache = None
 
-        if self.db.get(Application.application.exists()):
-            self.db.remove(Application.application.exists())
+    def read(self):
+        if self.cache is None:
+            self.cache = self.storage.read()
+        return self.cache
 
-        self.db.insert({'application': application})
+    def write(self, data):
+        self.storage.write(data)
+        self.cache = data
 
-    def get_application(self):
-        Application = Query()
+    def close(self):
+        self.storage.close()
 
-        db_result = self.db.get(Application.application.exists())
 
-        application = None
-        if db_result:
-            application = db_result['application']
+class DBWrapper:
 
-        return application
+    def __init__(self, db):
+        self.db = db
 
-    def unset_application(self):
-        Application = Query()
-        self.db.remove(Application.application.exists())
+    @property
+    def _view(self):
+        view = _views.get(self.db)
+        if view is None:
+            view = {}
+            for document in self.db.all():
+                for key in KEYS:
+                    if key in document:
+                        view[key] = document[key]
 
-    def set_device(self, device):
-        Device = Query()
+            _views[self.db] = view
 
-        if self.db.get(Device.device.exists()):
-            self.db.remove(Device.device.exists())
+        return view
 
-        self.db.insert({'device': device})
+    def _get(self, key):
+        return self._view.get(key)
 
-    def get_device(self):
-        Device = Query()
+    def _set(self, key, value):
+        Record = Query()
 
-        db_result = self.db.get(Device.device.exists())
+        # A single write: update the existing document, or insert the first one
+        if key in self._view:
+            self.db.update({key: value}, Record[key].exists())
+        else:
+            self.db.insert({key: value})
 
-        device = None
-        if db_result:
-            device = db_result['device']
+        self._view[key] = value
 
-        return device
+    def _unset(self, key):
+        Record = Query()
 
-    def unset_device(self):
-        Device = Query()
-        self.db.remove(Device.device.exists())
+        if key in self._view:
+            self.db.remove(Record[key].exists())
+            del self._view[key]
 
-    def set_group(self, group):
-        Group = Query()
+    def set_configure(self, configure_data):
+        self._set('config', configure_data)
 
-        if self.db.get(Group.group.exists()):
-            self.db.remove(Group.group.exists())
+    def get_configure(self):
+        return self._get('config')
 
-        self.db.insert({'group': group})
+    def get_enterprise_id(self):
+        configure = self.get_configure()
+        return configure.get('enterprise_id') if configure else None
 
-    def get_group(self):
-        Group = Query()
+    def set_application(self, application):
+        self._set('application', application)
+
+    def get_application(self):
+        return self._get('application')
 
-        db_result = self.db.get(Group.group.exists())
+    def unset_application(self):
+        self._unset('application')
 
-        group = None
-        if db_result:
-            group = db_result['group']
+    def set_device(self, device):
+        self._set('device', device)
 
-        return group
+    def get_device(self):
+        return self._get('device')
+
+    def unset_device(self):
+        self._unset('device')
+
+    def set_group(self, group):
+        self._set('group', group)
+
+    def get_group(self):
+        return self._get('group')
 
     def unset_group(self):
-        Group = Query()
-        self.db.remove(Group.group.exists())
+        self._unset('group')
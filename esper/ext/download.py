@@ -0,0 +1,296 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Queue
+
+from tqdm import tqdm
+
+from esper.ext.transport import TRANSPORT_SETTINGS, get_session
+
+# Suffix of the file a download is written to until it is complete
+PARTIAL_SUFFIX = '.part'
+
+# Suffix of the marker kept next to the partial file while ranges are written into it out of order
+RANGES_MARKER_SUFFIX = '.ranges'
+
+# Smallest byte range fetched on its own connection
+MIN_RANGE_SIZE = 1024 * 1024
+
+# Hash algorithm of a published checksum, by length of its hex digest
+HASH_ALGORITHMS_BY_LENGTH = {32: 'md5', 40: 'sha1', 64: 'sha256'}
+DEFAULT_HASH_ALGORITHM = 'sha256'
+
+# Bytes read at a time while hashing a local file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class DownloadError(Exception):
+    '''Exceptions related to downloading a file'''
+    pass
+
+
+def _content_range_total(response):
+    # `Content-Range: bytes */<total>` on a 416, `bytes <first>-<last>/<total>` on a 206
+    try:
+        return int(response.headers.get('Content-Range', '').rsplit('/', 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def hash_algorithm(checksum):
+    """
+    :return: Name of the hash algorithm of a hex digest, from its length, or None if it is not one
+    """
+    if not checksum or len(checksum) not in HASH_ALGORITHMS_BY_LENGTH:
+        return None
+    try:
+        int(checksum, 16)
+    except ValueError:
+        return None
+    return HASH_ALGORITHMS_BY_LENGTH[len(checksum)]
+
+
+def hash_file(path, algorithm=DEFAULT_HASH_ALGORITHM, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Hash a file, read in chunks
+    :return: hashlib object of the file, which can be updated with more data
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+
+    return digest
+
+
+def _download_stream(url, partial, algorithm, chunk_size, progress):
+    """
+    :return: hashlib object of the downloaded file
+    """
+    offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+    with get_session().get(url, headers=headers, stream=True) as response:
+        if response.status_code == 416:
+            if _content_range_total(response) != offset:
+                os.remove(partial)
+                raise DownloadError(f'{partial} does not match the remote file and was removed, run the download again')
+
+            # the partial file already holds the whole file
+            digest = hash_file(partial, algorithm, chunk_size)
+            if progress:
+                progress(offset)
+            return digest
+
+        response.raise_for_status()
+        if response.status_code != 206:
+            # the server ignored the range and sends the whole file
+            offset = 0
+
+        digest = hash_file(partial, algorithm, chunk_size) if offset else hashlib.new(algorithm)
+        if offset and progress:
+            progress(offset)
+
+        with open(partial, 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                digest.update(chunk)
+                if progress:
+                    progress(len(chunk))
+
+    return digest
+
+
+def _get_ranged_size(url):
+    """
+    Fetch the first byte of `url` to find out whether the server serves byte ranges
+    :return: Size of the remote file, None without range support
+    """
+    with get_session().get(url, headers={'Range': 'bytes=0-0'}, stream=True) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            return None
+        return _content_range_total(response)
+
+
+def _split_ranges(first, total, connections):
+    size = max(MIN_RANGE_SIZE, -(-(total - first) // connections))
+    return [(start, min(start + size, total) - 1) for start in range(first, total, size)]
+
+
+def _fetch_range(url, fd, start, end, chunk_size, written, progress, stop_after):
+    with get_session().get(url, headers={'Range': f'bytes={start}-{end}'}, stream=True) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise DownloadError(f'The server ignored the range {start}-{end}')
+
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if start > stop_after[0]:
+                return
+            os.pwrite(fd, chunk, start + written[start])
+            written[start] += len(chunk)
+            if progress:
+                progress(len(chunk))
+
+    if written[start] != end - start + 1:
+        raise DownloadError(f'Range {start}-{end} ended after {written[start]} bytes')
+
+
+def _download_ranges(url, partial, total, connections, chunk_size, progress):
+    offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+    if offset > total:
+        os.remove(partial)
+        offset = 0
+    if offset and progress:
+        progress(offset)
+
+    ranges = _split_ranges(offset, total, connections)
+    if not ranges:
+        return
+
+    lock = threading.Lock()
+    written = {start: 0 for start, _ in ranges}
+    # ranges starting after this offset are given up
+    stop_after = [total]
+    error = None
+
+    def locked_progress(size):
+        with lock:
+            progress(size)
+
+    # while the marker exists the partial file has holes, it is only resumed from once they are cut off below
+    marker = partial + RANGES_MARKER_SUFFIX
+    open(marker, 'w').close()
+    with open(partial, 'ab') as f:
+        f.truncate(total)
+
+    fd = os.open(partial, os.O_WRONLY)
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = {executor.submit(_fetch_range, url, fd, start, end, chunk_size, written,
+                                       locked_progress if progress else None, stop_after): start
+                       for start, end in ranges}
+            try:
+                for future in as_completed(futures):
+                    if future.exception() is not None:
+                        # the ranges before the failed one still complete the prefix kept for resuming
+                        stop_after[0] = min(stop_after[0], futures[future])
+                        error = error or future.exception()
+            except BaseException:
+                stop_after[0] = -1
+                raise
+
+        if error:
+            raise error
+    except BaseException:
+        # keep the bytes downloaded without a hole, for the next run to resume from
+        downloaded = offset
+        for start, end in ranges:
+            downloaded = start + written[start]
+            if written[start] != end - start + 1:
+                break
+        os.ftruncate(fd, downloaded)
+        raise
+    finally:
+        os.close(fd)
+        os.remove(marker)
+
+
+def download_file(url, destination, checksum=None, progress=None, chunk_size=None, connections=1):
+    """
+    Download `url` to `destination`, resuming an interrupted download.
+    The file is written to `<destination>.part`, continued with a `Range` request from its current size, and
+    renamed to `destination` once complete and verified, so that `destination` never holds a partial file.
+    With several `connections`, the rest of the file is split in byte ranges fetched concurrently and written in
+    place in the preallocated partial file; servers without range support fall back to a single stream.
+    :param checksum: Expected hex digest of the file, md5, sha1 or sha256 depending on its length; anything else
+                     is not verified
+    :param progress: Callable receiving the number of bytes on disk, first the resumed ones then as chunks are written
+    :param chunk_size: Bytes read at a time, `download_chunk_size` from the config by default
+    :param connections: Number of ranges fetched at once
+    :return: hashlib object of the downloaded file
+    :raise DownloadError: On a checksum mismatch or an unusable partial file, which is removed
+    """
+    chunk_size = int(chunk_size or TRANSPORT_SETTINGS['download_chunk_size'])
+    algorithm = hash_algorithm(checksum)
+    if not algorithm:
+        # not a digest this can verify
+        checksum = None
+        algorithm = DEFAULT_HASH_ALGORITHM
+    partial = destination + PARTIAL_SUFFIX
+
+    if os.path.exists(partial + RANGES_MARKER_SUFFIX):
+        # left by a ranged download which was killed, the partial file has holes
+        os.remove(partial + RANGES_MARKER_SUFFIX)
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    total = _get_ranged_size(url) if connections > 1 else None
+    if total is not None:
+        _download_ranges(url, partial, total, connections, chunk_size, progress)
+        # ranges arrive out of order, the digest is computed from the file
+        digest = hash_file(partial, algorithm, chunk_size)
+    else:
+        digest = _download_stream(url, partial, algorithm, chunk_size, progress)
+
+    if checksum and digest.hexdigest() != checksum.lower():
+        os.remove(partial)
+        raise DownloadError(f'{algorithm} checksum mismatch: expected {checksum}, got {digest.hexdigest()}')
+
+    os.replace(partial, destination)
+    return digest
+
+
+def download_batch(downloads, max_concurrency, format_error=str, connections=1):
+    """
+    Download files through a bounded pool of workers, showing the bytes received overall and for each download
+    in flight. Each file is resumed, verified and renamed into place like `download_file` does.
+    :param downloads: list of (url, destination, checksum, size), the size in bytes or None if unknown
+    :param format_error: Callable turning the exception of a failed download into a message
+    :param connections: Number of ranges fetched at once for each file
+    :return: Generator of one row per file, in completion order: file, status (`downloaded` or `failed`),
+             algorithm, digest and error
+    """
+    if not downloads:
+        return
+
+    workers = max(1, min(max_concurrency, len(downloads)))
+    positions = Queue()
+    for position in range(1, workers + 1):
+        positions.put(position)
+
+    lock = threading.Lock()
+    total_size = sum(size or 0 for _, _, _, size in downloads) or None
+
+    with tqdm(total=total_size, unit='B', unit_scale=True, unit_divisor=1024,
+              desc=f'Downloading {len(downloads)} files') as total_bar:
+        def run(url, destination, checksum, size):
+            position = positions.get()
+            try:
+                with tqdm(total=size, unit='B', unit_scale=True, unit_divisor=1024,
+                          desc=os.path.basename(destination), position=position, leave=False) as file_bar:
+                    def progress(received):
+                        with lock:
+                            file_bar.update(received)
+                            total_bar.update(received)
+
+                    return download_file(url, destination, checksum=checksum, progress=progress,
+                                         connections=connections)
+            finally:
+                positions.put(position)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run, *download): download[1] for download in downloads}
+            for future in as_completed(futures):
+                destination = futures[future]
+                try:
+                    digest = future.result()
+                except Exception as e:
+                    # one failed file does not stop the batch, its partial file is resumed by the next run
+                    yield {'file': destination, 'status': 'failed', 'algorithm': None, 'digest': None,
+                           'error': format_error(e)}
+                    continue
+
+                yield {'file': destination, 'status': 'downloaded', 'algorithm': digest.name,
+                       'digest': digest.hexdigest(), 'error': None}
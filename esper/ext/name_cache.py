@@ -0,0 +1,193 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from cement.utils import fs
+from urllib3.exceptions import MaxRetryError, ProtocolError, TimeoutError as Urllib3TimeoutError
+
+KINDS = ['device', 'group', 'application']
+
+# Errors on which an expired entry is still better than no answer: the server or the network is failing
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, MaxRetryError, ProtocolError, Urllib3TimeoutError)
+
+
+def is_transient_error(e):
+    """
+    Whether a lookup failed because of the server or the network rather than the request itself
+    """
+    from esperclient.rest import ApiException
+
+    if isinstance(e, ApiException):
+        return e.status is not None and (e.status == 429 or e.status >= 500)
+    return isinstance(e, TRANSIENT_ERRORS)
+
+
+class NameCache:
+    """
+    Persistent cache of device, group and application names to their ids, scoped by environment and
+    enterprise. Unknown names are cached too (negative entries), for a shorter time.
+    The file is loaded on first use and written back once, when the app closes.
+    """
+
+    def __init__(self, file, ttl, negative_ttl):
+        self.file = file
+        self.ttl = float(ttl)
+        self.negative_ttl = float(negative_ttl)
+
+        self._lock = threading.RLock()
+        self._data = None
+        self._dirty = False
+
+    def _load(self):
+        if self._data is None:
+            data = {}
+            if os.path.exists(self.file):
+                try:
+                    with open(self.file, 'r') as f:
+                        data = json.load(f)
+                except ValueError:
+                    # A corrupted cache is simply rebuilt
+                    data = {}
+
+            data.setdefault('scopes', {})
+            data.setdefault('counters', {'hits': 0, 'misses': 0, 'stale': 0})
+            self._data = data
+
+        return self._data
+
+    def _entries(self, scope, kind):
+        return self._load()['scopes'].setdefault(scope, {}).setdefault(kind, {})
+
+    def _count(self, counter):
+        self._load()['counters'][counter] += 1
+        self._dirty = True
+
+    def _is_fresh(self, entry, now):
+        ttl = self.ttl if entry['id'] is not None else self.negative_ttl
+        return now - entry['ts'] < ttl
+
+    def get(self, scope, kind, name):
+        """
+        Return the cached entry for a name, if it is still fresh
+        :return: (found, id) - id is None for a known unknown name
+        """
+        with self._lock:
+            entry = self._entries(scope, kind).get(name)
+            if entry and self._is_fresh(entry, time.time()):
+                self._count('hits')
+                return True, entry['id']
+
+        return False, None
+
+    def put(self, scope, kind, name, id):
+        with self._lock:
+            self._entries(scope, kind)[name] = {'id': id, 'ts': time.time()}
+            self._dirty = True
+
+    def invalidate(self, scope, kind, name):
+        with self._lock:
+            if self._entries(scope, kind).pop(name, None):
+                self._dirty = True
+
+    def resolve(self, scope, kind, name, fetch):
+        """
+        Resolve a name to its id, calling `fetch(name)` on a miss. If `fetch` fails with a transient error,
+        like a 5xx response or a connection error, and an expired entry exists for the name, the stale id is
+        returned instead of the error. Other errors, like a 4xx response, are raised.
+        :param fetch: Callable returning the id for the name, or None if it does not exist
+        :return: id or None
+        """
+        found, id = self.get(scope, kind, name)
+        if found:
+            return id
+
+        with self._lock:
+            entry = self._entries(scope, kind).get(name)
+
+        try:
+            id = fetch(name)
+        except Exception as e:
+            if entry and entry['id'] is not None and is_transient_error(e):
+                with self._lock:
+                    self._count('stale')
+                return entry['id']
+            raise
+
+        with self._lock:
+            self._count('misses')
+        self.put(scope, kind, name, id)
+        return id
+
+    def clear(self, kind=None):
+        with self._lock:
+            data = self._load()
+            if kind:
+                for scope in data['scopes'].values():
+                    scope.pop(kind, None)
+            else:
+                data['scopes'] = {}
+                data['counters'] = {'hits': 0, 'misses': 0, 'stale': 0}
+            self._dirty = True
+
+    def stats(self):
+        """
+        Return entry counts per kind, split by fresh, expired and negative entries, and the hit counters
+        """
+        now = time.time()
+        with self._lock:
+            data = self._load()
+            stats = {kind: {'fresh': 0, 'expired': 0, 'negative': 0} for kind in KINDS}
+            for scope in data['scopes'].values():
+                for kind, entries in scope.items():
+                    for entry in entries.values():
+                        if entry['id'] is None:
+                            state = 'negative'
+                        else:
+                            state = 'fresh' if self._is_fresh(entry, now) else 'expired'
+                        stats.setdefault(kind, {'fresh': 0, 'expired': 0, 'negative': 0})[state] += 1
+
+            return {
+                'scopes': len(data['scopes']),
+                'entries': stats,
+                'counters': dict(data['counters'])
+            }
+
+    def save(self):
+        """
+        Write the cache back to disk, if it changed, replacing the file atomically
+        """
+        with self._lock:
+            if not self._dirty or self._data is None:
+                return
+
+            directory = os.path.dirname(self.file) or '.'
+            fd, tmp_file = tempfile.mkstemp(dir=directory, prefix='.name_cache.')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self._data, f)
+                os.replace(tmp_file, self.file)
+            except OSError:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+
+            self._dirty = False
+
+
+def init_name_cache(app):
+    cache_file = fs.abspath(app.config.get('esper', 'name_cache_file'))
+    fs.ensure_parent_dir_exists(cache_file)
+
+    app.log.debug(f"[init_name_cache] Name cache file: {cache_file}")
+    app.extend('name_cache', NameCache(cache_file,
+                                       app.config.get('esper', 'name_cache_ttl'),
+                                       app.config.get('esper', 'name_cache_negative_ttl')))
+
+
+def save_name_cache(app):
+    try:
+        app.name_cache.save()
+    except OSError as e:
+        app.log.warning(f"[save_name_cache] Failed to save the name cache: {e}")
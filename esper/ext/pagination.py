@@ -0,0 +1,97 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Page size of `--all` when `--limit` is not given, every page being fetched anyway
+ALL_PAGE_SIZE = 500
+
+MAX_CONCURRENCY_ARGUMENT = (
+    ['--max-concurrency'],
+    {'help': f'Maximum number of API requests made in parallel (default: {DEFAULT_MAX_CONCURRENCY})',
+     'action': 'store',
+     'type': int,
+     'default': DEFAULT_MAX_CONCURRENCY,
+     'dest': 'max_concurrency'}
+)
+
+# `--all` and `--max-concurrency`, shared by the list commands
+PAGINATION_ARGUMENTS = [
+    (['--all'],
+     {'help': f'Fetch every page of results, `--limit` sets the page size (default: {ALL_PAGE_SIZE})',
+      'action': 'store_true',
+      'dest': 'all'}),
+    MAX_CONCURRENCY_ARGUMENT,
+]
+
+
+class AllPages:
+    """
+    Response-like view over every page of a paginated list: `count` is the server side total
+    and `results` a generator yielding the items of each page, in order.
+    """
+
+    def __init__(self, count, results):
+        self.count = count
+        self.results = results
+
+
+def _iter_pages(fetch, first, limit, offset, max_concurrency):
+    results = first.results or []
+    for result in results:
+        yield result
+
+    # A short first page with more results left means the server caps the page size
+    if 0 < len(results) < limit and offset + len(results) < (first.count or 0):
+        limit = len(results)
+
+    offsets = iter(range(offset + limit, first.count or 0, limit))
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        try:
+            # Keep at most `max_concurrency` pages in flight, consumed in order
+            for page_offset in offsets:
+                pending.append(executor.submit(fetch, limit, page_offset))
+                if len(pending) >= max_concurrency:
+                    break
+
+            while pending:
+                response = pending.popleft().result()
+
+                page_offset = next(offsets, None)
+                if page_offset is not None:
+                    pending.append(executor.submit(fetch, limit, page_offset))
+
+                for result in response.results or []:
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def page_size(limit, fetch_all, default, all_page_size=ALL_PAGE_SIZE):
+    """
+    Page size of a list command: `--limit` when given, else `default`, or `all_page_size` with `--all`
+    """
+    if limit is not None:
+        return limit
+
+    return all_page_size if fetch_all else default
+
+
+def paginate(fetch, limit, offset=0, fetch_all=False, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    Fetch a paginated list. The first page is always fetched straight away, so that API errors
+    are raised here; with `fetch_all` the remaining pages are fetched concurrently while iterating.
+    :param fetch: Callable taking (limit, offset) and returning a page with `count` and `results`
+    :return: The first page, or an `AllPages` view with `fetch_all`
+    """
+    limit = int(limit)
+    offset = int(offset)
+
+    first = fetch(limit, offset)
+    if not fetch_all or limit <= 0:
+        return first
+
+    return AllPages(first.count, _iter_pages(fetch, first, limit, offset, max(1, int(max_concurrency))))
@@ -1,4 +1,4 @@
-import requests
+from esper.ext.transport import get_session
 
 
 class APIException(Exception):
@@ -124,7 +124,7 @@ def create_pipeline(url, api_key, pipeline_name, pipeline_desc=None, trigger=Non
         if trigger:
             data["trigger"] = trigger
 
-        response = requests.post(
+        response = get_session().post(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -144,7 +144,7 @@ def create_stage(url, api_key, stage_name, stage_order, stage_desc=None):
         if stage_desc:
             data["description"] = stage_desc
 
-        response = requests.post(
+        response = get_session().post(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -187,7 +187,7 @@ def create_operation(url, api_key, operation_name, operation_action, operation_d
                 }
             }
 
-        response = requests.post(
+        response = get_session().post(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -209,7 +209,7 @@ def edit_pipeline(url, api_key, pipeline_name=None, pipeline_desc=None, trigger=
         if pipeline_desc:
             data["description"] = pipeline_desc
 
-        response = requests.patch(
+        response = get_session().patch(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -233,7 +233,7 @@ def edit_stage(url, api_key, stage_name=None, stage_order=None, stage_desc=None)
         if stage_desc:
             data["description"] = stage_desc
 
-        response = requests.patch(
+        response = get_session().patch(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -257,7 +257,7 @@ def edit_operation(url, api_key, operation_name=None, operation_action=None, ope
         if operation_desc:
             data["description"] = operation_desc
 
-        response = requests.patch(
+        response = get_session().patch(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -273,7 +273,7 @@ def edit_operation(url, api_key, operation_name=None, operation_action=None, ope
 
 def list_pipelines(url, api_key):
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -288,7 +288,7 @@ def list_pipelines(url, api_key):
 
 def list_stages(url, api_key):
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -303,7 +303,7 @@ def list_stages(url, api_key):
 
 def fetch_pipelines(url, api_key):
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -318,7 +318,7 @@ def fetch_pipelines(url, api_key):
 
 def fetch_stages(url, api_key):
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -333,7 +333,7 @@ def fetch_stages(url, api_key):
 
 def delete_api(url, api_key):
     try:
-        response = requests.delete(
+        response = get_session().delete(
             url,
             headers={
                 'Authorization': f'Bearer {api_key}'
@@ -361,7 +361,7 @@ def render_single_dict(data):
 
 def execute_pipeline(url, api_key, data=None):
     try:
-        response = requests.post(
+        response = get_session().post(
             url,
             data=data,
             headers={
@@ -376,7 +376,7 @@ def execute_pipeline(url, api_key, data=None):
 
 def list_execute_pipeline(url, api_key, params=None):
     try:
-        response = requests.get(
+        response = get_session().get(
             url,
             params=params,
             headers={
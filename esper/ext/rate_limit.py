@@ -0,0 +1,150 @@
+import threading
+import time
+
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+# Responses telling the client to slow down
+THROTTLE_STATUSES = frozenset([429, 503])
+
+# Pause applied on a throttled response without `Retry-After`, in seconds
+DEFAULT_THROTTLE_DELAY = 1.0
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every request of the process. `rate` tokens are added per second, up to `burst`.
+    The rate adapts to the server: it is halved on each throttled response, with every caller paused until
+    `Retry-After`, then grows back to the configured rate as requests succeed.
+    A rate of 0 disables the limiter.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = float(rate)
+        self.rate = self.max_rate
+        self.burst = max(1.0, float(burst))
+        self.min_rate = min(1.0, self.max_rate)
+
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    @property
+    def enabled(self):
+        return self.max_rate > 0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Block until a request may be sent
+        """
+        if not self.enabled:
+            return
+
+        while True:
+            with self._lock:
+                now = self._clock()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    # allow for float rounding in the refill, else the wait below can be too small to advance the clock
+                    if self._tokens >= 1 - 1e-9:
+                        self._tokens = max(0.0, self._tokens - 1)
+                        return
+                    wait = (1 - self._tokens) / self.rate
+
+            self._sleep(wait)
+
+    def throttled(self, retry_after=None):
+        """
+        Record a 429/503: halve the rate and pause every caller for `retry_after` seconds
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            now = self._clock()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            self._updated = now
+            delay = retry_after if retry_after is not None else DEFAULT_THROTTLE_DELAY
+            self._paused_until = max(self._paused_until, now + delay)
+
+    def succeeded(self):
+        """
+        Record a response that was not throttled, growing the rate back by a tenth of the configured rate
+        """
+        if not self.enabled or self.rate >= self.max_rate:
+            return
+
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+_lock = threading.Lock()
+_rate_limiter = None
+
+
+def get_rate_limiter():
+    """
+    Return the process wide rate limiter, configured from the transport settings
+    :return: RateLimiter
+    """
+    global _rate_limiter
+
+    from esper.ext.transport import TRANSPORT_SETTINGS
+
+    with _lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(TRANSPORT_SETTINGS['rate_limit'], TRANSPORT_SETTINGS['rate_limit_burst'])
+
+    return _rate_limiter
+
+
+def report_response(response):
+    """
+    Report a response to the rate limiter, throttled or not. Responses are reported by the pool, and by the
+    retry policy for the attempts it retries, which the pool never returns; each one is counted once.
+    """
+    if getattr(response, '_rate_limit_reported', False):
+        return
+    response._rate_limit_reported = True
+
+    if response.status in THROTTLE_STATUSES:
+        get_rate_limiter().throttled(Retry.DEFAULT.get_retry_after(response))
+    else:
+        get_rate_limiter().succeeded()
+
+
+class RateLimitedPoolMixin:
+    """
+    Take a token from the rate limiter before each attempt of a request, retries included, and report the
+    response, so that a 429/503 lowers the rate whether or not it is retried
+    """
+
+    def urlopen(self, method, url, *args, **kwargs):
+        get_rate_limiter().acquire()
+        response = super().urlopen(method, url, *args, **kwargs)
+        report_response(response)
+        return response
+
+
+class RateLimitedHTTPConnectionPool(RateLimitedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class RateLimitedHTTPSConnectionPool(RateLimitedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+POOL_CLASSES_BY_SCHEME = {
+    'http': RateLimitedHTTPConnectionPool,
+    'https': RateLimitedHTTPSConnectionPool,
+}
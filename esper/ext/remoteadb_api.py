@@ -3,7 +3,7 @@ from logging import Logger
 from typing import Tuple
 import socket
 
-import requests
+from esper.ext.transport import get_session
 
 
 class RemoteADBError(Exception):
@@ -59,7 +59,7 @@ def get_remoteadb_connection_details(environment: str,
     if log:
         log.debug("[remoteadb-connect] Fetching remoteadb session details...")
 
-    response = requests.get(
+    response = get_session().get(
         url,
         headers={
             'Authorization': f'Bearer {api_key}'
@@ -200,7 +200,7 @@ def initiate_remoteadb_connection(environment: str,
     log.debug("Initiating RemoteADB connection...")
     log.debug(f"Creating RemoteADB session at {url}")
 
-    response = requests.post(
+    response = get_session().post(
         url,
         json={
             'client_certificate': client_cert
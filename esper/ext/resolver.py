@@ -0,0 +1,155 @@
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http import HTTPStatus
+
+from esperclient.rest import ApiException
+from tqdm import tqdm
+
+from esper.ext.api_client import APIClient
+from esper.ext.db_wrapper import DBWrapper
+from esper.ext.pagination import DEFAULT_MAX_CONCURRENCY
+from esper.ext.timings import timed
+
+_UUID = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+
+
+def is_uuid(value):
+    """
+    Whether a device, group or application reference is already an id rather than a name
+    """
+    return bool(_UUID.match(value))
+
+
+class NameResolver:
+    """
+    Resolve device, group and application names to ids through the local name cache.
+    Lookups raise `ApiException` like the underlying clients, and return None for unknown names.
+    """
+
+    def __init__(self, app, db=None):
+        db = db if db else DBWrapper(app.creds)
+        configure = db.get_configure()
+
+        self.cache = app.name_cache
+        self.enterprise_id = configure.get('enterprise_id')
+        self.scope = f"{configure.get('environment')}/{self.enterprise_id}"
+        self.api_client = APIClient(configure)
+
+    def _search_device(self, name):
+        device_client = self.api_client.get_device_api_client()
+        response = device_client.get_all_devices(self.enterprise_id, limit=1, offset=0, name=name)
+        if not response.results or len(response.results) == 0:
+            return None
+        return response.results[0]
+
+    def _search_group(self, name):
+        group_client = self.api_client.get_group_api_client()
+        response = group_client.get_all_groups(self.enterprise_id, limit=1, offset=0, name=name)
+        if not response.results or len(response.results) == 0:
+            return None
+
+        for group in response.results:
+            if group.name == name:
+                return group
+        return response.results[0]
+
+    def _search_application(self, package_name):
+        application_client = self.api_client.get_application_api_client()
+        response = application_client.get_all_applications(self.enterprise_id, limit=1, offset=0,
+                                                           package_name=package_name)
+        for application in response.results or []:
+            if application.package_name == package_name:
+                return application
+        return None
+
+    @timed('resolve')
+    def device_id(self, name):
+        def fetch(device_name):
+            device = self._search_device(device_name)
+            return device.id if device else None
+
+        return self.cache.resolve(self.scope, 'device', name, fetch)
+
+    def device_ids(self, names, max_concurrency=DEFAULT_MAX_CONCURRENCY, progress=True):
+        """
+        Resolve many device names in parallel, with a progress bar. Duplicate names are resolved once
+        and device ids (UUIDs) are passed through as is.
+        :return: (device_ids, not_found) - ids of the existing devices and the unknown names, in the given order
+        """
+        names = list(dict.fromkeys(names))
+        resolved = {name: name for name in names if is_uuid(name)}
+        pending = [name for name in names if name not in resolved]
+
+        with ThreadPoolExecutor(max_workers=max(1, int(max_concurrency))) as executor, \
+                tqdm(total=len(pending), unit='device', desc='Resolving devices', leave=False,
+                     disable=not progress) as pbar:
+            futures = {executor.submit(self.device_id, name): name for name in pending}
+            try:
+                for future in as_completed(futures):
+                    resolved[futures[future]] = future.result()
+                    pbar.update(1)
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        device_ids = [resolved[name] for name in names if resolved[name]]
+        not_found = [name for name in names if not resolved[name]]
+        return device_ids, not_found
+
+    @timed('resolve')
+    def device(self, name):
+        """
+        Return the device object for a name. Only the id is cached, so a cache hit still costs a request:
+        the device is fetched by id, which is cheaper than the search by name. A miss reuses the search result.
+        """
+        searched = {}
+
+        def fetch(device_name):
+            searched['device'] = self._search_device(device_name)
+            return searched['device'].id if searched['device'] else None
+
+        device_id = self.cache.resolve(self.scope, 'device', name, fetch)
+        if device_id is None:
+            return None
+
+        if 'device' in searched:
+            return searched['device']
+
+        device_client = self.api_client.get_device_api_client()
+        try:
+            return device_client.get_device_by_id(self.enterprise_id, device_id)
+        except ApiException as e:
+            if e.status != HTTPStatus.NOT_FOUND:
+                raise
+
+        # The cached device is gone, search it again
+        self.invalidate_device(name)
+        device = self._search_device(name)
+        self.cache.put(self.scope, 'device', name, device.id if device else None)
+        return device
+
+    @timed('resolve')
+    def group_id(self, name):
+        def fetch(group_name):
+            group = self._search_group(group_name)
+            return group.id if group else None
+
+        return self.cache.resolve(self.scope, 'group', name, fetch)
+
+    @timed('resolve')
+    def application_id(self, package_name):
+        def fetch(name):
+            application = self._search_application(name)
+            return application.id if application else None
+
+        return self.cache.resolve(self.scope, 'application', package_name, fetch)
+
+    def invalidate_device(self, name):
+        self.cache.invalidate(self.scope, 'device', name)
+
+    def invalidate_group(self, name):
+        self.cache.invalidate(self.scope, 'group', name)
+
+    def invalidate_application(self, package_name):
+        self.cache.invalidate(self.scope, 'application', package_name)
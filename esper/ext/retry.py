@@ -0,0 +1,76 @@
+import random
+import time
+from itertools import takewhile
+
+import urllib3
+from urllib3.exceptions import MaxRetryError, ResponseError
+
+from esper.ext.rate_limit import report_response
+from esper.ext.timings import TIMINGS
+
+# Transient responses worth another attempt
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+# Methods which can be sent twice without side effects
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'TRACE', 'PUT', 'DELETE'])
+
+
+class RetryPolicy(urllib3.Retry):
+    """
+    Retry policy of the shared transport:
+    - exponential backoff with full jitter, a random wait between 0 and `backoff_factor * 2 ** retries`
+    - no new attempt once `max_elapsed` seconds have passed since the first failure: the last response is
+      returned, a connection or read error raises `MaxRetryError`
+    - idempotent methods are retried on connection, read and 429/502/503/504 errors; other methods, like POST,
+      only when the request never reached the server: connection errors and 429
+    - retried responses are reported to the rate limiter, and each retry to the timings
+    """
+
+    def __init__(self, *args, max_elapsed=None, started=None, **kwargs):
+        kwargs.setdefault('allowed_methods', IDEMPOTENT_METHODS)
+        kwargs.setdefault('status_forcelist', RETRY_STATUSES)
+        super().__init__(*args, **kwargs)
+        self.max_elapsed = max_elapsed
+        self.started = started
+
+    def new(self, **kw):
+        kw.setdefault('max_elapsed', self.max_elapsed)
+        kw.setdefault('started', self.started)
+        return super().new(**kw)
+
+    def _out_of_time(self):
+        return self.max_elapsed is not None and self.started is not None and \
+            time.monotonic() - self.started > self.max_elapsed
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if self._out_of_time():
+            # the last response is returned to the caller as is
+            return False
+        if status_code == 429 and self.total:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def get_backoff_time(self):
+        consecutive_errors = len(list(takewhile(lambda x: x.redirect_location is None, reversed(self.history))))
+        if consecutive_errors == 0:
+            return 0
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** (consecutive_errors - 1)))
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if self.started is None:
+            return self.new(started=time.monotonic()).increment(method, url, response, error, _pool, _stacktrace)
+
+        if response is not None:
+            report_response(response)
+
+        if response is None and self._out_of_time():
+            # only errors raise, a retried response is given up on in `is_retry`
+            reason = error or ResponseError(f'gave up after {self.max_elapsed}s of retries')
+            raise MaxRetryError(_pool, url, reason) from reason
+
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if new_retry.history[-1].redirect_location is None:
+            TIMINGS.record_retry(method, url)
+
+        return new_retry
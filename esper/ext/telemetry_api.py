@@ -1,6 +1,4 @@
-from logging import Logger
-
-import requests
+from esper.ext.transport import get_session
 
 
 class TelemetryAPIError(Exception):
@@ -37,3 +35,17 @@ def get_telemetry_url(environment: str,
 
     return url
 
+
+def get_telemetry_data(url: str, api_key: str):
+    """
+    Fetch telemetry graph data over the shared session
+    :param url: Telemetry url, see `get_telemetry_url`
+    :param api_key:
+    :return: Response
+    """
+    return get_session().get(
+        url,
+        headers={
+            'Authorization': f'Bearer {api_key}'
+        }
+    )
@@ -0,0 +1,307 @@
+import functools
+import json
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Phases in the order they own the time they overlap on: while a request is in flight the time is `api`, even
+# inside a name resolution or a streamed render. What no phase covers, mostly the commands' own work, is `other`.
+PHASES = ['api', 'resolve', 'render', 'startup', 'other']
+
+# Path segments collapsed when grouping requests by endpoint
+_ID_SEGMENT = re.compile(r'/(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)(?=/|$)')
+
+
+def get_endpoint(method, url):
+    """
+    Group a request by method and path, with ids replaced by `{id}`
+    :return: e.g. 'GET /api/v0/enterprise/{id}/device/'
+    """
+    return f"{method.upper()} {_ID_SEGMENT.sub('/{id}', urlparse(url).path)}"
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    try:
+        return len(json.dumps(body, default=str))
+    except TypeError:
+        return 0
+
+
+class Timings:
+    """
+    Collect per endpoint request latency, bytes in and out and retries, artifact cache hits and misses,
+    and the time spent in each phase of a command.
+
+    Phases are exclusive and wall-clock: every moment from the import of the CLI until the summary counts for a
+    single phase, the first of `PHASES` active at that moment, so the phases add up to the total. Concurrent
+    requests count once for the time they overlap. Endpoint latencies are per request, and summed across threads.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.format = 'text'
+        self.started = time.perf_counter()
+
+        self._lock = threading.Lock()
+        self._render_started = None
+        self._intervals = []
+        self.endpoints = {}
+        self.retries = 0
+        self.cache = {'hits': 0, 'misses': 0}
+
+    def add_interval(self, phase, started, ended):
+        """
+        Record that a phase was active between two `time.perf_counter()` values
+        """
+        with self._lock:
+            self._intervals.append((phase, started, ended))
+
+    def phases(self, until):
+        """
+        Account the time between the start and `until` to the phases, each moment to the first active phase
+        :return: dict of phase to seconds
+        """
+        with self._lock:
+            intervals = list(self._intervals)
+
+        events = []
+        for phase, started, ended in intervals:
+            started, ended = max(started, self.started), min(ended, until)
+            if started < ended:
+                events.append((started, 1, phase))
+                events.append((ended, -1, phase))
+        events.sort(key=lambda event: event[0])
+
+        seconds = {phase: 0.0 for phase in PHASES}
+        active = {phase: 0 for phase in PHASES}
+        previous = self.started
+        for moment, change, phase in events:
+            owner = next((name for name in PHASES if active[name]), 'other')
+            seconds[owner] += moment - previous
+            active[phase] += change
+            previous = moment
+
+        seconds['other'] += max(until - previous, 0.0)
+        return seconds
+
+    @contextmanager
+    def phase(self, phase):
+        if not self.enabled:
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_interval(phase, started, time.perf_counter())
+
+    def _endpoint_stats(self, endpoint):
+        return self.endpoints.setdefault(endpoint, {
+            'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'bytes_in': 0, 'bytes_out': 0, 'retries': 0
+        })
+
+    def record_request(self, method, url, seconds, status=None, bytes_in=0, bytes_out=0):
+        """
+        Record a request which ended now, after `seconds`
+        """
+        endpoint = get_endpoint(method, url)
+        ended = time.perf_counter()
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            stats['calls'] += 1
+            stats['errors'] += 1 if status is None or status >= 400 else 0
+            stats['total_ms'] += seconds * 1000
+            stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+            stats['bytes_in'] += bytes_in
+            stats['bytes_out'] += bytes_out
+            self._intervals.append(('api', ended - seconds, ended))
+
+    def record_retry(self, method, url):
+        """
+        Count a retried attempt, reported by the transport's retry policy
+        """
+        if not self.enabled:
+            return
+
+        endpoint = get_endpoint(method, url)
+        with self._lock:
+            self._endpoint_stats(endpoint)['retries'] += 1
+            self.retries += 1
+
+    def record_cache(self, hit):
+        """
+        Count a lookup in the artifact cache
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.cache['hits' if hit else 'misses'] += 1
+
+    def summary(self):
+        now = time.perf_counter()
+        phases = self.phases(now)
+        with self._lock:
+            endpoints = {}
+            for endpoint, stats in sorted(self.endpoints.items()):
+                endpoints[endpoint] = dict(stats)
+                endpoints[endpoint]['avg_ms'] = round(stats['total_ms'] / stats['calls'], 1) if stats['calls'] else 0.0
+                endpoints[endpoint]['total_ms'] = round(stats['total_ms'], 1)
+                endpoints[endpoint]['max_ms'] = round(stats['max_ms'], 1)
+
+            return {
+                'total_ms': round((now - self.started) * 1000, 1),
+                'phases_ms': {phase: round(seconds * 1000, 1) for phase, seconds in phases.items()},
+                'retries': self.retries,
+                'cache': dict(self.cache),
+                'endpoints': endpoints
+            }
+
+
+TIMINGS = Timings()
+
+
+def timed(phase):
+    """
+    Decorator adding the wrapped function's run time to a phase, when timings are enabled
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with TIMINGS.phase(phase):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_api_client(api_client):
+    """
+    Time every request made through an `esperclient.ApiClient`
+    """
+    from esperclient.rest import ApiException
+
+    request = api_client.request
+
+    @functools.wraps(request)
+    def timed_request(method, url, query_params=None, headers=None, post_params=None, body=None, *args, **kwargs):
+        if not TIMINGS.enabled:
+            return request(method, url, query_params, headers, post_params, body, *args, **kwargs)
+
+        bytes_out = _body_size(body) + sum(_body_size(value[1] if isinstance(value, tuple) else value)
+                                           for _, value in post_params or [])
+        started = time.perf_counter()
+        try:
+            response = request(method, url, query_params, headers, post_params, body, *args, **kwargs)
+        except ApiException as e:
+            TIMINGS.record_request(method, url, time.perf_counter() - started, e.status,
+                                   bytes_in=_body_size(e.body), bytes_out=bytes_out)
+            raise
+        except Exception:
+            TIMINGS.record_request(method, url, time.perf_counter() - started, bytes_out=bytes_out)
+            raise
+
+        TIMINGS.record_request(method, url, time.perf_counter() - started, response.status,
+                               bytes_in=_body_size(getattr(response, 'data', None)), bytes_out=bytes_out)
+        return response
+
+    api_client.request = timed_request
+
+
+def record_session_response(response, *args, **kwargs):
+    """
+    `requests` response hook timing the calls made on the shared session
+    """
+    if not TIMINGS.enabled:
+        return
+
+    request = response.request
+    bytes_out = _body_size(request.body) if isinstance(request.body, (bytes, str)) else \
+        int(request.headers.get('Content-Length', 0))
+
+    if kwargs.get('stream'):
+        bytes_in = int(response.headers.get('Content-Length', 0))
+    else:
+        bytes_in = len(response.content)
+
+    TIMINGS.record_request(request.method, request.url, response.elapsed.total_seconds(), response.status_code,
+                           bytes_in=bytes_in, bytes_out=bytes_out)
+
+
+def init_timings(app):
+    """
+    Enable timings from `--timings`/`--timings-json` or the config, once the arguments are parsed.
+    Everything since the import of the CLI is accounted as startup.
+    """
+    pargs = app.pargs
+    timings_json = getattr(pargs, 'timings_json', False)
+    if not (getattr(pargs, 'timings', False) or timings_json or app.config.get('esper', 'timings')):
+        return
+
+    TIMINGS.enabled = True
+    TIMINGS.format = 'json' if timings_json else app.config.get('esper', 'timings_format')
+    TIMINGS.add_interval('startup', TIMINGS.started, time.perf_counter())
+
+
+def start_render(app, data):
+    if TIMINGS.enabled:
+        TIMINGS._render_started = time.perf_counter()
+
+
+def stop_render(app, out_text):
+    if TIMINGS.enabled and TIMINGS._render_started is not None:
+        TIMINGS.add_interval('render', TIMINGS._render_started, time.perf_counter())
+        TIMINGS._render_started = None
+
+
+def report_timings(app):
+    """
+    Print the timings summary to stderr, keeping stdout for the command output
+    """
+    if not TIMINGS.enabled:
+        return
+
+    summary = TIMINGS.summary()
+    app.log.debug(f"[report_timings] {summary}")
+
+    if TIMINGS.format == 'json':
+        sys.stderr.write(json.dumps(summary) + '\n')
+        return
+
+    from tabulate import tabulate
+
+    phases = [{'PHASE': phase, 'MS': ms} for phase, ms in summary['phases_ms'].items()]
+    phases.append({'PHASE': 'total', 'MS': summary['total_ms']})
+
+    endpoints = [
+        {
+            'ENDPOINT': endpoint,
+            'CALLS': stats['calls'],
+            'ERRORS': stats['errors'],
+            'AVG MS': stats['avg_ms'],
+            'MAX MS': stats['max_ms'],
+            'BYTES IN': stats['bytes_in'],
+            'BYTES OUT': stats['bytes_out'],
+            'RETRIES': stats['retries']
+        }
+        for endpoint, stats in summary['endpoints'].items()
+    ]
+
+    sys.stderr.write('\n' + tabulate(phases, headers='keys', tablefmt='plain') + '\n')
+    sys.stderr.write(f"\nRetries: {summary['retries']}\n")
+    if summary['cache']['hits'] or summary['cache']['misses']:
+        sys.stderr.write(f"Cache: {summary['cache']['hits']} hits, {summary['cache']['misses']} misses\n")
+    if endpoints:
+        sys.stderr.write('\n' + tabulate(endpoints, headers='keys', tablefmt='plain') + '\n')
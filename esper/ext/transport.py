@@ -0,0 +1,116 @@
+import os
+import threading
+
+# Transport settings, overridden from the `esper` config section by `init_transport`
+TRANSPORT_SETTINGS = {
+    'connection_pool_maxsize': 10,
+    'keep_alive': True,
+    'max_retries': 3,
+    'retry_backoff_factor': 0.5,
+    'retry_max_elapsed': 30,
+    'rate_limit': 20,
+    'rate_limit_burst': 40,
+    'download_chunk_size': 1024 * 1024,
+}
+
+_lock = threading.RLock()
+_pool_manager = None
+_session = None
+
+
+def init_transport(app):
+    """
+    Load the connection pool settings from the app config. The pool itself is only built
+    on first use, so that commands which never hit the network don't import `requests`.
+    """
+    for key in TRANSPORT_SETTINGS.keys():
+        value = app.config.get('esper', key)
+        if value is not None:
+            TRANSPORT_SETTINGS[key] = value
+
+    app.log.debug(f"[init_transport] Transport settings: {TRANSPORT_SETTINGS}")
+
+
+def get_default_headers():
+    """
+    Headers sent with every request on the shared pool
+    :return: dict
+    """
+    if TRANSPORT_SETTINGS['keep_alive']:
+        return {}
+    return {'Connection': 'close'}
+
+
+def get_ca_bundle():
+    """
+    CA bundle used to verify TLS connections, honouring the same environment variables as `requests`
+    :return: Path to the CA bundle
+    """
+    import certifi
+
+    return os.environ.get('REQUESTS_CA_BUNDLE') or os.environ.get('CURL_CA_BUNDLE') or certifi.where()
+
+
+def get_pool_manager():
+    """
+    Return the process wide urllib3 pool, shared by the Esper API client and the `requests` session.
+    Both use the same TLS settings, so that a connection opened by one is reused by the other,
+    and the same rate limiter.
+    :return: urllib3.PoolManager
+    """
+    global _pool_manager
+
+    with _lock:
+        if _pool_manager is None:
+            import urllib3
+
+            from esper.ext.rate_limit import POOL_CLASSES_BY_SCHEME
+            from esper.ext.retry import RetryPolicy
+
+            _pool_manager = urllib3.PoolManager(
+                maxsize=int(TRANSPORT_SETTINGS['connection_pool_maxsize']),
+                cert_reqs='CERT_REQUIRED',
+                ca_certs=get_ca_bundle(),
+                retries=RetryPolicy(total=int(TRANSPORT_SETTINGS['max_retries']), redirect=5,
+                                    backoff_factor=float(TRANSPORT_SETTINGS['retry_backoff_factor']),
+                                    max_elapsed=float(TRANSPORT_SETTINGS['retry_max_elapsed']),
+                                    raise_on_status=False)
+            )
+            # every attempt, from the API client or the `requests` session, goes through the rate limiter
+            _pool_manager.pool_classes_by_scheme = POOL_CLASSES_BY_SCHEME
+
+    return _pool_manager
+
+
+def get_session():
+    """
+    Return the process wide `requests` session, backed by the shared pool
+    :return: requests.Session
+    """
+    global _session
+
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            from esper.ext.timings import record_session_response
+
+            pool_manager = get_pool_manager()
+
+            class SharedPoolAdapter(HTTPAdapter):
+                def init_poolmanager(self, *args, **kwargs):
+                    self.poolmanager = pool_manager
+
+            adapter = SharedPoolAdapter(max_retries=pool_manager.connection_pool_kw['retries'])
+
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(get_default_headers())
+            session.hooks['response'].append(record_session_response)
+            # same CA bundle as the pool's defaults, so requests resolve to the same connection pools
+            session.verify = get_ca_bundle()
+            _session = session
+
+    return _session
@@ -0,0 +1,294 @@
+import glob
+import json
+import mimetypes
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Queue
+
+from esperclient.rest import ApiException
+from tqdm import tqdm
+
+from esper.ext.pagination import MAX_CONCURRENCY_ARGUMENT
+from esper.ext.transport import get_session
+
+# Bytes read from disk at a time while streaming a file
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Journal of the files uploaded by `upload-batch`, in the current directory unless `--journal` is given
+DEFAULT_JOURNAL_FILE = '.esper-upload-journal.jsonl'
+
+# `--max-concurrency`, `--journal` and `--output`, shared by the `upload-batch` commands
+UPLOAD_BATCH_ARGUMENTS = [
+    MAX_CONCURRENCY_ARGUMENT,
+    (['--journal'],
+     {'help': f'Journal of the uploaded files, to continue a failed batch (default: {DEFAULT_JOURNAL_FILE})',
+      'action': 'store',
+      'default': DEFAULT_JOURNAL_FILE,
+      'dest': 'journal'}),
+    (['--output'],
+     {'help': 'Write the NDJSON manifest of the uploaded files to this file instead of stdout',
+      'action': 'store',
+      'dest': 'output'}),
+]
+
+
+class MultipartFileStream:
+    """
+    File-like `multipart/form-data` body with a single file field, read from disk chunk by chunk as the
+    request is sent, so that the file is never held in memory. `progress` is called with the number of
+    file bytes read, which is the number of bytes handed to the socket.
+    Supports `tell` and `seek`, so the transport can rewind the body to retry the request.
+    """
+
+    def __init__(self, path, field_name, progress=None):
+        self.path = path
+        self.boundary = uuid.uuid4().hex
+        self.progress = progress
+
+        filename = os.path.basename(path)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+        self._head = (f'--{self.boundary}\r\n'
+                      f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+                      f'Content-Type: {mimetype}\r\n\r\n').encode('utf-8')
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self._file = open(path, 'rb')
+        self._file_size = os.fstat(self._file.fileno()).st_size
+        self._position = 0
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return len(self._head) + self._file_size + len(self._tail)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += len(self)
+
+        file_sent = self._file_bytes(self._position)
+        self._position = max(0, min(offset, len(self)))
+        if self.progress:
+            self.progress(self._file_bytes(self._position) - file_sent)
+        return self._position
+
+    def _file_bytes(self, position):
+        return max(0, min(position - len(self._head), self._file_size))
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self) - self._position
+        size = min(size, UPLOAD_CHUNK_SIZE, len(self) - self._position)
+        if size <= 0:
+            return b''
+
+        head_size = len(self._head)
+        if self._position < head_size:
+            data = self._head[self._position:self._position + size]
+        elif self._position < head_size + self._file_size:
+            self._file.seek(self._position - head_size)
+            data = self._file.read(size)
+            if self.progress:
+                self.progress(len(data))
+        else:
+            offset = self._position - head_size - self._file_size
+            data = self._tail[offset:offset + size]
+
+        self._position += len(data)
+        return data
+
+
+class ChunkedBody:
+    """
+    Iterable over a `MultipartFileStream`, sent with `Transfer-Encoding: chunked`. Each iteration starts
+    over from the beginning of the body, so that a retried request sends it whole again.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __iter__(self):
+        self.stream.seek(0)
+        return iter(lambda: self.stream.read(UPLOAD_CHUNK_SIZE), b'')
+
+
+def upload_file(api_client, path, path_params, field_name, file_path, response_type, progress=None,
+                chunked=False):
+    """
+    POST a file as `multipart/form-data`, streamed from disk through the shared session.
+    `esperclient` reads the whole file into memory and encodes the body in one go, so the request is
+    built here with the api client's host, headers and authentication.
+    :param api_client: esperclient.ApiClient
+    :param path: Endpoint path template, e.g. '/enterprise/{enterprise_id}/application/upload/'
+    :param progress: Callable receiving the number of file bytes sent since the last call
+    :param chunked: Send the body with `Transfer-Encoding: chunked` instead of a `Content-Length`
+    :return: The response deserialized as `response_type`
+    :raise ApiException: On an error response, like the generated api methods
+    """
+    url = api_client.configuration.host + path.format(**path_params)
+    headers = dict(api_client.default_headers)
+    headers['Accept'] = 'application/json'
+    api_client.update_params_for_auth(headers, [], ['apiKey'])
+
+    with MultipartFileStream(file_path, field_name, progress) as body:
+        headers['Content-Type'] = body.content_type
+        if chunked:
+            data = ChunkedBody(body)
+        else:
+            data = body
+            headers['Content-Length'] = str(len(body))
+        response = get_session().post(url, data=data, headers=headers)
+
+    if not 200 <= response.status_code <= 299:
+        e = ApiException(status=response.status_code, reason=response.reason)
+        e.body = response.text
+        e.headers = response.headers
+        raise e
+
+    class RESTResponse:
+        data = response.text
+
+    return api_client.deserialize(RESTResponse, response_type)
+
+
+def expand_upload_paths(pattern, extensions=None):
+    """
+    List the files to upload from a directory, without going into sub-directories, or from a glob pattern.
+    Hidden files of a directory are left out.
+    :param extensions: Only keep the files of a directory with one of these extensions, e.g. ['.apk']
+    :return: sorted list of absolute paths
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern) if not name.startswith('.')]
+        if extensions:
+            paths = [path for path in paths if path.lower().endswith(tuple(extensions))]
+    else:
+        paths = glob.glob(pattern, recursive=True)
+
+    return sorted(os.path.abspath(path) for path in paths if os.path.isfile(path))
+
+
+class UploadJournal:
+    """
+    Append-only journal of the files a batch uploaded, one JSON line each, so that running a failed batch again
+    only uploads the rest. A file stays done as long as its size and modification time do not change.
+    """
+
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # the last line of a killed batch may be cut
+                        continue
+                    if entry.get('kind') == kind:
+                        self._entries[entry['file']] = entry
+
+    @staticmethod
+    def _stat(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, path):
+        """
+        :return: The journal entry of a file, if it was uploaded and did not change since
+        """
+        entry = self._entries.get(path)
+        if entry and (entry['size'], entry['mtime_ns']) == self._stat(path):
+            return entry
+        return None
+
+    def record(self, path, row):
+        size, mtime_ns = self._stat(path)
+        entry = dict(row, kind=self.kind, size=size, mtime_ns=mtime_ns)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            self._entries[path] = entry
+
+
+def upload_batch(paths, upload, journal, max_concurrency, format_error=str):
+    """
+    Upload files through a bounded pool of workers, showing the bytes sent overall and for each upload in flight.
+    Files done according to the journal are not uploaded again.
+    :param upload: Callable(path, progress) uploading a file, returning (status, dict of the resulting ids)
+    :param journal: UploadJournal, or None to upload every file
+    :param format_error: Callable turning the exception of a failed upload into a message
+    :return: Generator of one row per file, in completion order: file, status, the ids and error.
+             The status is `uploaded`, `skipped` or `failed` as returned by `upload`, or `resumed` from the journal
+    """
+    pending = []
+    for path in paths:
+        entry = journal.get(path) if journal else None
+        if entry:
+            yield dict({key: value for key, value in entry.items() if key not in ('kind', 'size', 'mtime_ns')},
+                       status='resumed')
+        else:
+            pending.append(path)
+
+    if not pending:
+        return
+
+    workers = max(1, min(max_concurrency, len(pending)))
+    positions = Queue()
+    for position in range(1, workers + 1):
+        positions.put(position)
+
+    lock = threading.Lock()
+    total_size = sum(os.path.getsize(path) for path in pending)
+
+    with tqdm(total=total_size, unit='B', unit_scale=True, unit_divisor=1024,
+              desc=f'Uploading {len(pending)} files') as total_bar:
+        def run(path):
+            position = positions.get()
+            try:
+                with tqdm(total=os.path.getsize(path), unit='B', unit_scale=True, unit_divisor=1024,
+                          desc=os.path.basename(path), position=position, leave=False) as file_bar:
+                    def progress(size):
+                        with lock:
+                            file_bar.update(size)
+                            total_bar.update(size)
+
+                    return upload(path, progress)
+            finally:
+                positions.put(position)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run, path): path for path in pending}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    status, ids = future.result()
+                except Exception as e:
+                    # one failed file does not stop the batch, running it again retries it
+                    yield {'file': path, 'status': 'failed', 'error': format_error(e)}
+                    continue
+
+                row = dict({'file': path, 'status': status}, **ids, error=None)
+                if journal:
+                    journal.record(path, row)
+                yield row
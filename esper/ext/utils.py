@@ -1,10 +1,22 @@
+import csv
 import json
 import sys
+from pathlib import Path
 
 from cement.utils import fs
 from tinydb import TinyDB
 
-from esper.ext.db_wrapper import DBWrapper
+from esper.ext.db_wrapper import AtomicJSONStorage, DBWrapper, WriteThroughCachingMiddleware
+
+DEVICES_FILE_ARGUMENT = (
+    ['--devices-file'],
+    {'help': 'File with device names or ids, one per line or in the first column of a CSV',
+     'action': 'store',
+     'dest': 'devices_file'}
+)
+
+# First cells skipped as a CSV header row
+_DEVICES_FILE_HEADERS = {'name', 'device', 'device_name', 'id', 'device_id'}
 
 
 def extend_tinydb(app):
@@ -21,7 +33,22 @@ def extend_tinydb(app):
 
     # Create and assign the DB file
     app.log.debug(f"[extend_tinydb] Assigning DB object to app -> app.db")
-    app.extend('creds', TinyDB(db_file))
+    app.extend('creds', TinyDB(db_file, storage=WriteThroughCachingMiddleware(AtomicJSONStorage)))
+
+
+def init_certs(app):
+    certs_folder = app.config.get('esper', 'certs_folder')
+    path = fs.abspath(certs_folder)
+
+    # Check if path exists
+    if not Path(path).exists():
+        app.log.debug(f"[init_certs] Creating Certs folder!")
+        fs.ensure_dir_exists(path)
+
+    app.extend('certs_path', path)
+    app.extend('local_key', fs.abspath(app.config.get('esper', 'local_key')))
+    app.extend('local_cert', fs.abspath(app.config.get('esper', 'local_cert')))
+    app.extend('device_cert', fs.abspath(app.config.get('esper', 'device_cert')))
 
 
 def validate_creds_exists(app):
@@ -40,3 +67,21 @@ def parse_error_message(app, exception):
     except ValueError:
         app.log.error(f'[parse_error_message] Decoding JSON has failed, exception body: {exception.body}')
         return exception.reason
+
+
+def read_devices_file(path):
+    """
+    Read device names or ids from a file, one per line or in the first column of a CSV.
+    Blank lines, `#` comments and a header row are skipped.
+    """
+    devices = []
+    with open(fs.abspath(path), newline='') as devices_file:
+        for row in csv.reader(devices_file):
+            device = row[0].strip() if row else ''
+            if not device or device.startswith('#'):
+                continue
+            if not devices and device.lower() in _DEVICES_FILE_HEADERS:
+                continue
+            devices.append(device)
+
+    return devices
@@ -1,30 +1,15 @@
 from cement import App, TestApp, init_defaults
 from cement.core.exc import CaughtSignal
 
-from esper.controllers.application.application import Application
-from esper.controllers.application.version import ApplicationVersion
 from esper.controllers.base import Base
-from esper.controllers.configure import Configure
-from esper.controllers.device.command import DeviceCommand
-from esper.controllers.device.device import Device
-from esper.controllers.device.group_command import GroupCommand
-from esper.controllers.device.install import AppInstall
-from esper.controllers.device.status import DeviceStatus
-from esper.controllers.enterprise.enterprise import Enterprise
-from esper.controllers.enterprise.group import EnterpriseGroup
-from esper.controllers.pipeline.execute import Execution
-from esper.controllers.pipeline.operation import Operation
-from esper.controllers.pipeline.pipeline import Pipeline
-from esper.controllers.pipeline.stage import Stage
-from esper.controllers.secureadb.secureadb import SecureADB
-from esper.controllers.telemetry.telemetry import Telemetry
-from esper.controllers.token.token import Token
-from esper.controllers.content.content import Content
-from esper.controllers.commandsV2.commandsV2 import CommandsV2
+from esper.core.controllers import register_controllers
 from esper.core.exc import EsperError
-from esper.core.output_handler import EsperOutputHandler
-from esper.ext.certs import init_certs
-from esper.ext.utils import extend_tinydb
+from esper.core.output_handler import EsperOutputHandler, imply_streaming_format
+from esper.ext.artifact_cache import init_artifact_cache, save_artifact_cache
+from esper.ext.name_cache import init_name_cache, save_name_cache
+from esper.ext.timings import init_timings, report_timings, start_render, stop_render
+from esper.ext.transport import init_transport
+from esper.ext.utils import extend_tinydb, init_certs
 
 # configuration defaults
 CONFIG = init_defaults('esper')
@@ -34,6 +19,23 @@ CONFIG['esper']['certs_folder'] = '~/.esper/certs'
 CONFIG['esper']['local_key'] = '~/.esper/certs/local.key'
 CONFIG['esper']['local_cert'] = '~/.esper/certs/local.pem'
 CONFIG['esper']['device_cert'] = '~/.esper/certs/device.pem'
+CONFIG['esper']['lazy_controllers'] = True
+CONFIG['esper']['connection_pool_maxsize'] = 10
+CONFIG['esper']['keep_alive'] = True
+CONFIG['esper']['max_retries'] = 3
+CONFIG['esper']['retry_backoff_factor'] = 0.5
+CONFIG['esper']['retry_max_elapsed'] = 30
+CONFIG['esper']['rate_limit'] = 20
+CONFIG['esper']['rate_limit_burst'] = 40
+CONFIG['esper']['download_chunk_size'] = 1048576
+CONFIG['esper']['name_cache_file'] = '~/.esper/db/name_cache.json'
+CONFIG['esper']['name_cache_ttl'] = 3600
+CONFIG['esper']['name_cache_negative_ttl'] = 60
+CONFIG['esper']['artifact_cache_dir'] = '~/.esper/cache/artifacts'
+CONFIG['esper']['artifact_cache_max_size'] = 2147483648
+CONFIG['esper']['content_sync_cache_file'] = '~/.esper/db/content_sync.json'
+CONFIG['esper']['timings'] = False
+CONFIG['esper']['timings_format'] = 'text'
 
 # meta defaults
 META = init_defaults('log.colorlog')
@@ -94,35 +96,27 @@ class Esper(App):
         # output_handler = 'tabulate'
         output_handler = 'esper_output_handler'
 
-        # register handlers
+        # register handlers, sub-command controllers are registered by `register_controllers`
         handlers = [
             EsperOutputHandler,
-            Base,
-            Configure,
-            Device,
-            Application,
-            DeviceCommand,
-            ApplicationVersion,
-            AppInstall,
-            DeviceStatus,
-            Enterprise,
-            EnterpriseGroup,
-            GroupCommand,
-            SecureADB,
-            Token,
-            Telemetry,
-            Pipeline,
-            Stage,
-            Operation,
-            Execution,
-            Content,
-            CommandsV2
+            Base
         ]
 
         # hooks
         hooks = [
             ('post_setup', extend_tinydb),
             ('post_setup', init_certs),
+            ('post_setup', init_transport),
+            ('post_setup', init_name_cache),
+            ('post_setup', init_artifact_cache),
+            ('post_setup', register_controllers),
+            ('post_argument_parsing', init_timings),
+            ('post_argument_parsing', imply_streaming_format),
+            ('pre_render', start_render),
+            ('post_render', stop_render),
+            ('pre_close', save_name_cache),
+            ('pre_close', save_artifact_cache),
+            ('pre_close', report_timings),
         ]
 
 
@@ -134,6 +128,23 @@ TEST_CONFIG['esper']['certs_folder'] = '~/.esper/certs'
 TEST_CONFIG['esper']['local_key'] = '~/.esper/certs/local.key'
 TEST_CONFIG['esper']['local_cert'] = '~/.esper/certs/local.pem'
 TEST_CONFIG['esper']['device_cert'] = '~/.esper/certs/device.pem'
+TEST_CONFIG['esper']['lazy_controllers'] = True
+TEST_CONFIG['esper']['connection_pool_maxsize'] = 10
+TEST_CONFIG['esper']['keep_alive'] = True
+TEST_CONFIG['esper']['max_retries'] = 3
+TEST_CONFIG['esper']['retry_backoff_factor'] = 0.5
+TEST_CONFIG['esper']['retry_max_elapsed'] = 30
+TEST_CONFIG['esper']['rate_limit'] = 20
+TEST_CONFIG['esper']['rate_limit_burst'] = 40
+TEST_CONFIG['esper']['download_chunk_size'] = 1048576
+TEST_CONFIG['esper']['name_cache_file'] = 'name_cache.json'
+TEST_CONFIG['esper']['name_cache_ttl'] = 3600
+TEST_CONFIG['esper']['name_cache_negative_ttl'] = 60
+TEST_CONFIG['esper']['artifact_cache_dir'] = 'artifact_cache'
+TEST_CONFIG['esper']['artifact_cache_max_size'] = 2147483648
+TEST_CONFIG['esper']['content_sync_cache_file'] = 'content_sync.json'
+TEST_CONFIG['esper']['timings'] = False
+TEST_CONFIG['esper']['timings_format'] = 'text'
 
 
 class EsperTest(TestApp, Esper):
@@ -0,0 +1,72 @@
+import hashlib
+from types import SimpleNamespace
+from unittest import TestCase
+
+import esperclient
+from _pytest.monkeypatch import MonkeyPatch
+
+from esper.controllers.application import application
+from esper.controllers.application.application import Application
+from tests.utils import run_with_test_configure, teardown
+
+APK_FILE = 'tests/application/Tiny Notepad Simple Small_v1.0_apkpure.com.apk'
+
+
+def _file_hash(algorithm):
+    with open(APK_FILE, 'rb') as f:
+        return hashlib.new(algorithm, f.read()).hexdigest()
+
+
+class UploadDedupTest(TestCase):
+    """
+    `app upload` of the sample APK, whose version code is already uploaded
+    """
+
+    def setUp(self) -> None:
+        self.monkeypatch = MonkeyPatch()
+        self.uploaded = []
+
+        def upload_file(api_client, path, params, field, file, response_type, progress=None):
+            self.uploaded.append(file)
+            version = SimpleNamespace(id='new-version', version_code='1', build_number=None)
+            return SimpleNamespace(application=SimpleNamespace(id='app-id', versions=[version],
+                                                               to_dict=lambda: {'id': 'app-id'}))
+
+        self.monkeypatch.setattr(application, 'upload_file', upload_file)
+        self.monkeypatch.setattr(esperclient.ApplicationApi, 'get_application',
+                                 lambda api, application_id, enterprise_id:
+                                 SimpleNamespace(to_dict=lambda: {'id': 'app-id'}))
+
+    def tearDown(self) -> None:
+        self.monkeypatch.undo()
+        teardown()
+
+    def _upload(self, hash_string):
+        version = SimpleNamespace(id='version-id', version_code='1', build_number=None, hash_string=hash_string)
+        self.monkeypatch.setattr(Application, '_find_uploaded_version',
+                                 lambda controller, resolver, apk_info: ('app-id', version))
+
+        return run_with_test_configure(['app', 'upload', APK_FILE, '-j'])
+
+    def test_upload_skips_same_file(self):
+        for algorithm in ('md5', 'sha1', 'sha256'):
+            exit_code, rendered = self._upload(_file_hash(algorithm).upper())
+
+            assert exit_code == 0
+            assert rendered['version_id'] == 'version-id'
+            assert self.uploaded == []
+
+    def test_upload_rejects_different_file(self):
+        exit_code, rendered = self._upload('0' * 64)
+
+        assert exit_code == 1
+        assert 'different file' in rendered
+        assert self.uploaded == []
+
+    def test_upload_skips_version_without_comparable_hash(self):
+        for hash_string in (None, '', 'not-a-digest'):
+            exit_code, rendered = self._upload(hash_string)
+
+            assert exit_code == 0
+            assert rendered['version_id'] == 'version-id'
+            assert self.uploaded == []
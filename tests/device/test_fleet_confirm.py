@@ -0,0 +1,60 @@
+import sys
+from types import SimpleNamespace
+from unittest import TestCase
+
+import esperclient
+from _pytest.monkeypatch import MonkeyPatch
+
+from esper.controllers.device.command import DeviceCommand
+from tests.utils import run_with_test_configure, teardown
+
+WIPE_ARGV = ['device-command', 'wipe', '--tag', 'kiosk', '-j']
+
+
+class FleetConfirmTest(TestCase):
+    """
+    `device-command wipe --tag ...` on two matching devices
+    """
+
+    def setUp(self) -> None:
+        self.monkeypatch = MonkeyPatch()
+        self.fired = []
+
+        def run_command(api, enterprise_id, device_id, command_request):
+            self.fired.append(device_id)
+            return SimpleNamespace(id=f'command-{device_id}', state='Command Initiated')
+
+        self.monkeypatch.setattr(DeviceCommand, '_get_fleet_devices',
+                                 lambda controller, db, action: ({'id-1': 'device-1', 'id-2': 'device-2'}, []))
+        self.monkeypatch.setattr(esperclient.CommandsApi, 'run_command', run_command)
+
+    def tearDown(self) -> None:
+        self.monkeypatch.undo()
+        teardown()
+
+    def _answer(self, tty, answer=None):
+        self.monkeypatch.setattr(sys.stdin, 'isatty', lambda: tty)
+        self.monkeypatch.setattr('builtins.input', lambda message: answer)
+
+    def test_wipe_fleet_requires_yes_without_terminal(self):
+        self._answer(tty=False)
+        exit_code, _ = run_with_test_configure(WIPE_ARGV)
+
+        assert exit_code == 1
+        assert self.fired == []
+
+    def test_wipe_fleet_asks_for_confirmation(self):
+        self._answer(tty=True, answer='n')
+        run_with_test_configure(WIPE_ARGV)
+        assert self.fired == []
+
+        self._answer(tty=True, answer='y')
+        run_with_test_configure(WIPE_ARGV)
+        assert sorted(self.fired) == ['id-1', 'id-2']
+
+    def test_wipe_fleet_with_yes(self):
+        self._answer(tty=False)
+        exit_code, _ = run_with_test_configure(WIPE_ARGV + ['--yes'])
+
+        assert exit_code == 0
+        assert sorted(self.fired) == ['id-1', 'id-2']
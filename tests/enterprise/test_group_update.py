@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+import esperclient
+from _pytest.monkeypatch import MonkeyPatch
+
+from esper.controllers.enterprise import group
+from esper.controllers.enterprise.group import EnterpriseGroup
+from esper.ext.resolver import NameResolver
+from tests.utils import run_with_test_configure, teardown
+
+GROUP = SimpleNamespace(id='group-id', name='group', parent=None, device_count=0, path='group', children_count=0)
+
+
+class GroupUpdateTest(TestCase):
+    """
+    `group add` in chunks of 2 devices, every name but `missing-*` being an existing device
+    """
+
+    def setUp(self) -> None:
+        self.monkeypatch = MonkeyPatch()
+        self.sent = []
+
+        def partial_update_group(api, group_id, enterprise_id, data, action):
+            self.sent.append(data.device_ids)
+            return GROUP
+
+        self.monkeypatch.setattr(group, 'GROUP_DEVICES_CHUNK_SIZE', 2)
+        self.monkeypatch.setattr(NameResolver, '_search_device',
+                                 lambda resolver, name: None if name.startswith('missing')
+                                 else SimpleNamespace(id=f'id-{name}'))
+        self.monkeypatch.setattr(EnterpriseGroup, '_get_group_device_ids', lambda controller, *args: set())
+        self.monkeypatch.setattr(esperclient.DeviceGroupApi, 'get_group_by_id',
+                                 lambda api, group_id, enterprise_id: GROUP)
+        self.monkeypatch.setattr(esperclient.DeviceGroupApi, 'partial_update_group', partial_update_group)
+
+    def tearDown(self) -> None:
+        self.monkeypatch.undo()
+        teardown()
+
+    def test_add_devices_in_chunks(self):
+        argv = ['group', 'add', '-id', 'group-id', '-g', 'group', '-d',
+                'device-1', 'device-2', 'device-3', 'device-4', 'device-5']
+        run_with_test_configure(argv)
+
+        assert self.sent == [['id-device-1', 'id-device-2'], ['id-device-3', 'id-device-4'], ['id-device-5']]
+
+    def test_add_unknown_devices_changes_nothing(self):
+        argv = ['group', 'add', '-id', 'group-id', '-g', 'group', '-d',
+                'device-1', 'device-2', 'device-3', 'missing-1', 'device-5', 'missing-2']
+        _, rendered = run_with_test_configure(argv)
+
+        assert self.sent == []
+        assert 'missing-1, missing-2' in rendered
@@ -0,0 +1,18 @@
+from esper.ext.api_client import APIClient
+from esper.ext.transport import get_pool_manager, get_session
+
+
+def test_api_client_shared_per_credential():
+    credential = {'environment': 'test', 'api_key': 'key'}
+    device_client = APIClient(credential).get_device_api_client()
+    group_client = APIClient(credential).get_group_api_client()
+
+    assert device_client.api_client is group_client.api_client
+    assert device_client.api_client is not APIClient({'environment': 'test', 'api_key': 'other'}).api_client
+
+
+def test_api_client_and_session_share_pool():
+    api_client = APIClient({'environment': 'test', 'api_key': 'key'}).api_client
+
+    assert api_client.rest_client.pool_manager is get_pool_manager()
+    assert get_session().get_adapter('https://test-api.esper.cloud').poolmanager is get_pool_manager()
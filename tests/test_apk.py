@@ -0,0 +1,91 @@
+import hashlib
+import struct
+import zipfile
+
+import pytest
+
+from esper.ext.apk import NO_ENTRY, UTF8_FLAG, ApkError, parse_manifest, read_apk_info
+
+
+def _string_pool(strings, utf8):
+    offsets, blob = [], b''
+    for string in strings:
+        offsets.append(len(blob))
+        if utf8:
+            encoded = string.encode('utf-8')
+            blob += bytes([len(string), len(encoded)]) + encoded + b'\0'
+        else:
+            blob += struct.pack('<H', len(string)) + string.encode('utf-16-le') + b'\0\0'
+    blob += b'\0' * (-len(blob) % 4)
+
+    strings_start = 28 + 4 * len(strings)
+    return struct.pack('<HHI5I', 0x0001, 28, strings_start + len(blob), len(strings), 0,
+                       UTF8_FLAG if utf8 else 0, strings_start, 0) + \
+        struct.pack(f'<{len(strings)}I', *offsets) + blob
+
+
+def _manifest(package, version_code, version_name, utf8=False, strip_names=False):
+    """
+    Compile a `<manifest package=... android:versionCode=... android:versionName=...>` like aapt does
+    """
+    names = ['', ''] if strip_names else ['versionCode', 'versionName']
+    strings = names + ['package', 'manifest', version_name, package]
+    resource_map = struct.pack('<HHI2I', 0x0180, 8, 16, 0x0101021b, 0x0101021c)
+
+    attributes = [
+        struct.pack('<3IHBBI', NO_ENTRY, 0, NO_ENTRY, 8, 0, 0x10, version_code),
+        struct.pack('<3IHBBI', NO_ENTRY, 1, 4, 8, 0, 0x03, 4),
+        struct.pack('<3IHBBI', NO_ENTRY, 2, 5, 8, 0, 0x03, 5),
+    ]
+    element_size = 16 + 20 + 20 * len(attributes)
+    element = struct.pack('<HHI2I', 0x0102, 16, element_size, 1, NO_ENTRY) + \
+        struct.pack('<2I6H', NO_ENTRY, 3, 20, 20, len(attributes), 0, 0, 0) + b''.join(attributes)
+
+    body = _string_pool(strings, utf8) + resource_map + element
+    return struct.pack('<HHI', 0x0003, 8, 8 + len(body)) + body
+
+
+@pytest.mark.parametrize('utf8', [False, True])
+def test_parse_manifest(utf8):
+    manifest = parse_manifest(_manifest('io.esper.sample', 42, '1.4.2', utf8=utf8))
+
+    assert manifest['package'] == 'io.esper.sample'
+    assert manifest['versionCode'] == 42
+    assert manifest['versionName'] == '1.4.2'
+
+
+def test_parse_manifest_with_stripped_attribute_names():
+    manifest = parse_manifest(_manifest('io.esper.sample', 42, '1.4.2', strip_names=True))
+
+    assert manifest['versionCode'] == 42
+    assert manifest['versionName'] == '1.4.2'
+
+
+def test_read_apk_info(tmp_path):
+    path = tmp_path / 'app.apk'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as apk:
+        apk.writestr('AndroidManifest.xml', _manifest('io.esper.sample', 7, '1.0'))
+        apk.writestr('classes.dex', b'dex' * 1000)
+
+    info = read_apk_info(str(path))
+
+    assert info.package_name == 'io.esper.sample'
+    assert info.version_code == '7'
+    assert info.version_name == '1.0'
+    assert info.sha256 == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_read_apk_info_rejects_other_files(tmp_path):
+    path = tmp_path / 'app.apk'
+    path.write_bytes(b'not a zip')
+
+    with pytest.raises(ApkError):
+        read_apk_info(str(path))
+
+
+def test_read_apk_info_of_sample_apk():
+    info = read_apk_info('tests/application/Tiny Notepad Simple Small_v1.0_apkpure.com.apk')
+
+    assert info.package_name == 'com.robot15.tiny.notepad'
+    assert info.version_code == '1'
+    assert info.version_name == '1.0'
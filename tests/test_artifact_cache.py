@@ -0,0 +1,112 @@
+import hashlib
+import os
+
+import pytest
+
+from esper.ext import artifact_cache, timings
+from esper.ext.artifact_cache import ArtifactCache, clone_file
+from esper.ext.timings import Timings
+
+
+@pytest.fixture
+def enabled_timings(monkeypatch):
+    recorder = Timings()
+    recorder.enabled = True
+    monkeypatch.setattr(artifact_cache, 'TIMINGS', recorder)
+    monkeypatch.setattr(timings, 'TIMINGS', recorder)
+    return recorder
+
+
+def _artifact(tmp_path, name, size):
+    path = tmp_path / name
+    content = os.urandom(size)
+    path.write_bytes(content)
+    return str(path), hashlib.sha256(content)
+
+
+def test_cache_hit_after_put(tmp_path, enabled_timings):
+    cache = ArtifactCache(str(tmp_path / 'cache'), max_size=1024 * 1024)
+    path, digest = _artifact(tmp_path, 'app.apk', 1000)
+
+    assert cache.get('v1', 'abc') == (None, None)
+    cache.put('v1', 'abc', path, digest.name, digest.hexdigest())
+    cached_file, name = cache.get('v1', 'abc')
+
+    assert name == f'sha256-{digest.hexdigest()}'
+    assert open(cached_file, 'rb').read() == open(path, 'rb').read()
+    assert cache.get('v1', 'other') == (None, None)
+    assert enabled_timings.summary()['cache'] == {'hits': 1, 'misses': 2}
+
+    cache.save()
+    reloaded = ArtifactCache(str(tmp_path / 'cache'), max_size=1024 * 1024)
+    assert reloaded.get('v1', 'abc')[1] == name
+
+
+def test_cache_is_not_changed_by_editing_the_file_in_place(tmp_path):
+    cache = ArtifactCache(str(tmp_path / 'cache'), max_size=1024 * 1024)
+    path, digest = _artifact(tmp_path, 'app.apk', 1000)
+    original = open(path, 'rb').read()
+
+    cache.put('v1', None, path, digest.name, digest.hexdigest())
+    with open(path, 'r+b') as f:
+        f.write(b'patched')
+
+    cached_file, _ = cache.get('v1', None)
+    assert open(cached_file, 'rb').read() == original
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ArtifactCache(str(tmp_path / 'cache'), max_size=2500)
+    for version in ('v1', 'v2'):
+        path, digest = _artifact(tmp_path, f'{version}.apk', 1000)
+        cache.put(version, None, path, digest.name, digest.hexdigest())
+
+    # v1 is used again, v2 becomes the least recently used
+    assert cache.get('v1', None)[0]
+    path, digest = _artifact(tmp_path, 'v3.apk', 1000)
+    cache.put('v3', None, path, digest.name, digest.hexdigest())
+
+    assert cache.get('v2', None) == (None, None)
+    assert cache.get('v1', None)[0] and cache.get('v3', None)[0]
+    assert cache.size() == 2000
+    assert len(os.listdir(cache.objects_dir)) == 2
+
+
+def test_cache_prune_removes_unknown_files(tmp_path):
+    cache = ArtifactCache(str(tmp_path / 'cache'), max_size=1024 * 1024)
+    path, digest = _artifact(tmp_path, 'app.apk', 1000)
+    cache.put('v1', None, path, digest.name, digest.hexdigest())
+    with open(os.path.join(cache.objects_dir, 'stray'), 'wb') as f:
+        f.write(b'x' * 10)
+
+    assert cache.prune() == (1, 10)
+    assert cache.prune(0) == (1, 1000)
+    assert os.listdir(cache.objects_dir) == []
+
+
+def test_clone_file_falls_back_to_copy(tmp_path, monkeypatch):
+    source, _ = _artifact(tmp_path, 'app.apk', 1000)
+    destination = str(tmp_path / 'copy.apk')
+
+    def unsupported(*args):
+        raise OSError(18, 'Invalid cross-device link')
+
+    monkeypatch.setattr(artifact_cache, '_reflink', unsupported)
+
+    assert clone_file(source, destination) == 'copy'
+    assert open(destination, 'rb').read() == open(source, 'rb').read()
+    assert sorted(os.listdir(tmp_path)) == ['app.apk', 'copy.apk']
+
+
+def test_cache_get_checks_the_published_checksum(tmp_path):
+    cache = ArtifactCache(str(tmp_path / 'cache'), max_size=1024 * 1024)
+    path, digest = _artifact(tmp_path, 'app.apk', 1000)
+    other_checksum = hashlib.sha256(b'another file').hexdigest()
+
+    cache.put('v1', digest.hexdigest().upper(), path, digest.name, digest.hexdigest())
+    assert cache.get('v1', digest.hexdigest().upper())[1] == f'sha256-{digest.hexdigest()}'
+
+    # an index entry pointing to a file with another digest, like an index edited by hand
+    cache.put('v2', other_checksum, path, digest.name, digest.hexdigest())
+    assert cache.get('v2', other_checksum) == (None, None)
+    assert cache.get('v1', digest.hexdigest().upper())[0]
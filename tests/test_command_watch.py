@@ -0,0 +1,90 @@
+from esper.ext.command_watch import CommandStatusWatcher, WATCH_FAILED, WATCH_NO_STATUSES, WATCH_SUCCEEDED, \
+    WATCH_TIMED_OUT
+from tests.utils import run_with_test_configure, teardown
+
+
+class Status:
+    def __init__(self, device_id, state):
+        self.device = f'https://test-api.esper.cloud/api/enterprise/1/device/{device_id}/'
+        self.state = state
+        self.reason = None
+
+
+def status_id(status):
+    return f"{status.device.split('/')[-2]}:{status.state}"
+
+
+def _fetcher(polls):
+    calls = {'count': 0}
+
+    def fetch():
+        statuses = polls[min(calls['count'], len(polls) - 1)]
+        calls['count'] += 1
+        return [Status(device_id, state) for device_id, state in statuses]
+
+    return fetch
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_watch_reports_only_changes_until_done():
+    fetch = _fetcher([
+        [('a', 'Command Queued'), ('b', 'Command Queued')],
+        [('a', 'Command Queued'), ('b', 'Command Queued')],
+        [('a', 'Command Queued'), ('b', 'Command Queued')],
+        [('a', 'Command Success'), ('b', 'Command Queued')],
+        [('a', 'Command Success'), ('b', 'Command Success')],
+    ])
+    clock = FakeClock()
+    watcher = CommandStatusWatcher(fetch, 1, 10, clock=clock, sleep=clock.sleep)
+
+    changes = [[status_id(status) for status in changed] for changed in watcher.watch()]
+
+    assert changes == [['a:Command Queued', 'b:Command Queued'], [], [], ['a:Command Success'], ['b:Command Success']]
+    # idle polls back off, a change brings the interval back down
+    assert clock.slept == [1, 2, 4, 1]
+    assert watcher.exit_code() == WATCH_SUCCEEDED
+
+
+def test_watch_exit_codes():
+    clock = FakeClock()
+    failed = CommandStatusWatcher(_fetcher([[('a', 'Command Success'), ('b', 'Command Failure')]]),
+                                  clock=clock, sleep=clock.sleep)
+    list(failed.watch())
+    assert failed.exit_code() == WATCH_FAILED
+
+    pending = CommandStatusWatcher(_fetcher([[('a', 'Command In Progress')]]), 1, 10, timeout=30,
+                                   clock=clock, sleep=clock.sleep)
+    list(pending.watch())
+    assert pending.exit_code() == WATCH_TIMED_OUT
+
+
+def test_watch_stops_without_statuses():
+    clock = FakeClock()
+    watcher = CommandStatusWatcher(_fetcher([[]]), 1, 10, clock=clock, sleep=clock.sleep)
+
+    assert list(watcher.watch()) == [[]]
+    assert clock.slept == []
+    assert watcher.exit_code() == WATCH_NO_STATUSES
+
+
+def test_watch_rejects_state_filter():
+    try:
+        exit_code, rendered = run_with_test_configure(['commandsV2', 'status', '-r', 'request-id', '--watch',
+                                                       '--state', 'queued'])
+    finally:
+        teardown()
+
+    assert exit_code == 1
+    assert '--state' in rendered
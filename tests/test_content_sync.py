@@ -0,0 +1,93 @@
+import hashlib
+import os
+from types import SimpleNamespace
+
+from esper.ext.content_sync import LocalHashCache, plan_sync
+
+
+def _content(content_id, name, data=None, size=None, hash=None, is_dir=False, path='/'):
+    if data is not None:
+        size, hash = len(data), hashlib.sha256(data).hexdigest()
+    return SimpleNamespace(id=content_id, name=name, size=str(size) if size is not None else None, hash=hash,
+                           is_dir=is_dir, path=path)
+
+
+def _local_files(tmp_path, files):
+    local_files = {}
+    for name, data in files.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        local_files[name] = str(path)
+    return local_files
+
+
+def test_plan_sync(tmp_path):
+    local_files = _local_files(tmp_path, {'same.mp4': b'same', 'changed.mp4': b'new data', 'new.mp4': b'new'})
+    contents = [
+        _content(1, 'same.mp4', b'same'),
+        _content(2, 'same.mp4', b'same'),
+        _content(3, 'changed.mp4', b'old data'),
+        _content(4, 'orphan.mp4', b'orphan'),
+        _content(5, 'folder', is_dir=True),
+    ]
+    cache = LocalHashCache(str(tmp_path / 'cache.json'))
+
+    actions, unchanged = plan_sync(local_files, contents, cache)
+
+    assert unchanged == 1
+    assert [(a.action, a.name, a.reason, a.content_id) for a in actions] == [
+        ('upload', 'changed.mp4', 'changed', None),
+        ('delete', 'changed.mp4', 'replaced', 3),
+        ('upload', 'new.mp4', 'new', None),
+        ('delete', 'same.mp4', 'duplicate', 2),
+        ('delete', 'orphan.mp4', 'orphan', 4),
+    ]
+
+
+def test_plan_sync_ignores_contents_in_folders(tmp_path):
+    local_files = _local_files(tmp_path, {'video.mp4': b'video'})
+    contents = [
+        _content(1, 'folder', is_dir=True),
+        _content(2, 'video.mp4', b'other video', path='/folder'),
+        _content(3, 'nested.mp4', b'nested', path='/folder/nested.mp4'),
+        _content(4, 'root.mp4', b'root', path='/root.mp4'),
+        _content(5, 'video.mp4', b'video', path=None),
+    ]
+
+    actions, unchanged = plan_sync(local_files, contents, LocalHashCache(str(tmp_path / 'cache.json')))
+
+    assert unchanged == 1
+    assert [(a.action, a.name, a.reason, a.content_id) for a in actions] == [('delete', 'root.mp4', 'orphan', 4)]
+
+
+def test_plan_sync_without_remote_hash_compares_size(tmp_path):
+    local_files = _local_files(tmp_path, {'a.png': b'1234', 'b.png': b'12345'})
+    contents = [_content(1, 'a.png', size=4), _content(2, 'b.png', size=4)]
+
+    actions, unchanged = plan_sync(local_files, contents, LocalHashCache(str(tmp_path / 'cache.json')))
+
+    assert unchanged == 1
+    assert [(a.action, a.name) for a in actions] == [('upload', 'b.png'), ('delete', 'b.png')]
+
+
+def test_hash_cache_reuses_digest_until_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'first')
+    cache_file = str(tmp_path / 'cache.json')
+
+    cache = LocalHashCache(cache_file)
+    assert cache.digest(str(path), 'sha256') == hashlib.sha256(b'first').hexdigest()
+    cache.save()
+
+    # a fresh cache answers from disk without reading the file
+    hashed = []
+    real_new = hashlib.new
+    monkeypatch.setattr(hashlib, 'new', lambda name: hashed.append(name) or real_new(name))
+    reloaded = LocalHashCache(cache_file)
+    assert reloaded.digest(str(path), 'sha256') == hashlib.sha256(b'first').hexdigest()
+    assert hashed == []
+
+    path.write_bytes(b'second file')
+    os.utime(path, ns=(0, 0))
+    assert reloaded.digest(str(path), 'sha256') == hashlib.sha256(b'second file').hexdigest()
+    assert hashed == ['sha256']
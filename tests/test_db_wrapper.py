@@ -0,0 +1,37 @@
+from tinydb import TinyDB
+
+from esper.ext.db_wrapper import AtomicJSONStorage, DBWrapper, WriteThroughCachingMiddleware
+
+
+def _open_db(path):
+    return TinyDB(str(path), storage=WriteThroughCachingMiddleware(AtomicJSONStorage))
+
+
+def test_db_wrapper_writes_once_per_update(tmp_path, monkeypatch):
+    db = _open_db(tmp_path / 'creds.json')
+    writes = []
+    monkeypatch.setattr(AtomicJSONStorage, 'write', lambda self, data: writes.append(data))
+
+    wrapper = DBWrapper(db)
+    wrapper.set_device({'id': 'device-1', 'name': 'device'})
+    wrapper.set_device({'id': 'device-2', 'name': 'device'})
+    wrapper.unset_group()
+
+    assert len(writes) == 2
+    assert DBWrapper(db).get_device() == {'id': 'device-2', 'name': 'device'}
+
+
+def test_db_wrapper_reads_file_once(tmp_path, monkeypatch):
+    path = tmp_path / 'creds.json'
+    DBWrapper(_open_db(path)).set_configure({'environment': 'test', 'enterprise_id': 'enterprise-1'})
+
+    reads = []
+    read = AtomicJSONStorage.read
+    monkeypatch.setattr(AtomicJSONStorage, 'read', lambda self: reads.append(1) or read(self))
+    db = _open_db(path)
+
+    for _ in range(3):
+        assert DBWrapper(db).get_enterprise_id() == 'enterprise-1'
+        assert DBWrapper(db).get_configure().get('environment') == 'test'
+
+    assert len(reads) == 1
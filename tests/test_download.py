@@ -0,0 +1,210 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+
+import esperclient
+import pytest
+
+from esper.ext import download
+from esper.ext.download import DownloadError, download_batch, download_file
+from esper.main import TEST_CONFIG
+from tests.utils import run_with_test_configure, teardown
+
+CONTENT = os.urandom(300 * 1024)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        RangeHandler.requests.append(range_header)
+
+        # `/ignore-range/` answers like a server without range support
+        if range_header and not self.path.startswith('/ignore-range/'):
+            first, last = range_header.split('=')[1].split('-')
+            first, last = int(first), int(last or len(CONTENT) - 1)
+            if first >= len(CONTENT):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(CONTENT)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            body = CONTENT[first:last + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{len(CONTENT)}')
+        else:
+            body = CONTENT
+            self.send_response(200)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        # `/broken/` drops the connection halfway through the ranges in the second half of the file
+        if self.path.startswith('/broken/') and range_header and first >= len(CONTENT) // 2:
+            body = body[:len(body) // 2]
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    RangeHandler.requests = []
+    httpd = HTTPServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+def test_download_writes_file_and_checksum(server_url, tmp_path):
+    destination = str(tmp_path / 'app.apk')
+    sent = []
+    digest = download_file(f'{server_url}/app.apk', destination, progress=sent.append, chunk_size=64 * 1024)
+
+    assert open(destination, 'rb').read() == CONTENT
+    assert not os.path.exists(destination + '.part')
+    assert digest.hexdigest() == hashlib.sha256(CONTENT).hexdigest()
+    assert sum(sent) == len(CONTENT)
+    assert RangeHandler.requests == [None]
+
+
+def test_download_resumes_partial_file(server_url, tmp_path):
+    destination = str(tmp_path / 'app.apk')
+    with open(destination + '.part', 'wb') as f:
+        f.write(CONTENT[:100000])
+
+    sent = []
+    digest = download_file(f'{server_url}/app.apk', destination, checksum=hashlib.sha1(CONTENT).hexdigest(),
+                           progress=sent.append)
+
+    assert open(destination, 'rb').read() == CONTENT
+    assert digest.name == 'sha1'
+    assert sent[0] == 100000
+    assert sum(sent) == len(CONTENT)
+    assert RangeHandler.requests == ['bytes=100000-']
+
+
+def test_download_restarts_when_range_is_ignored(server_url, tmp_path):
+    destination = str(tmp_path / 'app.apk')
+    with open(destination + '.part', 'wb') as f:
+        f.write(CONTENT[:100000])
+
+    download_file(f'{server_url}/ignore-range/app.apk', destination)
+
+    assert open(destination, 'rb').read() == CONTENT
+
+
+def test_download_completes_already_downloaded_partial_file(server_url, tmp_path):
+    destination = str(tmp_path / 'app.apk')
+    with open(destination + '.part', 'wb') as f:
+        f.write(CONTENT)
+
+    digest = download_file(f'{server_url}/app.apk', destination)
+
+    assert open(destination, 'rb').read() == CONTENT
+    assert digest.hexdigest() == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_download_checksum_mismatch_keeps_destination(server_url, tmp_path):
+    destination = str(tmp_path / 'app.apk')
+    with open(destination, 'wb') as f:
+        f.write(b'previous')
+
+    with pytest.raises(DownloadError):
+        download_file(f'{server_url}/app.apk', destination, checksum='0' * 64)
+
+    assert open(destination, 'rb').read() == b'previous'
+    assert not os.path.exists(destination + '.part')
+
+
+@pytest.fixture
+def small_ranges(monkeypatch):
+    monkeypatch.setattr(download, 'MIN_RANGE_SIZE', 1024)
+
+
+def test_download_parallel_ranges(server_url, tmp_path, small_ranges):
+    destination = str(tmp_path / 'app.apk')
+    sent = []
+    digest = download_file(f'{server_url}/app.apk', destination, progress=sent.append, chunk_size=8192,
+                           connections=4)
+
+    assert open(destination, 'rb').read() == CONTENT
+    assert digest.hexdigest() == hashlib.sha256(CONTENT).hexdigest()
+    assert sum(sent) == len(CONTENT)
+    assert RangeHandler.requests[0] == 'bytes=0-0'
+    assert len(RangeHandler.requests) == 5
+
+
+def test_download_parallel_falls_back_to_single_stream(server_url, tmp_path, small_ranges):
+    destination = str(tmp_path / 'app.apk')
+    download_file(f'{server_url}/ignore-range/app.apk', destination, connections=4)
+
+    assert open(destination, 'rb').read() == CONTENT
+    assert len(RangeHandler.requests) == 2
+
+
+def test_download_parallel_failure_keeps_resumable_prefix(server_url, tmp_path, small_ranges):
+    destination = str(tmp_path / 'app.apk')
+    with pytest.raises(Exception):
+        download_file(f'{server_url}/broken/app.apk', destination, connections=4)
+
+    partial_size = os.path.getsize(destination + '.part')
+    assert len(CONTENT) // 2 <= partial_size < len(CONTENT)
+    assert open(destination + '.part', 'rb').read() == CONTENT[:partial_size]
+    assert not os.path.exists(destination + '.part.ranges')
+
+    download_file(f'{server_url}/app.apk', destination, connections=4)
+    assert open(destination, 'rb').read() == CONTENT
+
+
+def test_download_discards_partial_file_of_killed_parallel_download(server_url, tmp_path):
+    destination = str(tmp_path / 'app.apk')
+    with open(destination + '.part', 'wb') as f:
+        f.write(bytes(len(CONTENT)))
+    open(destination + '.part.ranges', 'w').close()
+
+    download_file(f'{server_url}/app.apk', destination)
+
+    assert open(destination, 'rb').read() == CONTENT
+    assert not os.path.exists(destination + '.part.ranges')
+
+
+def test_download_batch_reports_each_file(server_url, tmp_path):
+    checksum = hashlib.sha256(CONTENT).hexdigest()
+    downloads = [
+        (f'{server_url}/a.mp4', str(tmp_path / 'a.mp4'), checksum, len(CONTENT)),
+        (f'{server_url}/b.mp4', str(tmp_path / 'b.mp4'), None, None),
+        (f'{server_url}/c.mp4', str(tmp_path / 'c.mp4'), '0' * 64, len(CONTENT)),
+    ]
+
+    rows = {os.path.basename(row['file']): row for row in download_batch(downloads, max_concurrency=2)}
+
+    assert rows['a.mp4']['status'] == rows['b.mp4']['status'] == 'downloaded'
+    assert rows['a.mp4']['digest'] == rows['b.mp4']['digest'] == checksum
+    assert open(tmp_path / 'b.mp4', 'rb').read() == CONTENT
+    assert rows['c.mp4']['status'] == 'failed' and rows['c.mp4']['error']
+    assert not os.path.exists(tmp_path / 'c.mp4')
+
+
+def test_content_download_copies_cached_contents(server_url, tmp_path, monkeypatch):
+    content = SimpleNamespace(id=7, name='video.mp4', is_dir=False, size=str(len(CONTENT)),
+                              hash=hashlib.sha256(CONTENT).hexdigest(), download_url=f'{server_url}/video.mp4')
+    monkeypatch.setitem(TEST_CONFIG['esper'], 'artifact_cache_dir', str(tmp_path / 'cache'))
+    monkeypatch.setattr(esperclient.ContentApi, 'get_content', lambda api, content_id, enterprise_id: content)
+    argv = ['content', 'download', '7', '-d', str(tmp_path / 'contents'), '-j']
+
+    try:
+        _, first = run_with_test_configure(argv)
+        os.remove(tmp_path / 'contents' / 'video.mp4')
+        _, second = run_with_test_configure(argv)
+    finally:
+        teardown()
+
+    assert [row['status'] for row in first + second] == ['downloaded', 'cached']
+    assert second[0]['checksum'] == f'sha256:{content.hash}'
+    assert open(tmp_path / 'contents' / 'video.mp4', 'rb').read() == CONTENT
+    assert RangeHandler.requests == [None]
@@ -1,3 +1,7 @@
+import subprocess
+import sys
+
+from esper.controllers.device.device import Device
 from esper.main import EsperTest
 
 
@@ -14,3 +18,27 @@ def test_esper_debug():
     with EsperTest(argv=argv) as app:
         app.run()
         assert app.debug is True
+
+
+def test_esper_help_does_not_import_controllers():
+    # plain `--help` should only register controllers by label, without their heavy dependencies
+    script = (
+        "import sys\n"
+        "from esper.main import EsperTest\n"
+        "try:\n"
+        "    with EsperTest(argv=['--help']) as app:\n"
+        "        app.run()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('loaded:', [m for m in ('esperclient', 'OpenSSL') if m in sys.modules])\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, check=True)
+    assert result.stdout.decode().strip().splitlines()[-1] == 'loaded: []'
+
+
+def test_esper_lazy_controller_dispatch():
+    # the requested sub-command gets its real controller registered
+    argv = ['device']
+    with EsperTest(argv=argv) as app:
+        app.run()
+        assert app.handler.get('controller', 'device') is Device
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+from esperclient.rest import ApiException
+from urllib3.exceptions import MaxRetryError
+
+from esper.ext.name_cache import NameCache
+
+
+def test_name_cache_resolve_caches_hits_and_unknown_names(tmp_path):
+    cache = NameCache(str(tmp_path / 'name_cache.json'), ttl=3600, negative_ttl=60)
+    fetched = []
+
+    def fetch(name):
+        fetched.append(name)
+        return 'id-1' if name == 'known' else None
+
+    assert cache.resolve('env/ent', 'device', 'known', fetch) == 'id-1'
+    assert cache.resolve('env/ent', 'device', 'known', fetch) == 'id-1'
+    assert cache.resolve('env/ent', 'device', 'unknown', fetch) is None
+    assert cache.resolve('env/ent', 'device', 'unknown', fetch) is None
+    assert fetched == ['known', 'unknown']
+
+    cache.save()
+    reloaded = NameCache(cache.file, ttl=3600, negative_ttl=60)
+    assert reloaded.get('env/ent', 'device', 'known') == (True, 'id-1')
+    assert reloaded.get('other/ent', 'device', 'known') == (False, None)
+
+
+def test_name_cache_returns_stale_id_on_fetch_error(tmp_path):
+    cache = NameCache(str(tmp_path / 'name_cache.json'), ttl=3600, negative_ttl=60)
+    cache.put('env/ent', 'group', 'group-1', 'id-1')
+    cache._entries('env/ent', 'group')['group-1']['ts'] = time.time() - 7200
+
+    def fetch(name):
+        raise ConnectionError('offline')
+
+    assert cache.resolve('env/ent', 'group', 'group-1', fetch) == 'id-1'
+    assert cache.stats()['counters']['stale'] == 1
+
+
+def test_name_cache_returns_stale_id_only_on_transient_errors(tmp_path):
+    cache = NameCache(str(tmp_path / 'name_cache.json'), ttl=3600, negative_ttl=60)
+    cache.put('env/ent', 'group', 'group-1', 'id-1')
+    cache._entries('env/ent', 'group')['group-1']['ts'] = time.time() - 7200
+
+    for error in (ApiException(status=503), MaxRetryError(None, '/group/')):
+        def fetch(name):
+            raise error
+
+        assert cache.resolve('env/ent', 'group', 'group-1', fetch) == 'id-1'
+
+    for error in (ApiException(status=401), ApiException(status=404), ValueError('bad response')):
+        def fetch(name):
+            raise error
+
+        with pytest.raises(type(error)):
+            cache.resolve('env/ent', 'group', 'group-1', fetch)
@@ -0,0 +1,76 @@
+import csv
+import json
+from types import SimpleNamespace
+
+import esperclient
+from esperclient.rest import ApiException
+
+from esper.main import EsperTest
+from tests.utils import run_with_test_configure, teardown
+
+
+def _rows():
+    for i in range(3):
+        yield {'id': f'id-{i}', 'tags': ['a', 'b']}
+
+
+def test_render_ndjson_streams_rows(tmp_path):
+    output = tmp_path / 'devices.ndjson'
+    with EsperTest() as app:
+        app.render(_rows(), format='ndjson', output=str(output))
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert rows == list(_rows())
+
+
+def test_render_csv_streams_rows(tmp_path):
+    output = tmp_path / 'devices.csv'
+    with EsperTest() as app:
+        app.render(_rows(), format='csv', output=str(output))
+
+    with open(output, newline='') as f:
+        rows = list(csv.DictReader(f))
+
+    assert [row['id'] for row in rows] == ['id-0', 'id-1', 'id-2']
+    assert json.loads(rows[0]['tags']) == ['a', 'b']
+
+
+def _content(content_id):
+    return SimpleNamespace(id=content_id, download_url=None, name=f'content-{content_id}', key=None, is_dir=False,
+                           kind=None, hash=None, size=None, path='/', permissions=None, tags=[], description=None,
+                           created=None, modified=None, enterprise=None, owner=None)
+
+
+def test_output_without_format_streams_ndjson_and_reports_errors_on_stderr(tmp_path, monkeypatch, capsys):
+    output = tmp_path / 'contents.ndjson'
+
+    def get_all_content(api, enterprise_id, limit=None, offset=0):
+        if offset:
+            raise ApiException(status=500, reason='Server Error')
+        return SimpleNamespace(count=limit + 1, next='next', previous=None, results=[_content(1)])
+
+    monkeypatch.setattr(esperclient.ContentApi, 'get_all_content', get_all_content)
+    try:
+        exit_code, _ = run_with_test_configure(['content', 'list', '--all', '--output', str(output)])
+    finally:
+        teardown()
+
+    assert exit_code == 1
+    assert [json.loads(line)['id'] for line in output.read_text().splitlines()] == [1]
+    assert 'ERROR: Server Error' in capsys.readouterr().err
+
+
+def test_streamed_list_reports_first_page_error_on_stderr(monkeypatch, capsys):
+    def get_all_content(api, enterprise_id, limit=None, offset=0):
+        raise ApiException(status=500, reason='Server Error')
+
+    monkeypatch.setattr(esperclient.ContentApi, 'get_all_content', get_all_content)
+    try:
+        exit_code, _ = run_with_test_configure(['content', 'list', '--format', 'ndjson'])
+    finally:
+        teardown()
+
+    captured = capsys.readouterr()
+    assert exit_code == 1
+    assert 'ERROR' not in captured.out
+    assert 'ERROR: Server Error' in captured.err
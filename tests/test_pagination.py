@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+from esperclient.rest import ApiException
+
+from esper.ext.pagination import ALL_PAGE_SIZE, page_size, paginate
+
+
+class Page:
+    def __init__(self, count, results):
+        self.count = count
+        self.results = results
+
+
+def _fetcher(count, fail_offset=None):
+    lock = threading.Lock()
+    state = {'in_flight': 0, 'max_in_flight': 0}
+
+    def fetch(limit, offset):
+        with lock:
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        try:
+            # later pages complete first, results must still come out in order
+            time.sleep(0.01 * ((count - offset) % 3))
+            if offset == fail_offset:
+                raise ApiException(status=500, reason='Internal Server Error')
+            return Page(count, list(range(offset, min(offset + limit, count))))
+        finally:
+            with lock:
+                state['in_flight'] -= 1
+
+    return fetch, state
+
+
+def test_paginate_single_page_without_all():
+    fetch, _ = _fetcher(95)
+    response = paginate(fetch, 10, 20)
+
+    assert response.count == 95
+    assert response.results == list(range(20, 30))
+
+
+def test_paginate_all_yields_every_page_in_order():
+    fetch, state = _fetcher(95)
+    response = paginate(fetch, '10', '0', fetch_all=True, max_concurrency=3)
+
+    assert response.count == 95
+    assert list(response.results) == list(range(95))
+    assert state['max_in_flight'] <= 3
+
+
+def test_paginate_all_raises_page_errors_while_iterating():
+    fetch, _ = _fetcher(95, fail_offset=50)
+    response = paginate(fetch, 10, 0, fetch_all=True, max_concurrency=2)
+
+    with pytest.raises(ApiException):
+        list(response.results)
+
+
+def test_paginate_all_follows_server_page_size_cap():
+    fetch, _ = _fetcher(95)
+
+    def capped_fetch(limit, offset):
+        return fetch(min(limit, 10), offset)
+
+    response = paginate(capped_fetch, 50, 0, fetch_all=True)
+
+    assert list(response.results) == list(range(95))
+
+
+def test_page_size_is_large_for_all_without_limit():
+    assert page_size(None, False, 20) == 20
+    assert page_size(None, True, 20) == ALL_PAGE_SIZE
+    assert page_size('50', True, 20) == '50'
+    assert page_size(None, True, 10, all_page_size=200) == 200
@@ -0,0 +1,116 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from esper.ext import rate_limit
+from esper.ext.rate_limit import RateLimiter
+from esper.ext.transport import get_session
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter_allows_burst_then_paces_requests():
+    clock = FakeClock()
+    limiter = RateLimiter(10, 5, clock=clock, sleep=clock.sleep)
+
+    for _ in range(15):
+        limiter.acquire()
+
+    # 5 requests from the burst, then 10 more at 10 per second
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_rate_limiter_backs_off_on_throttle_and_recovers():
+    clock = FakeClock()
+    limiter = RateLimiter(10, 5, clock=clock, sleep=clock.sleep)
+
+    limiter.throttled(retry_after=2)
+    assert limiter.rate == 5
+
+    limiter.acquire()
+    assert clock.now >= 2
+
+    for _ in range(10):
+        limiter.succeeded()
+    assert limiter.rate == 10
+
+
+def test_rate_limiter_disabled():
+    clock = FakeClock()
+    limiter = RateLimiter(0, 5, clock=clock, sleep=clock.sleep)
+
+    for _ in range(100):
+        limiter.acquire()
+    limiter.throttled(retry_after=10)
+    limiter.acquire()
+
+    assert clock.slept == []
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """
+    Answer 429 to the first request, then 200; `/unavailable` always answers 503
+    """
+    requests = 0
+
+    def do_POST(self):
+        ThrottlingHandler.requests += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/unavailable':
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+        elif ThrottlingHandler.requests == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def throttling_server():
+    ThrottlingHandler.requests = 0
+    httpd = HTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+def test_throttled_request_is_retried(monkeypatch, throttling_server):
+    limiter = RateLimiter(100, 10)
+    monkeypatch.setattr(rate_limit, '_rate_limiter', limiter)
+
+    response = get_session().post(f'{throttling_server}/', json={})
+
+    assert response.status_code == 200
+    assert ThrottlingHandler.requests == 2
+    # halved once by the 429, grown back a tenth by the 200
+    assert limiter.rate == 60
+
+
+def test_throttled_response_not_retried_lowers_rate(monkeypatch, throttling_server):
+    limiter = RateLimiter(100, 10)
+    monkeypatch.setattr(rate_limit, '_rate_limiter', limiter)
+
+    # a POST is not retried on 503
+    response = get_session().post(f'{throttling_server}/unavailable', json={})
+
+    assert response.status_code == 503
+    assert ThrottlingHandler.requests == 1
+    assert limiter.rate == 50
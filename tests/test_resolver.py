@@ -0,0 +1,54 @@
+import threading
+
+from esper.ext.db_wrapper import DBWrapper
+from esper.ext.resolver import NameResolver
+from esper.main import EsperTest
+from tests.utils import teardown
+
+
+class FakeDevice:
+    def __init__(self, id):
+        self.id = id
+
+
+def test_device_ids_resolves_unique_names_and_reports_all_missing(monkeypatch):
+    searched = []
+    lock = threading.Lock()
+
+    def search_device(self, name):
+        with lock:
+            searched.append(name)
+        return FakeDevice(f'id-{name}') if name.startswith('device') else None
+
+    monkeypatch.setattr(NameResolver, '_search_device', search_device)
+
+    try:
+        with EsperTest() as app:
+            DBWrapper(app.creds).set_configure({'environment': 'test', 'api_key': 'key', 'enterprise_id': 'enterprise'})
+            app.name_cache.clear()
+
+            device_ids, not_found = NameResolver(app).device_ids(
+                ['device-1', 'missing-1', 'device-2', 'device-1', 'missing-2'], max_concurrency=3)
+    finally:
+        teardown()
+
+    assert device_ids == ['id-device-1', 'id-device-2']
+    assert not_found == ['missing-1', 'missing-2']
+    assert sorted(searched) == ['device-1', 'device-2', 'missing-1', 'missing-2']
+
+
+def test_device_ids_passes_ids_through(monkeypatch):
+    device_id = '0e7ab9e8-4e06-4b2c-b2a6-23f6d4e4f5b0'
+    monkeypatch.setattr(NameResolver, '_search_device', lambda self, name: FakeDevice(f'id-{name}'))
+
+    try:
+        with EsperTest() as app:
+            DBWrapper(app.creds).set_configure({'environment': 'test', 'api_key': 'key', 'enterprise_id': 'enterprise'})
+            app.name_cache.clear()
+
+            device_ids, not_found = NameResolver(app).device_ids([device_id, 'device-1'], progress=False)
+    finally:
+        teardown()
+
+    assert device_ids == [device_id, 'id-device-1']
+    assert not_found == []
@@ -0,0 +1,97 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import urllib3
+
+from esper.ext import timings
+from esper.ext.retry import RetryPolicy
+from esper.ext.timings import Timings
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """
+    Answer 502 to the first `failures` requests, then 200
+    """
+    failures = 0
+    requests = 0
+
+    def _respond(self):
+        FlakyHandler.requests += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(502 if FlakyHandler.requests <= FlakyHandler.failures else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_POST = do_PUT = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FlakyHandler.requests = 0
+    httpd = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}/'
+    httpd.shutdown()
+
+
+@pytest.fixture
+def enabled_timings(monkeypatch):
+    recorder = Timings()
+    recorder.enabled = True
+    monkeypatch.setattr(timings, 'TIMINGS', recorder)
+    monkeypatch.setattr('esper.ext.retry.TIMINGS', recorder)
+    return recorder
+
+
+def request(url, method, retries):
+    return urllib3.PoolManager().request(method, url, retries=retries)
+
+
+@pytest.mark.parametrize('method', ['GET', 'PUT'])
+def test_idempotent_requests_are_retried(server, enabled_timings, method):
+    FlakyHandler.failures = 2
+    response = request(server, method, RetryPolicy(total=3, backoff_factor=0.01, raise_on_status=False))
+
+    assert response.status == 200
+    assert FlakyHandler.requests == 3
+    assert enabled_timings.summary()['retries'] == 2
+
+
+def test_post_is_not_retried_on_server_error(server, enabled_timings):
+    FlakyHandler.failures = 1
+    response = request(server, 'POST', RetryPolicy(total=3, backoff_factor=0.01, raise_on_status=False))
+
+    assert response.status == 502
+    assert FlakyHandler.requests == 1
+    assert enabled_timings.summary()['retries'] == 0
+
+
+def test_retries_stop_after_max_elapsed(server, enabled_timings):
+    FlakyHandler.failures = 10
+    response = request(server, 'GET', RetryPolicy(total=10, backoff_factor=0.05, max_elapsed=0.1,
+                                                  raise_on_status=False))
+
+    assert response.status == 502
+    assert 1 < FlakyHandler.requests < 11
+
+
+def test_backoff_has_full_jitter():
+    retry = RetryPolicy(total=10, backoff_factor=1)
+    for _ in range(3):
+        retry = retry.increment('GET', '/', error=urllib3.exceptions.ProtocolError())
+
+    backoffs = [retry.get_backoff_time() for _ in range(50)]
+    assert all(0 <= backoff <= 4 for backoff in backoffs)
+    assert len(set(backoffs)) > 1
+
+
+def test_retries_out_of_time_return_last_response_even_when_raising_on_status(server, enabled_timings):
+    FlakyHandler.failures = 10
+    response = request(server, 'GET', RetryPolicy(total=10, backoff_factor=0.05, max_elapsed=0.1))
+
+    assert response.status == 502
+    assert 1 < FlakyHandler.requests < 11
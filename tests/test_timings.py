@@ -0,0 +1,90 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import esperclient
+import pytest
+from esperclient.configuration import Configuration
+
+from esper.ext import timings
+from esper.ext.timings import Timings, get_endpoint, instrument_api_client, record_session_response
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({'count': 0, 'next': None, 'previous': None, 'results': []}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+@pytest.fixture
+def enabled_timings(monkeypatch):
+    recorder = Timings()
+    recorder.enabled = True
+    monkeypatch.setattr(timings, 'TIMINGS', recorder)
+    return recorder
+
+
+def test_get_endpoint_collapses_ids():
+    url = 'https://test-api.esper.cloud/api/v0/enterprise/0e7ab9e8-4e06-4b2c-b2a6-23f6d4e4f5b0/device/12/?limit=1'
+    assert get_endpoint('get', url) == 'GET /api/v0/enterprise/{id}/device/{id}/'
+
+
+def test_api_client_requests_are_timed(server, enabled_timings):
+    config = Configuration()
+    config.host = server
+    api_client = esperclient.ApiClient(config)
+    instrument_api_client(api_client)
+
+    esperclient.DeviceApi(api_client).get_all_devices('0e7ab9e8-4e06-4b2c-b2a6-23f6d4e4f5b0', limit=1)
+
+    stats = enabled_timings.summary()['endpoints']['GET /enterprise/{id}/device/']
+    assert stats['calls'] == 1
+    assert stats['errors'] == 0
+    assert stats['bytes_in'] > 0
+
+
+def test_session_requests_are_timed(server, enabled_timings):
+    import requests
+
+    session = requests.Session()
+    session.hooks['response'].append(record_session_response)
+    session.get(f'{server}/api/graph/device/')
+
+    summary = enabled_timings.summary()
+    assert summary['endpoints']['GET /api/graph/device/']['calls'] == 1
+    assert summary['phases_ms']['api'] >= 0
+
+
+def test_phases_are_exclusive_and_add_up_to_the_total(monkeypatch):
+    recorder = Timings()
+    recorder.enabled = True
+    recorder.started = 0.0
+    recorder.add_interval('startup', 0.0, 1.0)
+    recorder.add_interval('resolve', 2.0, 5.0)
+    # concurrent requests, one inside the resolution and one streamed during the render
+    recorder.add_interval('api', 3.0, 4.0)
+    recorder.add_interval('api', 3.5, 6.5)
+    recorder.add_interval('render', 6.0, 8.0)
+    monkeypatch.setattr(timings.time, 'perf_counter', lambda: 10.0)
+
+    summary = recorder.summary()
+
+    assert summary['phases_ms'] == {'api': 3500.0, 'resolve': 1000.0, 'render': 1500.0, 'startup': 1000.0,
+                                    'other': 3000.0}
+    assert sum(summary['phases_ms'].values()) == summary['total_ms'] == 10000.0
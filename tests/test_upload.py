@@ -0,0 +1,204 @@
+import json
+import os
+import resource
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import esperclient
+import pytest
+from esperclient.configuration import Configuration
+from esperclient.rest import ApiException
+
+from esper.ext.upload import MultipartFileStream, UploadJournal, expand_upload_paths, upload_batch, upload_file
+
+
+class UploadHandler(BaseHTTPRequestHandler):
+    received = {}
+
+    def _read_chunks(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return
+                yield self.rfile.read(size)
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers['Content-Length'])
+            while remaining:
+                data = self.rfile.read(min(remaining, 1024 * 1024))
+                remaining -= len(data)
+                yield data
+
+    def do_POST(self):
+        # bodies posted to `/discard/` are only counted, so that large uploads do not fill the test process
+        keep = not self.path.endswith('/discard/')
+        body, size = [], 0
+        for data in self._read_chunks():
+            size += len(data)
+            if keep:
+                body.append(data)
+        UploadHandler.received = {'headers': dict(self.headers), 'body': b''.join(body), 'size': size}
+
+        status = 400 if self.path.endswith('/fail/') else 201
+        payload = json.dumps({'message': 'Bad file'} if status == 400 else {'id': 'app-1'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api_client():
+    httpd = HTTPServer(('127.0.0.1', 0), UploadHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    config = Configuration()
+    config.host = f'http://127.0.0.1:{httpd.server_port}/api'
+    config.api_key['Authorization'] = 'key'
+    config.api_key_prefix['Authorization'] = 'Bearer'
+    yield esperclient.ApiClient(config)
+    httpd.shutdown()
+
+
+@pytest.fixture
+def apk(tmp_path):
+    path = tmp_path / 'app.apk'
+    path.write_bytes(os.urandom(300 * 1024))
+    return path
+
+
+def test_upload_streams_multipart_file(api_client, apk):
+    sent = []
+    response = upload_file(api_client, '/enterprise/{enterprise_id}/application/upload/', {'enterprise_id': 'e1'},
+                           'app_file', str(apk), 'object', progress=sent.append)
+
+    assert response == {'id': 'app-1'}
+    assert sum(sent) == apk.stat().st_size
+    assert len(sent) > 1
+
+    headers = UploadHandler.received['headers']
+    body = UploadHandler.received['body']
+    boundary = headers['Content-Type'].split('boundary=')[1]
+    assert headers['Authorization'] == 'Bearer key'
+    assert body.startswith(f'--{boundary}\r\n'.encode())
+    assert b'name="app_file"; filename="app.apk"' in body
+    assert apk.read_bytes() in body
+    assert body.endswith(f'\r\n--{boundary}--\r\n'.encode())
+
+
+def test_upload_error_raises_api_exception(api_client, apk):
+    with pytest.raises(ApiException) as e:
+        upload_file(api_client, '/enterprise/{enterprise_id}/fail/', {'enterprise_id': 'e1'},
+                    'app_file', str(apk), 'object')
+
+    assert e.value.status == 400
+    assert json.loads(e.value.body)['message'] == 'Bad file'
+
+
+def test_stream_rewinds_for_retries(apk):
+    sent = []
+    with MultipartFileStream(str(apk), 'app_file', progress=sent.append) as stream:
+        first = b''.join(iter(lambda: stream.read(8192), b''))
+        stream.seek(0)
+        second = b''.join(iter(lambda: stream.read(8192), b''))
+
+    assert first == second
+    assert len(first) == len(stream)
+    assert sum(sent) == apk.stat().st_size
+
+
+def test_upload_chunked_transfer(api_client, apk):
+    sent = []
+    upload_file(api_client, '/v0/enterprise/{enterprise_id}/content/upload/', {'enterprise_id': 'e1'},
+                'key', str(apk), 'object', progress=sent.append, chunked=True)
+
+    headers = UploadHandler.received['headers']
+    assert headers['Transfer-Encoding'] == 'chunked'
+    assert 'Content-Length' not in headers
+    assert apk.read_bytes() in UploadHandler.received['body']
+    assert sum(sent) == apk.stat().st_size
+
+
+def test_expand_upload_paths(tmp_path):
+    for name in ('b.apk', 'a.APK', 'notes.txt', '.esper-upload-journal.jsonl'):
+        (tmp_path / name).write_bytes(b'x')
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'c.apk').write_bytes(b'x')
+
+    assert expand_upload_paths(str(tmp_path), extensions=['.apk']) == [str(tmp_path / 'a.APK'),
+                                                                       str(tmp_path / 'b.apk')]
+    assert len(expand_upload_paths(str(tmp_path))) == 3
+    assert expand_upload_paths(str(tmp_path / '**' / '*.apk')) == [str(tmp_path / 'b.apk'),
+                                                                   str(tmp_path / 'sub' / 'c.apk')]
+
+
+def test_upload_batch_resumes_from_journal(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f'file{i}.bin'
+        path.write_bytes(os.urandom(1000))
+        paths.append(str(path))
+
+    uploaded, failing = [], {paths[3]}
+
+    def upload(path, progress):
+        progress(os.path.getsize(path))
+        uploaded.append(path)
+        if path in failing:
+            failing.remove(path)
+            raise ValueError('connection reset')
+        return 'uploaded', {'content_id': os.path.basename(path)}
+
+    journal_file = str(tmp_path / 'journal.jsonl')
+    rows = list(upload_batch(paths, upload, UploadJournal(journal_file, 'content'), 3))
+
+    assert sorted(row['file'] for row in rows) == paths
+    assert [row for row in rows if row['status'] == 'failed'] == [
+        {'file': paths[3], 'status': 'failed', 'error': 'connection reset'}]
+
+    # only the failed file is uploaded again, the others come from the journal
+    uploaded.clear()
+    rows = list(upload_batch(paths, upload, UploadJournal(journal_file, 'content'), 3))
+
+    assert uploaded == [paths[3]]
+    assert {row['file']: row['status'] for row in rows} == {
+        path: 'uploaded' if path == paths[3] else 'resumed' for path in paths}
+    assert all(row['content_id'] == os.path.basename(row['file']) for row in rows)
+
+    # a changed file is uploaded again, the journal of another kind is ignored
+    with open(paths[0], 'ab') as f:
+        f.write(b'more')
+    uploaded.clear()
+    list(upload_batch(paths, upload, UploadJournal(journal_file, 'content'), 3))
+    assert uploaded == [paths[0]]
+    assert UploadJournal(journal_file, 'application').get(paths[1]) is None
+
+
+@pytest.mark.skipif(not os.environ.get('ESPER_BENCHMARK'), reason='set ESPER_BENCHMARK=1 to run benchmarks')
+@pytest.mark.parametrize('chunked', [False, True])
+def test_benchmark_upload_peak_rss(api_client, tmp_path, chunked):
+    """
+    Upload a 2 GB file and check that the peak RSS of the process grows by less than 64 MB
+    """
+    size = 2 * 1024 ** 3
+    path = tmp_path / 'content.bin'
+    with open(path, 'wb') as f:
+        # sparse file, created without writing 2 GB to disk
+        f.truncate(size)
+
+    sent = []
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    upload_file(api_client, '/v0/enterprise/{enterprise_id}/discard/', {'enterprise_id': 'e1'},
+                'key', str(path), 'object', progress=sent.append, chunked=chunked)
+    peak_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    assert UploadHandler.received['size'] > size
+    assert sum(sent) == size
+    # ru_maxrss is in kilobytes on Linux
+    assert peak_after - peak_before < 64 * 1024
@@ -3,6 +3,7 @@ from os import path
 
 from clint.textui import prompt
 
+from esper.ext.db_wrapper import DBWrapper
 from esper.main import EsperTest
 
 
@@ -45,3 +46,18 @@ def set_configure(monkeypatch):
 def teardown():
     if path.exists('creds.json'):
         os.remove('creds.json')
+
+    if path.exists('name_cache.json'):
+        os.remove('name_cache.json')
+
+
+def run_with_test_configure(argv):
+    """
+    Run a command with fake credentials, for tests which monkeypatch every API call it makes
+    :return: (exit code, data of the last render)
+    """
+    with EsperTest(argv=argv) as app:
+        DBWrapper(app.creds).set_configure({'environment': 'test', 'api_key': 'key', 'enterprise_id': 'enterprise'})
+        app.name_cache.clear()
+        app.run()
+        return app.exit_code, app.last_rendered[0] if app.last_rendered else None